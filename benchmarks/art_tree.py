@@ -0,0 +1,219 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Generate synthetic art folders stressing one dimension of an actor each.
+
+Every generator writes actors, variants, meshes and textures below an art
+folder and returns the virtual path of the actor to import, e.g.
+"art/actors/bench/root.xml".
+"""
+
+import os
+import struct
+import zlib
+
+from collada_fixer import write_skinned_collada
+
+ACTORS = "actors/bench/"
+
+
+def write_file(art_path, relative_path, content):
+    path = os.path.join(art_path, *relative_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(path, mode) as f:
+        f.write(content)
+
+
+def make_png(width, height):
+    """Return a valid, blank RGBA PNG file."""
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    rows = b"".join(b"\0" + b"\0" * width * 4 for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def variant(body="", file=None):
+    file_attribute = f' file="{file}"' if file is not None else ""
+    return f'<variant frequency="1"{file_attribute}>{body}</variant>'
+
+
+def write_actor(art_path, name, groups, material="default.xml"):
+    """Write an actor made of groups, each a list of variant elements."""
+    groups_xml = "".join("<group>" + "".join(group) + "</group>" for group in groups)
+    write_file(
+        art_path,
+        ACTORS + name + ".xml",
+        f'<?xml version="1.0" encoding="utf-8"?>\n<actor version="1">{groups_xml}'
+        f"<material>{material}</material></actor>\n",
+    )
+    return "art/" + ACTORS + name + ".xml"
+
+
+def write_meshes(art_path, count, vertex_count=64, prop_points=()):
+    """Write count small skinned meshes and return their file names.
+
+    Every mesh has a prop point for each of the given attach points.
+    """
+    names = []
+    for index in range(count):
+        name = f"bench/mesh{index}.dae"
+        path = os.path.join(art_path, "meshes", "bench", f"mesh{index}.dae")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_skinned_collada(
+            path, vertex_count, joint_count=4, seed=index, prop_points=prop_points
+        )
+        names.append(name)
+    return names
+
+
+def write_textures(art_path, count, size=4):
+    """Write count tiny textures and return their file names."""
+    png = make_png(size, size)
+    names = [f"bench/texture{index}.png" for index in range(count)]
+    for name in names:
+        write_file(art_path, "textures/skins/" + name, png)
+    return names
+
+
+def mesh_variant(mesh, texture=None, props=""):
+    body = f"<mesh>{mesh}</mesh>"
+    if texture is not None:
+        body += f'<textures><texture file="{texture}" name="baseTex"/></textures>'
+    if props:
+        body += f"<props>{props}</props>"
+    return variant(body)
+
+
+def prop_chain(art_path, depth):
+    """An actor carrying a prop, carrying a prop, and so on depth times."""
+    (mesh,) = write_meshes(art_path, 1, prop_points=("head",))
+    (texture,) = write_textures(art_path, 1)
+    for index in reversed(range(depth + 1)):
+        props = ""
+        if index < depth:
+            props = f'<prop actor="bench/chain{index + 1}.xml" attachpoint="head"/>'
+        path = write_actor(
+            art_path, f"chain{index}", [[mesh_variant(mesh, texture, props)]]
+        )
+    return path
+
+
+def prop_fanout(art_path, width, root_props=0):
+    """An actor carrying width distinct props, each with its own texture.
+
+    The first root_props props are attached to "root" rather than a prop point.
+    """
+    meshes = write_meshes(
+        art_path, 4, prop_points=[f"point{index}" for index in range(width)]
+    )
+    textures = write_textures(art_path, width)
+    for index in range(width):
+        write_actor(
+            art_path,
+            f"prop{index}",
+            [[mesh_variant(meshes[index % len(meshes)], textures[index])]],
+        )
+    props = "".join(
+        f'<prop actor="bench/prop{index}.xml"'
+        f' attachpoint="{"root" if index < root_props else f"point{index}"}"/>'
+        for index in range(width)
+    )
+    return write_actor(art_path, "root", [[mesh_variant(meshes[0], None, props)]])
+
+
+def proxy_fanout(art_path, width):
+    """prop_fanout with one prop attached to "root", its props being proxies."""
+    return prop_fanout(art_path, width, root_props=1)
+
+
+def variant_chain(art_path, length, groups=8):
+    """Groups of variants inheriting through a chain of length variant files."""
+    (mesh,) = write_meshes(art_path, 1)
+    textures = write_textures(art_path, length)
+    for index in range(length):
+        parent = f' file="bench/chain{index - 1}.xml"' if index > 0 else ""
+        write_file(
+            art_path,
+            f"variants/bench/chain{index}.xml",
+            f'<?xml version="1.0" encoding="utf-8"?>\n<variant{parent}>'
+            f'<textures><texture file="{textures[index]}" name="tex{index}"/>'
+            "</textures></variant>\n",
+        )
+    inherited = variant(file=f"bench/chain{length - 1}.xml")
+    return write_actor(
+        art_path, "root", [[mesh_variant(mesh)]] + [[inherited]] * groups
+    )
+
+
+def large_collada(art_path, vertex_count):
+    """An actor with a single, large skinned mesh."""
+    path = os.path.join(art_path, "meshes", "bench", "large.dae")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_skinned_collada(path, vertex_count)
+    (texture,) = write_textures(art_path, 1)
+    return write_actor(art_path, "root", [[mesh_variant("bench/large.dae", texture)]])
+
+
+def many_textures(art_path, count):
+    """An actor whose props use count textures, each with three roles."""
+    meshes = write_meshes(
+        art_path, 2, prop_points=[f"point{index}" for index in range(count)]
+    )
+    textures = write_textures(art_path, count * 3)
+    props = []
+    for index in range(count):
+        base, norm, spec = textures[index * 3 : index * 3 + 3]
+        body = (
+            f"<mesh>{meshes[index % 2]}</mesh><textures>"
+            f'<texture file="{base}" name="baseTex"/>'
+            f'<texture file="{norm}" name="normTex"/>'
+            f'<texture file="{spec}" name="specTex"/></textures>'
+        )
+        write_actor(art_path, f"textured{index}", [[variant(body)]])
+        props.append(
+            f'<prop actor="bench/textured{index}.xml" attachpoint="point{index}"/>'
+        )
+    return write_actor(
+        art_path, "root", [[mesh_variant(meshes[0], None, "".join(props))]]
+    )
+
+
+# Scenario name -> (generator, size at scale 1)
+SCENARIOS = {
+    "prop_chain": (prop_chain, 32),
+    "prop_fanout": (prop_fanout, 256),
+    "proxy_fanout": (proxy_fanout, 64),
+    "variant_chain": (variant_chain, 64),
+    "large_collada": (large_collada, 50000),
+    "collada_import": (large_collada, 50000),
+    "many_textures": (many_textures, 128),
+}
+
+
+# Scenario name -> "planner" and "builder" settings, as the import operator's,
+# for scenarios not using the defaults
+SETTINGS = {
+    "proxy_fanout": {"planner": {"proxy_depth": 0}},
+    # The Collada fixer and Blender's importer rather than the native reader.
+    "collada_import": {"builder": {"mesh_reader": "COLLADA_IMPORT"}},
+}
+
+
+def generate(name, art_path, scale=1.0):
+    """Write a scenario into art_path and return the virtual path of its actor."""
+    generator, size = SCENARIOS[name]
+    return generator(art_path, max(1, int(size * scale)))
@@ -0,0 +1,50 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Time the import of one actor inside Blender, run by run.py with --blender.
+
+blender --background --factory-startup --python benchmarks/blender_import.py \\
+    -- ACTOR_FILE
+"""
+
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import io_scene_pyrogenesis  # noqa: E402
+
+# Prefix of the line holding the JSON result, among Blender's own output.
+RESULT_MARKER = "PYROGENESIS_BENCHMARK_RESULT "
+
+
+def main():
+    actor_path = sys.argv[sys.argv.index("--") + 1]
+    io_scene_pyrogenesis.register()
+
+    start = time.perf_counter()
+    result = bpy.ops.import_pyrogenesis_scene.xml(filepath=actor_path, seed=0)
+    elapsed = time.perf_counter() - start
+
+    print(
+        RESULT_MARKER
+        + json.dumps(
+            {
+                "blender_seconds": elapsed,
+                "blender_result": sorted(result),
+                "blender_objects": len(bpy.data.objects),
+                "blender_meshes": len(bpy.data.meshes),
+                "blender_materials": len(bpy.data.materials),
+                "blender_images": len(bpy.data.images),
+            }
+        ),
+        flush=True,
+    )
+
+
+main()
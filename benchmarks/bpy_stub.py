@@ -0,0 +1,441 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""A bpy stand-in counting the operator and data API calls made through it.
+
+Every attribute is another recorder and every call returns a fresh one, so
+the importer runs without Blender. Objects, their data and collections keep
+the state the importer reads back, and the import operators add an object to
+the active collection, so that the work done on each imported object, e.g.
+preparing, attaching and assigning materials to it, is counted too.
+"""
+
+import collections
+import sys
+import types
+import xml.etree.ElementTree as ET
+
+# Recorder path -> factory(calls, path, value, *args, **kwargs) of call results.
+FACTORIES = {}
+
+
+class Recorder:
+    """Record calls made on any attribute path below a root name.
+
+    Calls are counted by path, e.g. "bpy.data.images.load", while the string
+    value of a recorder also holds the first argument of the calls that led to
+    it, so that the results of distinct calls can be told apart.
+    """
+
+    def __init__(self, calls, path, value=None):
+        object.__setattr__(self, "_calls", calls)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_value", value or path)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        child = Recorder(self._calls, self._path + "." + name, self._value + "." + name)
+        object.__setattr__(self, name, child)
+        return child
+
+    def __call__(self, *args, **kwargs):
+        self._calls[self._path] += 1
+        argument = repr(args[0]) if args else ""
+        path = self._path + "()"
+        value = self._value + "(" + argument + ")"
+        factory = FACTORIES.get(self._path)
+        if factory is not None:
+            return factory(self._calls, path, value, *args, **kwargs)
+        return Recorder(self._calls, path, value)
+
+    def __getitem__(self, key):
+        return Recorder(self._calls, self._path + "[]", f"{self._value}[{key!r}]")
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def __bool__(self):
+        return True
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __matmul__(self, other):
+        return Recorder(self._calls, self._path + "@", f"{self._value} @ {other}")
+
+    def __rmatmul__(self, other):
+        return Recorder(self._calls, self._path + "@", f"{other} @ {self._value}")
+
+    def __str__(self):
+        return self._value
+
+    def __fspath__(self):
+        return self._value
+
+    def __repr__(self):
+        return "<" + self._value + ">"
+
+    def _record(self, name):
+        self._calls[self._path + "." + name] += 1
+
+
+class StubMatrix(Recorder):
+    """A matrix equal to the matrices made by the same calls, e.g. Identity(4)."""
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(self._value)
+
+    def decompose(self):
+        self._record("decompose")
+        return tuple(
+            Recorder(self._calls, self._path + ".decompose()[]", f"{self}[{index}]")
+            for index in range(3)
+        )
+
+
+class StubList(Recorder):
+    """A bpy collection property holding what is added to it, e.g. materials."""
+
+    def __init__(self, calls, path, value=None):
+        super().__init__(calls, path, value)
+        object.__setattr__(self, "_items", [])
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return len(self._items) > 0
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, value):
+        self._record("__setitem__")
+        self._items[index] = value
+
+    def append(self, item):
+        self._record("append")
+        self._items.append(item)
+
+    def clear(self):
+        self._record("clear")
+        self._items.clear()
+
+    def new(self, *args, **kwargs):
+        self._record("new")
+        item = Recorder(self._calls, self._path + ".new()", f"{self}.new({args!r})")
+        self._items.append(item)
+        return item
+
+
+class StubBones(StubList):
+    """Edit bones of an armature, also listed as its bones."""
+
+    def new(self, name):
+        bone = super().new(name)
+        object.__setattr__(bone, "name", name)
+        return bone
+
+
+class StubCollection(Recorder):
+    """A collection whose objects can be linked, unlinked and listed."""
+
+    def __init__(self, calls, path, value, name):
+        super().__init__(calls, path, value)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(
+            self, "objects", StubObjects(calls, path + ".objects", self._value, self)
+        )
+
+    @property
+    def all_objects(self):
+        return self.objects
+
+
+class StubObjects(StubList):
+    def __init__(self, calls, path, value, collection):
+        super().__init__(calls, path, value + ".objects")
+        object.__setattr__(self, "_collection", collection)
+
+    def link(self, obj):
+        self._record("link")
+        self._items.append(obj)
+        obj.users_collection.append(self._collection)
+
+    def unlink(self, obj):
+        self._record("unlink")
+        self._items.remove(obj)
+        obj.users_collection.remove(self._collection)
+
+
+class StubObject(Recorder):
+    """An object with the state the importer reads back, e.g. its parent."""
+
+    def __init__(self, calls, path, value, name, data=None):
+        super().__init__(calls, path, value)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "data", data)
+        object.__setattr__(self, "_parent", None)
+        object.__setattr__(self, "children", [])
+        object.__setattr__(self, "users_collection", [])
+        object.__setattr__(self, "_properties", {})
+        object.__setattr__(self, "_selected", False)
+        object.__setattr__(
+            self, "constraints", StubList(calls, path + ".constraints", value)
+        )
+        object.__setattr__(self, "matrix_basis", IDENTITY)
+        if data is None:
+            object.__setattr__(self, "type", "EMPTY")
+            return
+
+        object.__setattr__(
+            self, "type", "ARMATURE" if "armatures" in str(data) else "MESH"
+        )
+        # Data of the native reader is a recorder, made to hold materials and
+        # bones here.
+        if not isinstance(getattr(data, "users", None), int):
+            object.__setattr__(data, "users", 0)
+            object.__setattr__(data, "name", name)
+            object.__setattr__(
+                data, "materials", StubList(calls, data._path + ".materials", None)
+            )
+            if self.type == "ARMATURE":
+                bones = StubBones(calls, data._path + ".edit_bones", None)
+                object.__setattr__(data, "edit_bones", bones)
+                object.__setattr__(data, "bones", bones)
+        object.__setattr__(data, "users", data.users + 1)
+
+    def __eq__(self, other):
+        return self is other
+
+    def __hash__(self):
+        return id(self)
+
+    def __setitem__(self, key, value):
+        self._properties[key] = value
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __contains__(self, key):
+        return key in self._properties
+
+    def get(self, key, default=None):
+        self._record("get")
+        return self._properties.get(key, default)
+
+    def select_set(self, state):
+        self._record("select_set")
+        object.__setattr__(self, "_selected", state)
+
+    def select_get(self):
+        self._record("select_get")
+        return self._selected
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        if self._parent is not None:
+            self._parent.children.remove(self)
+        object.__setattr__(self, "_parent", parent)
+        if parent is not None:
+            parent.children.append(self)
+
+    def __setattr__(self, name, value):
+        if name == "matrix_basis":
+            value = StubMatrix(self._calls, "mathutils.Matrix()", str(value))
+        elif name in ("location", "rotation_euler"):
+            # The transform is no longer the identity.
+            object.__setattr__(
+                self,
+                "matrix_basis",
+                StubMatrix(self._calls, "mathutils.Matrix()", f"{self}.{name}"),
+            )
+        object.__setattr__(self, name, value)
+
+    def copy(self):
+        self._record("copy")
+        copy = StubObject(
+            self._calls, self._path, f"{self}.copy()", self.name, self.data
+        )
+        object.__setattr__(copy, "matrix_basis", self.matrix_basis)
+        return copy
+
+
+class StubViewLayer(Recorder):
+    """A view layer whose active layer collection sets bpy.context.collection."""
+
+    def __init__(self, calls, path, scene_collection, collections):
+        super().__init__(calls, path)
+        object.__setattr__(
+            self,
+            "layer_collection",
+            StubLayerCollection(calls, path, scene_collection, collections),
+        )
+        object.__setattr__(self, "active_layer_collection", self.layer_collection)
+
+
+class StubLayerCollection(Recorder):
+    def __init__(self, calls, path, collection, collections):
+        super().__init__(calls, path + ".layer_collection")
+        object.__setattr__(self, "collection", collection)
+        object.__setattr__(self, "_collections", collections)
+
+    @property
+    def children(self):
+        return {
+            name: StubLayerCollection(
+                self._calls, self._path, collection, self._collections
+            )
+            for name, collection in self._collections.items()
+        }
+
+
+class StubContext(Recorder):
+    def __init__(self, calls, view_layer, scene, stub_collections):
+        super().__init__(calls, "bpy.context")
+        object.__setattr__(self, "view_layer", view_layer)
+        object.__setattr__(self, "scene", scene)
+        object.__setattr__(self, "_collections", stub_collections)
+
+    @property
+    def collection(self):
+        return self.view_layer.active_layer_collection.collection
+
+    @property
+    def selected_objects(self):
+        objects = {}
+        for collection in [self.scene.collection, *self._collections.values()]:
+            for obj in collection.objects:
+                if obj._selected:
+                    objects[id(obj)] = obj
+        return list(objects.values())
+
+    @property
+    def selected_editable_objects(self):
+        return self.selected_objects
+
+
+IDENTITY = None
+
+
+def install():
+    """Replace bpy and mathutils in sys.modules and return the call counter.
+
+    The io_scene_pyrogenesis package itself must be imported beforehand, as
+    it only registers its operators when it finds bpy.
+    """
+    global IDENTITY
+
+    calls = collections.Counter()
+    IDENTITY = StubMatrix(calls, "mathutils.Matrix()", "mathutils.Matrix.Identity(4)")
+    # Collection name -> StubCollection, for view_layer.layer_collection.
+    stub_collections = {}
+    scene = Recorder(calls, "bpy.context.scene")
+    object.__setattr__(
+        scene,
+        "collection",
+        StubCollection(calls, "bpy.context.scene.collection", None, "Scene Collection"),
+    )
+    view_layer = StubViewLayer(
+        calls, "bpy.context.view_layer", scene.collection, stub_collections
+    )
+    context = StubContext(calls, view_layer, scene, stub_collections)
+
+    def new_collection(calls, path, value, name):
+        collection = StubCollection(calls, path, value, name)
+        stub_collections[name] = collection
+        return collection
+
+    def new_object(calls, path, value, name, data=None):
+        return StubObject(calls, path, value, name, data)
+
+    def add_object(name, data_path):
+        data = None
+        if data_path is not None:
+            data = Recorder(calls, data_path + "[]", f"{data_path}[{name!r}]")
+        obj = StubObject(
+            calls, "bpy.data.objects[]", f"bpy.data.objects[{name!r}]", name, data
+        )
+        # Imported objects come with their transform.
+        object.__setattr__(
+            obj, "matrix_basis", StubMatrix(calls, "mathutils.Matrix()", str(obj))
+        )
+        context.collection.objects.link(obj)
+        return obj
+
+    def import_collada(calls, path, value, filepath="", **kwargs):
+        # Like Blender's importer: an object per node, joints being the bones
+        # of an armature.
+        armature = None
+        for element in ET.parse(filepath).iter():
+            if element.tag.rsplit("}", 1)[-1] != "node":
+                continue
+
+            name = element.get("name") or element.get("id")
+            if element.get("type") == "JOINT":
+                if armature is None:
+                    armature = add_object(name, "bpy.data.armatures")
+                armature.data.edit_bones.new(name)
+                continue
+
+            instances = [
+                child
+                for child in element
+                if child.tag.rsplit("}", 1)[-1]
+                in ("instance_geometry", "instance_controller")
+            ]
+            add_object(name, "bpy.data.meshes" if instances else None)
+        return Recorder(calls, path, value)
+
+    def apply_transforms(
+        calls, path, value, location=False, rotation=False, scale=False
+    ):
+        if location and rotation:
+            for obj in context.selected_objects:
+                object.__setattr__(obj, "matrix_basis", IDENTITY)
+        return Recorder(calls, path, value)
+
+    FACTORIES.clear()
+    FACTORIES["bpy.data.collections.new"] = new_collection
+    FACTORIES["bpy.data.objects.new"] = new_object
+    FACTORIES["bpy.ops.wm.collada_import"] = import_collada
+    FACTORIES["bpy.ops.object.transform_apply"] = apply_transforms
+
+    for name in ("bpy", "mathutils"):
+        module = types.ModuleType(name)
+        module.__getattr__ = Recorder(calls, name).__getattr__
+        sys.modules[name] = module
+    sys.modules["bpy"].context = context
+    return calls
+
+
+def summarize(calls):
+    """Return the operator and data API call counts, plus every counted path."""
+    return {
+        "ops_calls": sum(
+            count for path, count in calls.items() if path.startswith("bpy.ops.")
+        ),
+        "data_calls": sum(
+            count for path, count in calls.items() if path.startswith("bpy.data.")
+        ),
+        "calls": dict(sorted(calls.items())),
+    }
@@ -0,0 +1,161 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Compare the tree and streaming Collada fixers on a synthetic skinned mesh.
+
+Usage: python benchmarks/collada_fixer.py [--vertices N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from io_scene_pyrogenesis.max_collada_fixer import COLLADA_FIXERS  # noqa: E402
+
+
+def write_skinned_collada(path, vertex_count, joint_count=32, seed=0, prop_points=()):
+    """Write a Collada document shaped like an exported 0 A.D. unit mesh.
+
+    prop_points are the attach points to add prop_<name> nodes for.
+    """
+    rng = random.Random(seed)
+
+    def floats(count):
+        return " ".join(f"{rng.uniform(-1, 1):.6f}" for _ in range(count))
+
+    triangle_count = vertex_count
+    indices = " ".join(
+        str(rng.randrange(vertex_count)) for _ in range(triangle_count * 3 * 3)
+    )
+    joints = " ".join(f"joint{i}" for i in range(joint_count))
+    vcount = " ".join("2" for _ in range(vertex_count))
+    weights = " ".join(
+        f"{rng.randrange(joint_count)} {i}" for i in range(vertex_count * 2)
+    )
+
+    def accessor(array_id, count, params):
+        return (
+            f'<technique_common><accessor source="#{array_id}" count="{count}"'
+            f' stride="{len(params)}">'
+            + "".join(f'<param name="{param}" type="float"/>' for param in params)
+            + "</accessor></technique_common>"
+        )
+
+    nodes = "".join(
+        f'<node id="joint{i}" sid="joint{i}" name="joint{i}" type="JOINT">'
+        f"<matrix>{floats(16)}</matrix></node>"
+        for i in range(joint_count)
+    ) + "".join(
+        f'<node id="prop_{name}" name="prop_{name}">'
+        f"<matrix>{floats(16)}</matrix></node>"
+        for name in prop_points
+    )
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<COLLADA xmlns="http://www.collada.org/2005/11/COLLADASchema"'
+            ' version="1.4.1">\n'
+            "<asset><modified>2024-01-01</modified><up_axis>Z_UP</up_axis></asset>\n"
+            '<library_images><image id="skin"><init_from>skin.png</init_from>'
+            "</image></library_images>\n"
+            '<library_materials><material id="mat"><instance_effect url="#fx"/>'
+            "</material></library_materials>\n"
+            '<library_effects><effect id="fx"/></library_effects>\n'
+            '<library_geometries><geometry id="geom"><mesh>\n'
+            f'<source id="pos"><float_array id="pos-a" count="{vertex_count * 3}">'
+            f"{floats(vertex_count * 3)}</float_array>"
+            f"{accessor('pos-a', vertex_count, 'XYZ')}</source>\n"
+            f'<source id="nrm"><float_array id="nrm-a" count="{vertex_count * 3}">'
+            f"{floats(vertex_count * 3)}</float_array>"
+            f"{accessor('nrm-a', vertex_count, 'XYZ')}</source>\n"
+            f'<source id="uv"><float_array id="uv-a" count="{vertex_count * 2}">'
+            f"{floats(vertex_count * 2)}</float_array>"
+            f"{accessor('uv-a', vertex_count, 'ST')}</source>\n"
+            '<vertices id="vtx"><input semantic="POSITION" source="#pos"/></vertices>\n'
+            f'<triangles count="{triangle_count}" material="mat">'
+            '<input semantic="VERTEX" source="#vtx" offset="0"/>'
+            '<input semantic="NORMAL" source="#nrm" offset="1"/>'
+            '<input semantic="TEXCOORD" source="#uv" offset="2" set="0"/>'
+            f"<p>{indices}</p></triangles>\n"
+            "</mesh></geometry></library_geometries>\n"
+            '<library_controllers><controller id="skin-ctrl"><skin source="#geom">'
+            f'<source id="joints"><Name_array count="{joint_count}">{joints}'
+            "</Name_array></source>\n"
+            f'<source id="weights"><float_array id="w-a" count="{vertex_count * 2}">'
+            f"{floats(vertex_count * 2)}</float_array>"
+            f"{accessor('w-a', vertex_count * 2, 'W')}</source>\n"
+            f'<vertex_weights count="{vertex_count}">'
+            '<input semantic="JOINT" source="#joints" offset="0"/>'
+            '<input semantic="WEIGHT" source="#weights" offset="1"/>'
+            f"<vcount>{vcount}</vcount><v>{weights}</v></vertex_weights>"
+            "</skin></controller></library_controllers>\n"
+            f'<library_visual_scenes><visual_scene id="scene">{nodes}'
+            '<node id="body" name="body"><instance_controller url="#skin-ctrl">'
+            '<bind_material><technique_common><instance_material symbol="mat"'
+            ' target="#mat"/></technique_common></bind_material>'
+            "</instance_controller></node>"
+            "</visual_scene></library_visual_scenes>\n"
+            '<scene><instance_visual_scene url="#scene"/></scene>\n'
+            "</COLLADA>\n"
+        )
+
+
+def measure(fixer_class, source_path, repeat):
+    """Return the best wall time and the peak traced memory of a cache miss."""
+    best_time = None
+    peak_memory = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_path:
+            fixer = fixer_class(source_path, cache_path)
+            tracemalloc.start()
+            start = time.perf_counter()
+            fixer.execute()
+            elapsed = time.perf_counter() - start
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    return best_time, peak_memory
+
+
+def run(vertex_count, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as source_dir:
+        source_path = os.path.join(source_dir, "skinned.dae")
+        write_skinned_collada(source_path, vertex_count)
+        file_size = os.path.getsize(source_path)
+        for name, fixer_class in COLLADA_FIXERS.items():
+            elapsed, peak_memory = measure(fixer_class, source_path, repeat)
+            results[name] = {
+                "file_size": file_size,
+                "seconds": elapsed,
+                "peak_memory": peak_memory,
+            }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vertices", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, result in run(args.vertices, args.repeat).items():
+        print(
+            f"{name:8} {result['file_size'] / 1e6:8.1f} MB source"
+            f" {result['seconds'] * 1000:10.1f} ms"
+            f" {result['peak_memory'] / 1e6:10.1f} MB peak"
+        )
+
+
+if __name__ == "__main__":
+    main()
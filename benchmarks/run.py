@@ -0,0 +1,333 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Benchmark the importer on synthetic actors and compare with a baseline.
+
+Usage: python benchmarks/run.py [--scale S] [--output results.json]
+    [--baseline baseline.json] [--mesh-reader NATIVE|COLLADA_IMPORT]
+    [--blender path/to/blender] [scenario ...]
+
+Planning, texture prefetching and Collada fixing run for real under plain
+Python, while the scene construction calls a recording bpy stub, giving the
+number of operator and data API calls made. --mesh-reader builds every
+scenario with the given reader rather than the scenario's own. With --blender,
+each actor is also imported by a background Blender for end-to-end timings.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import art_tree  # noqa: E402
+import bpy_stub  # noqa: E402
+import io_scene_pyrogenesis  # noqa: E402, F401
+
+calls = bpy_stub.install()
+
+from io_scene_pyrogenesis.actor_plan import ActorPlanner  # noqa: E402
+from io_scene_pyrogenesis.scene_builder import (  # noqa: E402
+    NODE_PROPERTY,
+    PROXY_ACTOR_PROPERTY,
+    PROXY_ATTACHPOINT_PROPERTY,
+    PROXY_DEPTH_PROPERTY,
+    ActorSceneBuilder,
+    get_attachment_target,
+)
+from io_scene_pyrogenesis.texture_prefetch import TexturePrefetcher  # noqa: E402
+from io_scene_pyrogenesis.variant_cache import VariantCache  # noqa: E402
+from io_scene_pyrogenesis.vfs import VirtualFileSystem  # noqa: E402
+
+BLENDER_SCRIPT = os.path.join(os.path.dirname(__file__), "blender_import.py")
+RESULT_MARKER = "PYROGENESIS_BENCHMARK_RESULT "
+
+# Differences below this many seconds are noise, whatever the ratio.
+NOISE_SECONDS = 0.005
+
+
+def best_time(function, repeat, setup=None):
+    """Return the best wall time of repeat calls, and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def get_prop_targets(objects, node):
+    """Return the sorted (object name, bone name) the objects of a node follow."""
+    targets = []
+    for obj in objects:
+        target = get_attachment_target(obj)
+        if obj.get(NODE_PROPERTY) == node and target is not None:
+            targets.append((target[0].name, target[1]))
+    return sorted(targets)
+
+
+def measure_proxies(vfs, actor_path, actor_plan, repeat, cache_path, builder_settings):
+    """Time expanding the proxies of an actor plan, checking where props land.
+
+    Expanded props must follow the same objects and bones as the props of the
+    actor imported without proxies. Every build shares the Collada cache_path.
+    """
+    planner = ActorPlanner(vfs, seed=0)
+    plan = planner.plan(actor_path)
+    builder = ActorSceneBuilder(vfs, cache_path, **builder_settings)
+    builder.build_actor(plan)
+    expected = {
+        (prop.attachpoint, prop.actor.path): get_prop_targets(
+            builder.imported_objects, f"0/{index}"
+        )
+        for index, prop in enumerate(plan.props)
+    }
+
+    proxies = []
+
+    def build_proxies():
+        proxy_builder = ActorSceneBuilder(vfs, cache_path, **builder_settings)
+        proxy_builder.build_actor(actor_plan)
+        proxies[:] = [
+            obj for obj in proxy_builder.imported_objects if PROXY_ACTOR_PROPERTY in obj
+        ]
+
+    def expand():
+        expand_builder = ActorSceneBuilder(vfs, cache_path, **builder_settings)
+        for proxy in proxies:
+            proxy_plan = planner.plan(
+                proxy[PROXY_ACTOR_PROPERTY], proxy[PROXY_DEPTH_PROPERTY]
+            )
+            expand_builder.expand_proxy(proxy, proxy_plan)
+        return expand_builder
+
+    expand_time, expand_builder = best_time(expand, repeat, setup=build_proxies)
+    for proxy in proxies:
+        key = (proxy[PROXY_ATTACHPOINT_PROPERTY], proxy[PROXY_ACTOR_PROPERTY])
+        targets = get_prop_targets(expand_builder.imported_objects, f"0/{proxy.name}")
+        if targets != expected[key]:
+            raise RuntimeError(
+                f"{key[1]} was expanded at {targets} instead of {expected[key]}"
+            )
+
+    return {"proxies": len(proxies), "expand_seconds": expand_time}
+
+
+def measure(art_path, actor_path, repeat, settings):
+    """Time planning and building an actor.
+
+    settings holds the "planner" and "builder" settings of its scenario, as the
+    import operator's do.
+    """
+    vfs = VirtualFileSystem(os.path.join(os.path.dirname(art_path), "extracted"))
+    vfs.mount(art_path, prefix="art/")
+    builder_settings = settings.get("builder", {})
+
+    def plan():
+        return ActorPlanner(vfs, seed=0, **settings.get("planner", {})).plan(actor_path)
+
+    plan_cold, actor_plan = best_time(plan, repeat, setup=VariantCache.clear)
+    plan_warm, _ = best_time(plan, repeat)
+    texture_paths = [
+        texture.path for actor in actor_plan.walk() for texture in actor.textures
+    ]
+    prefetch, _ = best_time(
+        lambda: TexturePrefetcher(vfs).prefetch(texture_paths), repeat
+    )
+
+    def build():
+        # Each build starts with an empty Collada cache, as a first import does.
+        with tempfile.TemporaryDirectory() as cache_path:
+            builder = ActorSceneBuilder(vfs, cache_path, **builder_settings)
+            builder.build_actor(actor_plan)
+            builder.finish()
+
+    build_time, _ = best_time(build, repeat, setup=calls.clear)
+    results = {
+        "actors": sum(1 for _ in actor_plan.walk()),
+        "textures": len(texture_paths),
+        "plan_cold_seconds": plan_cold,
+        "plan_warm_seconds": plan_warm,
+        "prefetch_seconds": prefetch,
+        "build_seconds": build_time,
+        **bpy_stub.summarize(calls),
+    }
+
+    if any(actor.proxies for actor in actor_plan.walk()):
+        with tempfile.TemporaryDirectory() as cache_path:
+            results.update(
+                measure_proxies(
+                    vfs, actor_path, actor_plan, repeat, cache_path, builder_settings
+                )
+            )
+    return results
+
+
+def measure_blender(blender, art_path, actor_path):
+    actor_file = os.path.join(art_path, *actor_path.split("/")[1:])
+    process = subprocess.run(
+        [
+            blender,
+            "--background",
+            "--factory-startup",
+            "--python",
+            BLENDER_SCRIPT,
+            "--",
+            actor_file,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER) :])
+
+    raise RuntimeError(
+        "Blender exited with code "
+        + str(process.returncode)
+        + ":\n"
+        + process.stdout[-2000:]
+    )
+
+
+def run(scenarios, scale, repeat, blender=None, mesh_reader=None):
+    results = {}
+    for name in scenarios:
+        with tempfile.TemporaryDirectory() as root:
+            art_path = os.path.join(root, "art")
+            actor_path = art_tree.generate(name, art_path, scale)
+            settings = art_tree.SETTINGS.get(name, {})
+            if mesh_reader is not None:
+                settings = {
+                    **settings,
+                    "builder": {
+                        **settings.get("builder", {}),
+                        "mesh_reader": mesh_reader,
+                    },
+                }
+            results[name] = measure(art_path, actor_path, repeat, settings)
+            if blender:
+                results[name].update(measure_blender(blender, art_path, actor_path))
+
+        print(
+            f"{name:14} plan {results[name]['plan_cold_seconds'] * 1000:8.1f} ms"
+            f" build {results[name]['build_seconds'] * 1000:8.1f} ms"
+            f" {results[name]['ops_calls']:6} ops"
+            f" {results[name]['data_calls']:6} data calls"
+        )
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the changes from the baseline and return the regressed metrics."""
+    regressions = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get(name)
+        if old_metrics is None:
+            continue
+
+        for metric, value in metrics.items():
+            old_value = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or old_value is None:
+                continue
+
+            if metric.endswith("_seconds"):
+                noise = abs(value - old_value) <= NOISE_SECONDS
+                regressed = value > old_value * (1 + tolerance) and not noise
+                improved = value * (1 + tolerance) < old_value and not noise
+            elif metric.endswith("_calls"):
+                regressed = value > old_value
+                improved = value < old_value
+            else:
+                continue
+
+            if regressed or improved:
+                ratio = value / old_value if old_value else float("inf")
+                print(
+                    f"{'REGRESSED' if regressed else 'improved':9}"
+                    f" {name}.{metric}: {old_value:.4g} -> {value:.4g}"
+                    f" ({ratio:.2f}x)"
+                )
+            if regressed:
+                regressions.append(name + "." + metric)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help="Scenarios to run among " + ", ".join(art_tree.SCENARIOS) + ", or all",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier of the scenario sizes"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Where to write the results as JSON")
+    parser.add_argument("--baseline", help="Results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown allowed before a time counts as regressed",
+    )
+    parser.add_argument(
+        "--mesh-reader",
+        choices=("NATIVE", "COLLADA_IMPORT"),
+        help="Read the meshes of every scenario this way",
+    )
+    parser.add_argument("--blender", help="Also import each actor with Blender")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(art_tree.SCENARIOS)
+    if unknown:
+        parser.error("unknown scenarios: " + ", ".join(sorted(unknown)))
+
+    results = run(
+        args.scenarios or list(art_tree.SCENARIOS),
+        args.scale,
+        args.repeat,
+        args.blender,
+        args.mesh_reader,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "scale": args.scale,
+                    "scenarios": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print("The baseline was recorded at scale " + str(baseline.get("scale")))
+        regressions = compare(results, baseline["scenarios"], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,7 +25,27 @@ def build_archive():
     ) as archive:
         archive.write("io_scene_pyrogenesis/__init__.py")
         archive.write("io_scene_pyrogenesis/max_collada_fixer.py")
+        archive.write("io_scene_pyrogenesis/collada_reader.py")
+        archive.write("io_scene_pyrogenesis/mesh_builder.py")
+        archive.write("io_scene_pyrogenesis/mesh_cache.py")
+        archive.write("io_scene_pyrogenesis/pmd_reader.py")
+        archive.write("io_scene_pyrogenesis/vfs.py")
+        archive.write("io_scene_pyrogenesis/variant_cache.py")
+        archive.write("io_scene_pyrogenesis/actor_plan.py")
+        archive.write("io_scene_pyrogenesis/dependency_graph.py")
+        archive.write("io_scene_pyrogenesis/actor_index.py")
+        archive.write("io_scene_pyrogenesis/scene_builder.py")
+        archive.write("io_scene_pyrogenesis/batch_convert.py")
+        archive.write("io_scene_pyrogenesis/texture_prefetch.py")
+        archive.write("io_scene_pyrogenesis/texture_cache.py")
+        archive.write("io_scene_pyrogenesis/profiling.py")
+        archive.write("io_scene_pyrogenesis/import_session.py")
+        archive.write("io_scene_pyrogenesis/material_cache.py")
         archive.write("io_scene_pyrogenesis/import_pyrogenesis_actor.py")
+        archive.write("io_scene_pyrogenesis/expand_pyrogenesis_proxies.py")
+        archive.write("io_scene_pyrogenesis/clear_pyrogenesis_cache.py")
+        archive.write("io_scene_pyrogenesis/refresh_pyrogenesis_actors.py")
+        archive.write("io_scene_pyrogenesis/select_pyrogenesis_dependents.py")
         archive.write("io_scene_pyrogenesis/blender_manifest.toml")
         archive.write("LICENSE", arcname="io_scene_pyrogenesis/LICENSE")
 
@@ -2,8 +2,21 @@
 # This file is part of 0 A.D.
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-import bpy
-from .import_pyrogenesis_actor import ImportPyrogenesisActor
+try:
+    import bpy
+except ModuleNotFoundError:
+    # Outside of Blender only the bpy-free modules, e.g. actor_plan, are usable.
+    bpy = None
+
+if bpy is not None:
+    from .clear_pyrogenesis_cache import ClearPyrogenesisCache
+    from .expand_pyrogenesis_proxies import ExpandPyrogenesisProxies
+    from .import_pyrogenesis_actor import (
+        ImportPyrogenesisActor,
+        ImportPyrogenesisActorModal,
+    )
+    from .refresh_pyrogenesis_actors import RefreshPyrogenesisActors
+    from .select_pyrogenesis_dependents import SelectPyrogenesisDependents
 
 
 def reload_package(module_dict_main):
@@ -23,7 +36,7 @@ def reload_package(module_dict_main):
     reload_package_recursive(Path(__file__).parent, module_dict_main)
 
 
-if "bpy" in locals():
+if bpy is not None:
     reload_package(locals())
 
 
@@ -31,16 +44,44 @@ def menu_func_import(self, context):
     self.layout.operator(
         ImportPyrogenesisActor.bl_idname, text="Pyrogenesis Actor (.xml)"
     )
+    self.layout.operator(
+        ImportPyrogenesisActorModal.bl_idname,
+        text="Pyrogenesis Actor in Background (.xml)",
+    )
+
+
+def menu_func_object(self, context):
+    self.layout.operator(ExpandPyrogenesisProxies.bl_idname)
+    self.layout.operator(RefreshPyrogenesisActors.bl_idname)
+    self.layout.operator(SelectPyrogenesisDependents.bl_idname)
+
+
+def menu_func_cleanup(self, context):
+    self.layout.operator(ClearPyrogenesisCache.bl_idname)
 
 
 def register():
     bpy.utils.register_class(ImportPyrogenesisActor)
+    bpy.utils.register_class(ImportPyrogenesisActorModal)
+    bpy.utils.register_class(ExpandPyrogenesisProxies)
+    bpy.utils.register_class(ClearPyrogenesisCache)
+    bpy.utils.register_class(RefreshPyrogenesisActors)
+    bpy.utils.register_class(SelectPyrogenesisDependents)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    bpy.types.VIEW3D_MT_object.append(menu_func_object)
+    bpy.types.TOPBAR_MT_file_cleanup.append(menu_func_cleanup)
 
 
 def unregister():
     bpy.utils.unregister_class(ImportPyrogenesisActor)
+    bpy.utils.unregister_class(ImportPyrogenesisActorModal)
+    bpy.utils.unregister_class(ExpandPyrogenesisProxies)
+    bpy.utils.unregister_class(ClearPyrogenesisCache)
+    bpy.utils.unregister_class(RefreshPyrogenesisActors)
+    bpy.utils.unregister_class(SelectPyrogenesisDependents)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.VIEW3D_MT_object.remove(menu_func_object)
+    bpy.types.TOPBAR_MT_file_cleanup.remove(menu_func_cleanup)
 
 
 if __name__ == "__main__":
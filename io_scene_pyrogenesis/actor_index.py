@@ -0,0 +1,266 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Index which actors use which variants, meshes, textures and props.
+
+python -m io_scene_pyrogenesis.actor_index --database index.sqlite \\
+    --mod mods/mymod --mod mods/public.zip affected art/meshes/foo.dae
+
+Every variant of every actor is resolved, not only the ones an import would
+choose, so that the index lists whatever an actor can use. The database is
+updated incrementally: only the actors whose file, or the variant files they
+inherit from, changed since the last update are resolved again.
+"""
+
+from .variant_cache import VariantCache
+from .vfs import DirectoryMount, VirtualFileSystem, get_mount_prefix
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import xml.etree.ElementTree as ET
+
+# Bump when the schema or the indexed dependencies change, to index again.
+INDEX_VERSION = 1
+
+SCHEMA = (
+    "CREATE TABLE files (path TEXT PRIMARY KEY, identity TEXT NOT NULL)",
+    "CREATE TABLE dependencies (actor TEXT NOT NULL, kind TEXT NOT NULL,"
+    " path TEXT NOT NULL, PRIMARY KEY (actor, kind, path)) WITHOUT ROWID",
+    "CREATE INDEX dependencies_path ON dependencies (path, kind)",
+)
+
+ACTORS_PATH = "art/actors/"
+VARIANTS_PATH = "art/variants/"
+
+# Kinds of dependencies, by what they point to.
+KINDS = ("material", "variant", "mesh", "texture", "prop")
+
+
+class ActorIndex:
+    """An SQLite database of the dependencies of every actor of a set of mods.
+
+    Dependencies are (kind, virtual path) pairs: the material, variant files,
+    meshes and textures an actor may use, and the actors it may prop.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != INDEX_VERSION:
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS files")
+                self.connection.execute("DROP TABLE IF EXISTS dependencies")
+                for statement in SCHEMA:
+                    self.connection.execute(statement)
+                self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, vfs):
+        """Index the actors of the mounted mods that changed, and return how many."""
+        identities = {
+            path: json.dumps(vfs.identify(path))
+            for path in vfs.list(ACTORS_PATH) + vfs.list(VARIANTS_PATH)
+            if path.endswith(".xml")
+        }
+        stored = dict(self.connection.execute("SELECT path, identity FROM files"))
+        changed = {
+            path
+            for path in identities.keys() | stored.keys()
+            if identities.get(path) != stored.get(path)
+        }
+        if not changed:
+            return 0
+
+        changed_variants = [path for path in changed if path.startswith(VARIANTS_PATH)]
+        actors = {path for path in changed if path.startswith(ACTORS_PATH)}
+        actors.update(self.get_users(changed_variants, "variant"))
+
+        variant_cache = VariantCache(vfs, VARIANTS_PATH)
+        with self.connection:
+            for actor in sorted(actors):
+                self.connection.execute(
+                    "DELETE FROM dependencies WHERE actor = ?", (actor,)
+                )
+                if actor not in identities:
+                    continue
+
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO dependencies VALUES (?, ?, ?)",
+                    (
+                        (actor, kind, path)
+                        for kind, path in self.resolve_actor(variant_cache, actor)
+                    ),
+                )
+
+            for path in changed:
+                if path in identities:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?)",
+                        (path, identities[path]),
+                    )
+                else:
+                    self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+        self.logger.info(f"Indexed {len(actors)} actors")
+        return len(actors)
+
+    def resolve_actor(self, variant_cache, actor):
+        """Yield the (kind, path) dependencies of every variant of an actor."""
+        try:
+            root = variant_cache.parse_file(actor)
+            for group in root:
+                if group.tag == "material":
+                    yield "material", "art/materials/" + (group.text or "").strip()
+                    continue
+
+                for variant in group:
+                    if "file" in variant.attrib:
+                        # Listed first, so that the actor is indexed again once
+                        # a missing variant file appears.
+                        yield "variant", VARIANTS_PATH + variant.attrib["file"]
+                        for path in variant_cache.get_dependencies(
+                            variant.attrib["file"]
+                        ):
+                            yield "variant", path
+
+                    for child in variant_cache.resolve(variant):
+                        if child.tag == "mesh":
+                            yield "mesh", "art/meshes/" + (child.text or "").strip()
+                        elif child.tag == "textures":
+                            for texture in child:
+                                yield (
+                                    "texture",
+                                    "art/textures/skins/" + texture.get("file", ""),
+                                )
+                        elif child.tag == "props":
+                            for prop in child:
+                                if prop.get("actor"):
+                                    yield "prop", ACTORS_PATH + prop.get("actor")
+        except (OSError, ET.ParseError) as e:
+            self.logger.warning(f"Could not resolve {actor}: {e}")
+
+    def get_dependencies(self, actor, kind=None):
+        """Return the sorted (kind, path) dependencies of an actor."""
+        query = "SELECT kind, path FROM dependencies WHERE actor = ?"
+        parameters = (actor,)
+        if kind is not None:
+            query += " AND kind = ?"
+            parameters += (kind,)
+        return sorted(self.connection.execute(query, parameters))
+
+    def get_users(self, paths, kind=None):
+        """Return the sorted actors depending directly on any of the paths."""
+        users = set()
+        for path in paths:
+            query = "SELECT actor FROM dependencies WHERE path = ?"
+            parameters = (path,)
+            if kind is not None:
+                query += " AND kind = ?"
+                parameters += (kind,)
+            users.update(
+                actor for (actor,) in self.connection.execute(query, parameters)
+            )
+        return sorted(users)
+
+    def get_affected_actors(self, path):
+        """Return the sorted actors whose import uses a file, through props too."""
+        affected = set(self.get_users([path]))
+        if path.startswith(ACTORS_PATH):
+            affected.add(path)
+
+        pending = list(affected)
+        while pending:
+            users = self.get_users(pending, "prop")
+            pending = [actor for actor in users if actor not in affected]
+            affected.update(pending)
+        return sorted(affected)
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="actor_index", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--database", required=True, help="SQLite index file")
+    parser.add_argument(
+        "--mod",
+        action="append",
+        default=[],
+        dest="mods",
+        help=(
+            "Mod folder, archive or art folder to index, highest priority first."
+            " The index is updated before any command when given"
+        ),
+    )
+    parser.add_argument(
+        "--real-paths",
+        action="store_true",
+        help="Print file paths rather than virtual ones, e.g. for batch_convert",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Index the changed actors")
+    dependencies = commands.add_parser(
+        "dependencies", help="List what an actor may use"
+    )
+    dependencies.add_argument("actor", help="Virtual path, e.g. art/actors/foo.xml")
+    dependencies.add_argument("--kind", choices=KINDS)
+    users = commands.add_parser("users", help="List the actors using a file directly")
+    users.add_argument("path", help="Virtual path, e.g. art/meshes/foo.dae")
+    users.add_argument("--kind", choices=KINDS)
+    affected = commands.add_parser(
+        "affected", help="List the actors using a file, through their props too"
+    )
+    affected.add_argument("path", help="Virtual path, e.g. art/variants/foo.xml")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+
+    with VirtualFileSystem() as vfs:
+        for index, path in enumerate(args.mods):
+            vfs.mount(
+                path, priority=len(args.mods) - index, prefix=get_mount_prefix(path)
+            )
+
+        with ActorIndex(args.database) as actor_index:
+            if args.mods:
+                actor_index.update(vfs)
+
+            if args.command == "dependencies":
+                for kind, path in actor_index.get_dependencies(args.actor, args.kind):
+                    print(kind, path)
+                return 0
+
+            if args.command == "users":
+                paths = actor_index.get_users([args.path], args.kind)
+            elif args.command == "affected":
+                paths = actor_index.get_affected_actors(args.path)
+            else:
+                return 0
+
+        for path in paths:
+            # Files in archives only have a virtual path.
+            if args.real_paths and isinstance(
+                vfs.get_index().get(path), DirectoryMount
+            ):
+                path = vfs.real_path(path)
+            print(path)
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
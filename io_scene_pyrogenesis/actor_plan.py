@@ -0,0 +1,272 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .profiling import ImportProfiler
+from .variant_cache import VariantCache
+from typing import NamedTuple
+import logging
+import random
+import xml.etree.ElementTree as ET
+
+
+class TexturePlan(NamedTuple):
+    """A texture of an actor, e.g. ("baseTex", "art/textures/skins/foo.png")."""
+
+    name: str
+    path: str
+
+
+class DecalPlan(NamedTuple):
+    """A flat textured quad lying on the ground."""
+
+    offset_x: float
+    offset_z: float
+    width: float
+    depth: float
+    angle: float
+
+
+class PropPlan(NamedTuple):
+    """An actor attached to a prop point of its parent."""
+
+    attachpoint: str
+    actor: "ActorPlan"
+
+
+class ProxyPlan(NamedTuple):
+    """A prop left unloaded, to be expanded later from its actor path."""
+
+    attachpoint: str
+    actor_path: str
+    depth: int
+
+
+class ActorPlan(NamedTuple):
+    """Everything needed to build an actor, with variants already chosen."""
+
+    path: str
+    material: str
+    meshes: tuple
+    decals: tuple
+    textures: tuple
+    props: tuple
+    depth: int
+    proxies: tuple = ()
+    # Name of the variant chosen in each group, "" for unnamed ones.
+    variants: tuple = ()
+    # Virtual paths of the actor and variant files the plan was resolved from.
+    sources: tuple = ()
+
+    def walk(self):
+        """Yield this plan and the plans of all its props, parents first."""
+        yield self
+        for prop in self.props:
+            yield from prop.actor.walk()
+
+
+def get_frequency(variant):
+    """Return the selection weight of a variant, 0 when it has none."""
+    try:
+        return max(float(variant.attrib.get("frequency", 0)), 0)
+    except ValueError:
+        return 0
+
+
+class ActorPlanner:
+    """Resolve actor XML into an ActorPlan without touching Blender.
+
+    Variant selection, texture and prop inheritance and prop depth limiting
+    all happen here so that the scene construction only has to follow the plan.
+    """
+
+    def __init__(
+        self,
+        vfs,
+        import_props=True,
+        import_textures=True,
+        import_depth=-1,
+        variant_cache=None,
+        seed=None,
+        profiler=None,
+        proxy_depth=-1,
+    ):
+        self.vfs = vfs
+        self.import_props = import_props
+        self.import_textures = import_textures
+        self.import_depth = import_depth
+        # Props deeper than this are planned as proxies, -1 to plan them all.
+        self.proxy_depth = proxy_depth
+        self.variant_cache = variant_cache or VariantCache(vfs)
+        # A seed makes the variant choice, and thus the whole plan, reproducible.
+        self.random = random.Random(seed)
+        self.profiler = profiler or ImportProfiler()
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def plan(self, actor_path, depth=0, previous=None):
+        """Return the plan of the actor file at a virtual path, e.g. art/actors/x.xml.
+
+        The variants of a previous plan of the same actor are chosen again
+        where they still exist, e.g. to plan an edited actor again.
+        """
+        if previous is not None and previous.path != actor_path:
+            previous = None
+
+        with self.profiler.actor(actor_path, depth):
+            with self.profiler.stage("xml parse"):
+                root = self.variant_cache.parse_file(actor_path)
+            return self.plan_actor(root, actor_path, depth, previous)
+
+    def plan_variations(self, actor_path, count, max_attempts=None):
+        """Return up to count plans of an actor with distinct variant choices.
+
+        Plans are drawn with the frequency weights, so fewer than count are
+        returned when the actor has fewer combinations, or rare ones are missed.
+        """
+        max_attempts = max_attempts or count * 10
+        plans = {}
+        for _ in range(max_attempts):
+            if len(plans) == count:
+                break
+            plans.setdefault(self.plan(actor_path), None)
+
+        return list(plans)
+
+    def plan_actor(self, root, actor_path, depth=0, previous=None):
+        material_type = "default.xml"
+        for group in root:
+            if group.tag == "material":
+                material_type = group.text
+
+        meshes = []
+        decals = []
+        # Role -> texture, groups later in the actor overriding earlier ones.
+        textures = {}
+        props = []
+        proxies = []
+        variants = []
+        sources = [actor_path]
+        for group in root:
+            if group.tag == "material" or len(group) == 0:
+                continue
+
+            preferred = None
+            if previous is not None and len(previous.variants) > len(variants):
+                preferred = previous.variants[len(variants)]
+            variant = self.choose_variant(group, preferred)
+            variants.append(variant.get("name", ""))
+            with self.profiler.stage("variant resolve"):
+                resolved = self.variant_cache.resolve(variant)
+                if "file" in variant.attrib:
+                    sources.extend(
+                        self.variant_cache.get_dependencies(variant.attrib["file"])
+                    )
+            for child in resolved:
+                if child.tag == "mesh":
+                    meshes.append("art/meshes/" + child.text)
+                elif child.tag == "decal":
+                    decals.append(
+                        DecalPlan(
+                            float(child.attrib["offsetx"]),
+                            float(child.attrib["offsetz"]),
+                            float(child.attrib["width"]),
+                            float(child.attrib["depth"]),
+                            float(child.attrib["angle"]),
+                        )
+                    )
+                elif child.tag == "textures" and self.import_textures:
+                    textures.update(
+                        (
+                            texture.attrib["name"],
+                            TexturePlan(
+                                texture.attrib["name"],
+                                "art/textures/skins/" + texture.attrib["file"],
+                            ),
+                        )
+                        for texture in child
+                    )
+                elif child.tag == "props" and self.should_import_props(depth):
+                    if self.should_create_proxies(depth):
+                        proxies.extend(self.plan_proxies(child, depth))
+                    else:
+                        props.extend(self.plan_props(child, depth, previous))
+
+        if decals and (material_type == "default.xml" or "terrain" in material_type):
+            material_type = "basic_trans.xml"
+
+        return ActorPlan(
+            actor_path,
+            material_type,
+            tuple(meshes),
+            tuple(decals),
+            tuple(textures.values()),
+            tuple(props),
+            depth,
+            tuple(proxies),
+            tuple(variants),
+            tuple(dict.fromkeys(sources)),
+        )
+
+    def plan_props(self, props, depth, previous=None):
+        previous_actors = {}
+        if previous is not None:
+            previous_actors = {
+                (prop.attachpoint, prop.actor.path): prop.actor
+                for prop in previous.props
+            }
+
+        for prop in props:
+            if prop.attrib["actor"] == "":
+                continue
+
+            prop_path = "art/actors/" + prop.attrib["actor"]
+            try:
+                actor = self.plan(
+                    prop_path,
+                    depth + 1,
+                    previous_actors.get((prop.attrib["attachpoint"], prop_path)),
+                )
+            except (OSError, ET.ParseError):
+                self.logger.error("Could not load " + prop_path)
+                continue
+
+            yield PropPlan(prop.attrib["attachpoint"], actor)
+
+    def plan_proxies(self, props, depth):
+        for prop in props:
+            if prop.attrib["actor"] != "":
+                yield ProxyPlan(
+                    prop.attrib["attachpoint"],
+                    "art/actors/" + prop.attrib["actor"],
+                    depth + 1,
+                )
+
+    def should_create_proxies(self, depth):
+        return self.proxy_depth != -1 and depth >= self.proxy_depth
+
+    def should_import_props(self, depth):
+        return self.import_props and (
+            self.import_depth == -1
+            or (self.import_depth > depth and self.import_depth > 0)
+        )
+
+    def choose_variant(self, group, preferred=None):
+        """Pick a variant of a group, weighted by its frequency attribute.
+
+        The variant named preferred is picked if there is one.
+        """
+        variants = list(group)
+        if len(variants) == 1:
+            return variants[0]
+
+        if preferred:
+            for variant in variants:
+                if variant.get("name") == preferred:
+                    return variant
+
+        weights = [get_frequency(variant) for variant in variants]
+        # Without any frequency, every variant is equally likely.
+        if sum(weights) == 0:
+            return self.random.choice(variants)
+
+        return self.random.choices(variants, weights)[0]
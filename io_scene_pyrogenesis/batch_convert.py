@@ -0,0 +1,352 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Convert many actors in parallel background Blender processes.
+
+blender --background --factory-startup --python batch_convert.py -- \\
+    --output converted/ --jobs 8 "art/actors/**/*.xml"
+
+The same command line also works with plain Python, given --blender. The
+actors are shared among --jobs worker processes, each importing one actor at a
+time into an empty scene and exporting it. A worker that exceeds --timeout is
+killed and restarted, failed actors are retried up to --retries times, and the
+outcome of every actor is written to a JSON manifest.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+# Prefix of the lines a worker prints to report the result of a job.
+RESULT_MARKER = "PYROGENESIS_BATCH_RESULT "
+
+EXPORT_EXTENSIONS = {"GLB": ".glb", "GLTF_SEPARATE": ".gltf", "BLEND": ".blend"}
+
+logger = logging.getLogger("PyrogenesisActorImporter.batch_convert")
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="batch_convert", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("actors", nargs="*", help="Actor files or glob patterns")
+    parser.add_argument(
+        "--list", help="File with one actor path per line, added to the actors"
+    )
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument(
+        "--format", choices=sorted(EXPORT_EXTENSIONS), default="GLB", type=str.upper
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="Seconds allowed per actor"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=1, help="Extra attempts for failed actors"
+    )
+    parser.add_argument(
+        "--manifest", help="Results file, defaults to <output>/manifest.json"
+    )
+    parser.add_argument("--blender", help="Blender executable used for the workers")
+    parser.add_argument("--no-props", action="store_true")
+    parser.add_argument("--no-textures", action="store_true")
+    parser.add_argument("--depth", type=int, default=-1, help="Prop depth")
+    parser.add_argument(
+        "--seed", type=int, default=-1, help="Variant seed, -1 for a random choice"
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def get_script_arguments():
+    """Return the arguments meant for this script, after Blender's "--"."""
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1 :]
+
+    return sys.argv[1:]
+
+
+def expand_actors(args):
+    patterns = list(args.actors)
+    if args.list:
+        with open(args.list, encoding="utf-8") as f:
+            patterns.extend(line.strip() for line in f if line.strip())
+
+    actors = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for actor in matches:
+            actor = os.path.abspath(actor)
+            if actor not in seen:
+                seen.add(actor)
+                actors.append(actor)
+
+    return actors
+
+
+def get_output_path(actor, output, export_format):
+    """Mirror the actor's path below its actors folder into output."""
+    normalized = actor.replace("\\", "/")
+    index = normalized.rfind("/actors/")
+    relative = (
+        normalized[index + len("/actors/") :]
+        if index != -1
+        else os.path.basename(normalized)
+    )
+    return os.path.join(
+        output, os.path.splitext(relative)[0] + EXPORT_EXTENSIONS[export_format]
+    )
+
+
+class Worker:
+    """A background Blender process converting the actors it is sent."""
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+        self.lines = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        self.lines = queue.Queue()
+        threading.Thread(
+            target=self.read_output, args=(self.process, self.lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def read_output(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def stop(self):
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def run(self, job, timeout):
+        """Send a job and return its result, or raise TimeoutError."""
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError()
+
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError() from None
+
+            if line is None:
+                raise RuntimeError(
+                    "Blender exited with code " + str(self.process.wait())
+                )
+            if line.startswith(RESULT_MARKER):
+                return json.loads(line[len(RESULT_MARKER) :])
+
+
+def get_worker_command(args, blender):
+    command = [
+        blender,
+        "--background",
+        "--factory-startup",
+        "--python",
+        os.path.abspath(__file__),
+        "--",
+        "--worker",
+        "--output",
+        args.output,
+        "--format",
+        args.format,
+        "--depth",
+        str(args.depth),
+        "--seed",
+        str(args.seed),
+    ]
+    if args.no_props:
+        command.append("--no-props")
+    if args.no_textures:
+        command.append("--no-textures")
+    return command
+
+
+def run_controller(args, blender):
+    actors = expand_actors(args)
+    jobs = queue.Queue()
+    for actor in actors:
+        jobs.put({"actor": actor, "attempts": 0})
+
+    results = []
+    results_lock = threading.Lock()
+
+    def work():
+        worker = Worker(get_worker_command(args, blender))
+        try:
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    return
+
+                job["attempts"] += 1
+                start = time.monotonic()
+                try:
+                    result = worker.run({"actor": job["actor"]}, args.timeout)
+                except TimeoutError:
+                    worker.stop()
+                    result = {"status": "timeout", "error": "Timed out"}
+                except (OSError, RuntimeError) as e:
+                    worker.stop()
+                    result = {"status": "failed", "error": str(e)}
+
+                if result["status"] != "ok" and job["attempts"] <= args.retries:
+                    jobs.put(job)
+                    continue
+
+                result.update(
+                    actor=job["actor"],
+                    attempts=job["attempts"],
+                    seconds=round(time.monotonic() - start, 3),
+                )
+                with results_lock:
+                    results.append(result)
+                    logger.info(
+                        f"[{len(results)}/{len(actors)}] {result['status']}: "
+                        + job["actor"]
+                    )
+        finally:
+            worker.stop()
+
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=work)
+        for _ in range(max(1, min(args.jobs, len(actors))))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest = {
+        "format": args.format,
+        "jobs": args.jobs,
+        "seconds": round(time.monotonic() - start, 3),
+        "succeeded": sum(result["status"] == "ok" for result in results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "results": sorted(results, key=lambda result: result["actor"]),
+    }
+    manifest_path = args.manifest or os.path.join(args.output, "manifest.json")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(
+        f"Converted {manifest['succeeded']} of {len(actors)} actors"
+        f" in {manifest['seconds']}s, manifest written to {manifest_path}"
+    )
+    return 0 if manifest["failed"] == 0 else 1
+
+
+def convert_actor(args, actor):
+    """Import an actor into an empty scene and export it, inside Blender."""
+    import bpy
+
+    # Start from an empty file while keeping the operator registered.
+    bpy.data.batch_remove(
+        [
+            *bpy.data.objects,
+            *bpy.data.meshes,
+            *bpy.data.armatures,
+            *bpy.data.materials,
+            *bpy.data.images,
+            *bpy.data.actions,
+            *bpy.data.collections,
+        ]
+    )
+
+    result = bpy.ops.import_pyrogenesis_scene.xml(
+        filepath=actor,
+        import_props=not args.no_props,
+        import_textures=not args.no_textures,
+        import_depth=args.depth,
+        seed=args.seed,
+    )
+    if "FINISHED" not in result:
+        raise RuntimeError("Import did not finish: " + ", ".join(result))
+
+    output_path = get_output_path(actor, args.output, args.format)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if args.format == "BLEND":
+        bpy.ops.wm.save_as_mainfile(filepath=output_path, copy=True)
+    else:
+        bpy.ops.export_scene.gltf(filepath=output_path, export_format=args.format)
+
+    return output_path
+
+
+def run_worker(args):
+    """Convert the actors received on stdin, one JSON job per line."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import io_scene_pyrogenesis
+
+    io_scene_pyrogenesis.register()
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        try:
+            output_path = convert_actor(args, job["actor"])
+            result = {"status": "ok", "output": output_path}
+        except Exception as e:
+            result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+        print(RESULT_MARKER + json.dumps(result), flush=True)
+
+    return 0
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments(get_script_arguments())
+    try:
+        import bpy
+    except ModuleNotFoundError:
+        bpy = None
+
+    if args.worker:
+        return run_worker(args)
+
+    blender = args.blender or (bpy.app.binary_path if bpy is not None else None)
+    if not blender:
+        logger.error("--blender is required when not running inside Blender")
+        return 2
+
+    return run_controller(args, blender)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .import_pyrogenesis_actor import get_cache_directory
+from .mesh_cache import MeshCache
+from .texture_cache import TextureCache
+import bpy
+import os
+
+
+class ClearPyrogenesisCache(bpy.types.Operator):
+    """Remove the cached meshes, textures and Collada files of the Pyrogenesis importer"""
+
+    bl_label = "Clear Pyrogenesis Cache"
+    bl_idname = "import_pyrogenesis_scene.clear_cache"
+
+    def execute(self, context):
+        removed = MeshCache(get_cache_directory("meshes")).clear()
+        removed += TextureCache(get_cache_directory("textures")).clear()
+
+        collada_path = get_cache_directory("collada")
+        for entry in os.scandir(collada_path):
+            # Temporary files are left by fixes interrupted, e.g. by a crash.
+            if entry.name.endswith((".dae", ".tmp")):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    self.report({"WARNING"}, f"Could not remove {entry.path}: {e}")
+
+        self.report({"INFO"}, f"Removed {removed} cached files")
+        return {"FINISHED"}
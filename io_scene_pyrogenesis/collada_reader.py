@@ -0,0 +1,345 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from typing import NamedTuple
+import numpy as np
+import xml.etree.ElementTree as ET
+
+NAMESPACE = "{http://www.collada.org/2005/11/COLLADASchema}"
+
+
+class MeshData(NamedTuple):
+    """Geometry of a Collada mesh, with every primitive merged together."""
+
+    name: str
+    # (vertex count, 3) positions.
+    positions: np.ndarray
+    # Vertex index of every loop, polygon after polygon.
+    loop_vertices: np.ndarray
+    # Index of the first loop of every polygon.
+    loop_starts: np.ndarray
+    # (loop count, 3) normals, or None.
+    normals: np.ndarray
+    # (loop count, 2) coordinates of each UV set, in set order.
+    uvs: tuple
+
+
+class SkinData(NamedTuple):
+    """A skin controller, binding a mesh to joints."""
+
+    geometry: str
+    bind_shape_matrix: np.ndarray
+    # Joint sids or ids, as referenced by the weights.
+    joints: tuple
+    # Influences as parallel arrays: vertex index, joint index and weight.
+    vertices: np.ndarray
+    joint_indices: np.ndarray
+    weights: np.ndarray
+
+
+class NodeData(NamedTuple):
+    """A node of the visual scene."""
+
+    id: str
+    name: str
+    sid: str
+    is_joint: bool
+    # 4x4 transform relative to the parent node.
+    matrix: np.ndarray
+    children: tuple
+    # ("geometry" or "controller", id of the instantiated element), or None.
+    instance: tuple
+
+
+class ColladaScene(NamedTuple):
+    geometries: dict
+    controllers: dict
+    nodes: tuple
+    up_axis: str
+    # Length of a unit in meters.
+    unit: float
+
+
+def strip(tag):
+    return tag[len(NAMESPACE) :] if tag.startswith(NAMESPACE) else tag
+
+
+def parse_floats(element):
+    return np.array((element.text or "").split(), dtype=np.float64)
+
+
+def parse_ints(element):
+    return np.array((element.text or "").split(), dtype=np.int64)
+
+
+def read_url(url):
+    return url[1:] if url.startswith("#") else url
+
+
+class ColladaReader:
+    """Read the subset of Collada exported for 0 A.D. into NumPy arrays.
+
+    Supported are <triangles> and <polylist> meshes with positions, normals and
+    up to two UV sets, skin controllers and node hierarchies. Anything else
+    raises a ValueError, e.g. so that the Collada importer is used instead.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.sources = {}
+        for source in self.iter("source"):
+            self.sources[source.get("id")] = source
+
+    @classmethod
+    def read(cls, f):
+        """Return the ColladaScene of a binary file object."""
+        return cls(ET.parse(f).getroot()).get_scene()
+
+    def iter(self, tag, element=None):
+        return (element if element is not None else self.root).iter(NAMESPACE + tag)
+
+    def find(self, element, path):
+        return element.find("/".join(NAMESPACE + tag for tag in path.split("/")))
+
+    def findall(self, element, tag):
+        return element.findall(NAMESPACE + tag)
+
+    def get_scene(self):
+        up_axis = "Z_UP"
+        unit = 1.0
+        asset = self.find(self.root, "asset")
+        if asset is not None:
+            up_axis_element = self.find(asset, "up_axis")
+            if up_axis_element is not None:
+                up_axis = up_axis_element.text.strip()
+            unit_element = self.find(asset, "unit")
+            if unit_element is not None:
+                unit = float(unit_element.get("meter", 1.0))
+
+        geometries = {
+            geometry.get("id"): self.read_geometry(geometry)
+            for geometry in self.iter("geometry")
+        }
+        controllers = {
+            controller.get("id"): self.read_skin(controller)
+            for controller in self.iter("controller")
+        }
+
+        scene = next(self.iter("visual_scene"), None)
+        if scene is None:
+            raise ValueError("No visual scene")
+
+        nodes = tuple(self.read_node(node) for node in self.findall(scene, "node"))
+        return ColladaScene(geometries, controllers, nodes, up_axis, unit)
+
+    def read_source(self, url):
+        """Return the accessor values of a source as a (count, params) array."""
+        source = self.sources.get(read_url(url))
+        if source is None:
+            raise ValueError("Missing source " + url)
+
+        accessor = self.find(source, "technique_common/accessor")
+        float_array = self.find(source, "float_array")
+        if float_array is None or accessor is None:
+            raise ValueError("Unsupported source " + url)
+
+        values = parse_floats(float_array)
+        stride = int(accessor.get("stride", 1))
+        count = int(accessor.get("count", len(values) // stride))
+        params = len(self.findall(accessor, "param")) or stride
+        return values[: count * stride].reshape(count, stride)[:, :params]
+
+    def read_geometry(self, geometry):
+        mesh = self.find(geometry, "mesh")
+        if mesh is None:
+            raise ValueError("Unsupported geometry " + str(geometry.get("id")))
+
+        vertices = self.find(mesh, "vertices")
+        positions = None
+        vertex_normals = None
+        for vertex_input in self.findall(vertices, "input"):
+            if vertex_input.get("semantic") == "POSITION":
+                positions = self.read_source(vertex_input.get("source"))
+            elif vertex_input.get("semantic") == "NORMAL":
+                vertex_normals = self.read_source(vertex_input.get("source"))
+        if positions is None:
+            raise ValueError("No positions in " + str(geometry.get("id")))
+
+        loop_vertices = []
+        loop_counts = []
+        normals = []
+        uvs = {}
+        for primitive in mesh:
+            tag = strip(primitive.tag)
+            if tag in ("source", "vertices", "extra"):
+                continue
+            if tag not in ("triangles", "polylist"):
+                raise ValueError("Unsupported primitive " + tag)
+
+            inputs = self.findall(primitive, "input")
+            stride = max(int(item.get("offset", 0)) for item in inputs) + 1
+            p = self.find(primitive, "p")
+            indices = (
+                parse_ints(p).reshape(-1, stride)
+                if p is not None
+                else np.empty((0, stride), np.int64)
+            )
+
+            if tag == "triangles":
+                loop_counts.append(np.full(len(indices) // 3, 3, np.int64))
+            else:
+                vcount = self.find(primitive, "vcount")
+                if vcount is None:
+                    raise ValueError("No vcount in a polylist")
+                loop_counts.append(parse_ints(vcount))
+
+            primitive_uvs = []
+            primitive_normals = None
+            for item in inputs:
+                semantic = item.get("semantic")
+                column = indices[:, int(item.get("offset", 0))]
+                if semantic == "VERTEX":
+                    loop_vertices.append(column)
+                    if vertex_normals is not None:
+                        primitive_normals = vertex_normals[column]
+                elif semantic == "NORMAL":
+                    primitive_normals = self.read_source(item.get("source"))[column]
+                elif semantic == "TEXCOORD":
+                    primitive_uvs.append(
+                        (
+                            int(item.get("set", len(primitive_uvs))),
+                            self.read_source(item.get("source"))[column, :2],
+                        )
+                    )
+
+            normals.append(primitive_normals)
+            for index, (_, coordinates) in enumerate(
+                sorted(primitive_uvs, key=lambda item: item[0])[:2]
+            ):
+                uvs.setdefault(index, []).append(coordinates)
+
+        if not loop_vertices:
+            raise ValueError("No polygons in " + str(geometry.get("id")))
+
+        loop_counts = np.concatenate(loop_counts)
+        loop_starts = np.zeros(len(loop_counts), np.int64)
+        np.cumsum(loop_counts[:-1], out=loop_starts[1:])
+        primitive_count = len(loop_vertices)
+        return MeshData(
+            geometry.get("name") or geometry.get("id"),
+            positions,
+            np.concatenate(loop_vertices),
+            loop_starts,
+            np.concatenate(normals) if all(n is not None for n in normals) else None,
+            tuple(
+                np.concatenate(coordinates)
+                for coordinates in uvs.values()
+                if len(coordinates) == primitive_count
+            ),
+        )
+
+    def read_skin(self, controller):
+        skin = self.find(controller, "skin")
+        if skin is None:
+            raise ValueError("Unsupported controller " + str(controller.get("id")))
+
+        bind_shape_matrix = np.identity(4)
+        bind_shape = self.find(skin, "bind_shape_matrix")
+        if bind_shape is not None:
+            bind_shape_matrix = parse_floats(bind_shape).reshape(4, 4)
+
+        vertex_weights = self.find(skin, "vertex_weights")
+        joints = ()
+        weight_values = None
+        joint_offset = weight_offset = 0
+        inputs = self.findall(vertex_weights, "input")
+        for item in inputs:
+            source = self.sources.get(read_url(item.get("source")))
+            if item.get("semantic") == "JOINT":
+                joint_offset = int(item.get("offset", 0))
+                names = self.find(source, "Name_array")
+                if names is None:
+                    names = self.find(source, "IDREF_array")
+                joints = tuple((names.text or "").split())
+            elif item.get("semantic") == "WEIGHT":
+                weight_offset = int(item.get("offset", 0))
+                weight_values = self.read_source(item.get("source"))[:, 0]
+
+        if weight_values is None:
+            raise ValueError("No weights in " + str(controller.get("id")))
+
+        stride = max(int(item.get("offset", 0)) for item in inputs) + 1
+        counts = parse_ints(self.find(vertex_weights, "vcount"))
+        pairs = parse_ints(self.find(vertex_weights, "v")).reshape(-1, stride)
+        vertices = np.repeat(np.arange(len(counts)), counts)
+        joint_indices = pairs[:, joint_offset]
+        # A joint index of -1 refers to the bind shape itself.
+        bound = joint_indices >= 0
+        return SkinData(
+            read_url(skin.get("source")),
+            bind_shape_matrix,
+            joints,
+            vertices[bound],
+            joint_indices[bound],
+            weight_values[pairs[bound, weight_offset]],
+        )
+
+    def read_node(self, node):
+        matrix = np.identity(4)
+        instance = None
+        children = []
+        for child in node:
+            tag = strip(child.tag)
+            if tag == "matrix":
+                matrix = matrix @ parse_floats(child).reshape(4, 4)
+            elif tag == "translate":
+                translation = np.identity(4)
+                translation[:3, 3] = parse_floats(child)
+                matrix = matrix @ translation
+            elif tag == "rotate":
+                matrix = matrix @ get_rotation_matrix(parse_floats(child))
+            elif tag == "scale":
+                matrix = matrix @ np.diag([*parse_floats(child), 1.0])
+            elif tag == "node":
+                children.append(self.read_node(child))
+            elif tag == "instance_geometry":
+                instance = ("geometry", read_url(child.get("url")))
+            elif tag == "instance_controller":
+                instance = ("controller", read_url(child.get("url")))
+            elif tag == "instance_node":
+                raise ValueError("Unsupported instance_node")
+
+        return NodeData(
+            node.get("id"),
+            node.get("name") or node.get("id") or "Node",
+            node.get("sid"),
+            node.get("type") == "JOINT",
+            matrix,
+            tuple(children),
+            instance,
+        )
+
+
+def get_rotation_matrix(axis_angle):
+    """Return the 4x4 matrix of an (x, y, z, degrees) rotation."""
+    axis = axis_angle[:3] / (np.linalg.norm(axis_angle[:3]) or 1.0)
+    angle = np.radians(axis_angle[3])
+    x, y, z = axis
+    cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    matrix = np.identity(4)
+    matrix[:3, :3] = (
+        np.identity(3) * np.cos(angle)
+        + np.sin(angle) * cross
+        + (1 - np.cos(angle)) * np.outer(axis, axis)
+    )
+    return matrix
+
+
+def get_axis_conversion(up_axis):
+    """Return the matrix turning a Collada up axis into Blender's Z up."""
+    if up_axis == "Y_UP":
+        return get_rotation_matrix(np.array([1.0, 0.0, 0.0, 90.0]))
+    if up_axis == "X_UP":
+        return get_rotation_matrix(np.array([0.0, 1.0, 0.0, -90.0]))
+    return np.identity(4)
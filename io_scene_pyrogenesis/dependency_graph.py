@@ -0,0 +1,186 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .actor_plan import ActorPlan, DecalPlan, PropPlan, ProxyPlan, TexturePlan
+from .pmd_reader import find_pmd
+import json
+
+# Bump when the stored layout changes, to ignore older graphs.
+GRAPH_VERSION = 1
+
+
+def describe_plan(plan):
+    """Return an ActorPlan as JSON-compatible data."""
+    return {
+        "path": plan.path,
+        "material": plan.material,
+        "meshes": list(plan.meshes),
+        "decals": [list(decal) for decal in plan.decals],
+        "textures": [list(texture) for texture in plan.textures],
+        "props": [[prop.attachpoint, describe_plan(prop.actor)] for prop in plan.props],
+        "depth": plan.depth,
+        "proxies": [list(proxy) for proxy in plan.proxies],
+        "variants": list(plan.variants),
+        "sources": list(plan.sources),
+    }
+
+
+def read_plan(description):
+    """Return the ActorPlan of data made by describe_plan."""
+    return ActorPlan(
+        description["path"],
+        description["material"],
+        tuple(description["meshes"]),
+        tuple(DecalPlan(*decal) for decal in description["decals"]),
+        tuple(TexturePlan(*texture) for texture in description["textures"]),
+        tuple(
+            PropPlan(attachpoint, read_plan(actor))
+            for attachpoint, actor in description["props"]
+        ),
+        description["depth"],
+        tuple(ProxyPlan(*proxy) for proxy in description["proxies"]),
+        tuple(description["variants"]),
+        tuple(description["sources"]),
+    )
+
+
+def find_node(plan, node):
+    """Return the (attach point, plan) of a node, e.g. "0/2" for the third prop."""
+    attachpoint = "root"
+    for index in node.split("/")[1:]:
+        prop = plan.props[int(index)]
+        attachpoint, plan = prop.attachpoint, prop.actor
+    return attachpoint, plan
+
+
+def get_own_content(plan):
+    """Return what building an actor depends on, its props' plans excepted."""
+    return (
+        plan.path,
+        plan.material,
+        plan.meshes,
+        plan.decals,
+        plan.textures,
+        plan.proxies,
+        tuple((prop.attachpoint, prop.actor.path) for prop in plan.props),
+    )
+
+
+def get_stale_nodes(old_plan, new_plan, changed_files, node="0"):
+    """Return the nodes whose objects must be built again, parents first.
+
+    An actor is stale when its plan differs or one of its meshes changed, in
+    which case its props are built again with it and are not listed.
+    """
+    if get_own_content(old_plan) != get_own_content(new_plan) or any(
+        mesh in changed_files for mesh in new_plan.meshes
+    ):
+        return [node]
+
+    stale_nodes = []
+    for index, (old_prop, new_prop) in enumerate(zip(old_plan.props, new_plan.props)):
+        stale_nodes.extend(
+            get_stale_nodes(
+                old_prop.actor, new_prop.actor, changed_files, f"{node}/{index}"
+            )
+        )
+    return stale_nodes
+
+
+def get_identity(vfs, path):
+    try:
+        return list(vfs.identify(path))
+    except FileNotFoundError:
+        return None
+
+
+class DependencyGraph:
+    """What an imported actor was built from, to build again only what changed.
+
+    Holds the plan with its chosen variants, the identity of every actor,
+    variant, mesh and texture file it was resolved from, the names of the
+    images loaded for its textures and the settings to plan and build it with.
+    """
+
+    def __init__(self, plan, mounts, settings, files, pmds, images):
+        self.plan = plan
+        # [path, priority, prefix] of each mount, as VirtualFileSystem lists them.
+        self.mounts = mounts
+        self.settings = settings
+        # Virtual path -> identity, None for files that were missing.
+        self.files = files
+        # Mesh path -> path of the PMD model read instead.
+        self.pmds = pmds
+        # Texture path -> name of its image.
+        self.images = images
+
+    @classmethod
+    def create(cls, vfs, plan, settings, image_names, use_pmd=True):
+        paths = set()
+        pmds = {}
+        images = {}
+        for actor in plan.walk():
+            paths.update(actor.sources)
+            paths.update(actor.meshes)
+            for texture in actor.textures:
+                paths.add(texture.path)
+                if texture.path in image_names:
+                    images[texture.path] = image_names[texture.path]
+
+            for mesh in actor.meshes:
+                pmd_path = find_pmd(vfs, mesh) if use_pmd else None
+                if pmd_path is not None:
+                    paths.add(pmd_path)
+                    pmds[mesh] = pmd_path
+
+        return cls(
+            plan,
+            vfs.get_mount_list(),
+            settings,
+            {path: get_identity(vfs, path) for path in sorted(paths)},
+            pmds,
+            images,
+        )
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "version": GRAPH_VERSION,
+                "plan": describe_plan(self.plan),
+                "mounts": self.mounts,
+                "settings": self.settings,
+                "files": self.files,
+                "pmds": self.pmds,
+                "images": self.images,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        if data.get("version") != GRAPH_VERSION:
+            raise ValueError("Unsupported dependency graph version")
+
+        return cls(
+            read_plan(data["plan"]),
+            data["mounts"],
+            data["settings"],
+            data["files"],
+            data["pmds"],
+            data["images"],
+        )
+
+    def get_changed_files(self, vfs):
+        """Return the paths of the files that changed since the graph was made.
+
+        Meshes count as changed when the PMD model read instead of them did.
+        """
+        changed = {
+            path
+            for path, identity in self.files.items()
+            if get_identity(vfs, path) != identity
+        }
+        changed.update(mesh for mesh, pmd in self.pmds.items() if pmd in changed)
+        return changed
@@ -0,0 +1,109 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .actor_plan import ActorPlanner
+from .import_pyrogenesis_actor import create_builder, get_cache_directory
+from .import_session import ImportSession
+from .scene_builder import (
+    ActorSceneBuilder,
+    PROXY_ACTOR_PROPERTY,
+    PROXY_DEPTH_PROPERTY,
+    PROXY_MOUNTS_PROPERTY,
+    PROXY_SETTINGS_PROPERTY,
+)
+from .vfs import VirtualFileSystem
+import bpy
+import json
+import logging
+import xml.etree.ElementTree as ET
+
+
+class ExpandPyrogenesisProxies(bpy.types.Operator):
+    """Import the props standing behind Pyrogenesis proxies"""
+
+    bl_label = "Expand Pyrogenesis Proxies"
+    bl_idname = "import_pyrogenesis_scene.expand_proxies"
+    bl_options = {"REGISTER", "UNDO"}
+
+    expand_all: bpy.props.BoolProperty(
+        name="All proxies",
+        description="Expand every proxy of the scene rather than the selected ones",
+        default=False,
+    )  # type: ignore
+
+    levels: bpy.props.IntProperty(
+        name="Levels",
+        description=(
+            "How many levels of props to import, deeper ones being proxies again,"
+            " -1 for all"
+        ),
+        default=-1,
+        min=-1,
+    )  # type: ignore
+
+    def __init__(self):
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
+
+    def execute(self, context):
+        objects = context.scene.objects if self.expand_all else context.selected_objects
+        proxies = [obj for obj in objects if PROXY_ACTOR_PROPERTY in obj]
+        if not proxies:
+            self.report({"WARNING"}, "No Pyrogenesis proxies to expand")
+            return {"CANCELLED"}
+
+        # Proxies of the same import share their mods and settings, thus
+        # builder caches.
+        proxies_by_import = {}
+        for proxy in proxies:
+            key = (proxy[PROXY_MOUNTS_PROPERTY], proxy.get(PROXY_SETTINGS_PROPERTY))
+            proxies_by_import.setdefault(key, []).append(proxy)
+
+        expanded = 0
+        with ImportSession(context):
+            for (mounts, settings), group in proxies_by_import.items():
+                with VirtualFileSystem(get_cache_directory("vfs")) as vfs:
+                    try:
+                        for path, priority, prefix in json.loads(mounts):
+                            vfs.mount(path, priority, prefix)
+                    except OSError as e:
+                        self.report(
+                            {"ERROR"}, "Could not mount the mods of a proxy: " + str(e)
+                        )
+                        continue
+
+                    expanded += self.expand_proxies(
+                        vfs, json.loads(settings) if settings else None, group
+                    )
+
+        self.report({"INFO"}, f"Expanded {expanded} of {len(proxies)} proxies")
+        return {"FINISHED"}
+
+    def expand_proxies(self, vfs, settings, proxies):
+        """Expand proxies with the settings of their import, or the defaults."""
+        if settings is None:
+            # Proxies of imports older than stored settings.
+            planner = ActorPlanner(vfs)
+            builder = ActorSceneBuilder(vfs, get_cache_directory("collada"))
+        else:
+            planner = ActorPlanner(vfs, **settings["planner"])
+            builder = create_builder(vfs, settings)
+        expanded = 0
+        try:
+            for proxy in proxies:
+                depth = proxy[PROXY_DEPTH_PROPERTY]
+                planner.proxy_depth = (
+                    -1 if self.levels == -1 else depth + max(self.levels, 1) - 1
+                )
+                try:
+                    plan = planner.plan(proxy[PROXY_ACTOR_PROPERTY], depth)
+                except (OSError, ET.ParseError):
+                    self.logger.error("Could not load " + proxy[PROXY_ACTOR_PROPERTY])
+                    continue
+
+                builder.expand_proxy(proxy, plan)
+                expanded += 1
+        finally:
+            builder.finish()
+
+        return expanded
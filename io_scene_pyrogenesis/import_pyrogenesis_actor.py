@@ -2,14 +2,114 @@
 # This file is part of 0 A.D.
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-from .max_collada_fixer import MaxColladaFixer
+from .actor_plan import ActorPlanner
+from .import_session import ImportSession, suspend_undo
+from .mesh_cache import MeshCache
+from .profiling import ImportProfiler
+from .scene_builder import ActorSceneBuilder
+from .texture_cache import TextureCache
+from .texture_prefetch import TexturePrefetcher
+from .vfs import VirtualFileSystem, get_art_root, get_mount_prefix
 import bpy
 import bpy_extras
+import concurrent.futures
+import contextlib
 import logging
-import math
 import os
-import random
-import xml.etree.ElementTree as ET
+import tempfile
+import time
+
+
+def get_cache_directory(name):
+    """Return a writable directory for the given kind of cached files."""
+    try:
+        return bpy.utils.extension_path_user(__package__, path=name, create=True)
+    except ValueError:
+        # Installed as a legacy add-on, there is no extension user directory.
+        path = os.path.join(tempfile.gettempdir(), "io_scene_pyrogenesis", name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+
+def get_mesh_cache(max_size):
+    """Return the mesh cache holding up to max_size bytes, or None without one."""
+    if max_size is None:
+        return None
+    return MeshCache(get_cache_directory("meshes"), max_size)
+
+
+def get_texture_cache(reduction):
+    """Return the texture cache of a (mip level, max size) reduction, or None."""
+    if reduction is None:
+        return None
+    return TextureCache(get_cache_directory("textures"), *reduction)
+
+
+def create_builder(vfs, settings, profiler=None):
+    """Return an ActorSceneBuilder for settings made by get_settings."""
+    builder = ActorSceneBuilder(
+        vfs,
+        get_cache_directory("collada"),
+        profiler=profiler,
+        mesh_cache=get_mesh_cache(settings["mesh_cache_size"]),
+        # Imports older than texture reduction have no such setting.
+        texture_cache=get_texture_cache(settings.get("texture_reduction")),
+        **settings["builder"],
+    )
+    builder.settings = settings
+    return builder
+
+
+def mount_mods(art_root, additional_mods, engine_cache, report):
+    """Mount an art folder above the additional mods and the engine cache.
+
+    additional_mods are separated by ";", highest priority first, and missing
+    folders are reported with report, e.g. an operator's.
+    """
+    vfs = VirtualFileSystem(get_cache_directory("vfs"))
+    mods = [path.strip() for path in additional_mods.split(";")]
+    mods = [path for path in mods if path]
+    try:
+        vfs.mount(art_root, priority=len(mods) + 1, prefix="art/")
+        for index, path in enumerate(mods):
+            path = bpy.path.abspath(path)
+            if not os.path.exists(path):
+                report({"WARNING"}, "Mod not found: " + path)
+                continue
+
+            # An art folder itself is mounted below "art/", like the actor's one.
+            vfs.mount(path, priority=len(mods) - index, prefix=get_mount_prefix(path))
+
+        if engine_cache:
+            path = bpy.path.abspath(engine_cache)
+            if os.path.isdir(path):
+                # The game reads converted files below "cache/" too.
+                vfs.mount(path, priority=0, prefix="cache/")
+            else:
+                report({"WARNING"}, "Engine cache not found: " + path)
+    except BaseException:
+        # E.g. an invalid archive, the ones already mounted must be closed.
+        vfs.close()
+        raise
+
+    return vfs
+
+
+def plan_actors(vfs, actor_path, settings, seed, variation_count, profiler):
+    """Return the plans of variation_count distinct variations of an actor.
+
+    Fewer plans are returned when the actor has fewer variations. No bpy data
+    is used, so that planning can run in a worker thread.
+    """
+    planner = ActorPlanner(
+        vfs,
+        seed=None if seed == -1 else seed,
+        profiler=profiler,
+        **settings["planner"],
+    )
+    if variation_count > 1:
+        return planner.plan_variations(actor_path, variation_count)
+    return [planner.plan(actor_path)]
 
 
 class ImportPyrogenesisActor(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
@@ -17,7 +117,6 @@ class ImportPyrogenesisActor(bpy.types.Operator, bpy_extras.io_utils.ImportHelpe
 
     bl_label = "Import Pyrogenesis Actor"
     bl_idname = "import_pyrogenesis_scene.xml"
-    currentPath = ""
     filter_glob: bpy.props.StringProperty(default="*.xml", options={"HIDDEN"})  # type: ignore
 
     import_props: bpy.props.BoolProperty(
@@ -38,679 +137,512 @@ class ImportPyrogenesisActor(bpy.types.Operator, bpy_extras.io_utils.ImportHelpe
         default=-1,
     )  # type: ignore
 
-    def __init__(self):
-        self.logger = logging.getLogger("PyrogenesisActorImporter")
+    proxy_depth: bpy.props.IntProperty(
+        name="Proxy Depth",
+        description=(
+            "Props deeper than this are created as empties to expand later,"
+            " -1 to import them all"
+        ),
+        default=-1,
+        min=-1,
+    )  # type: ignore
 
-    def draw(self, context):
-        layout = self.layout
+    texture_mip_level: bpy.props.IntProperty(
+        name="Texture Mip Level",
+        description=(
+            "How many times to halve the size of the textures, using the mip"
+            " levels of DDS files, for previews"
+        ),
+        default=0,
+        min=0,
+        max=12,
+    )  # type: ignore
 
-        layout.prop(self, "import_props")
-        layout.prop(self, "import_textures")
-        layout.prop(self, "import_depth")
+    max_texture_size: bpy.props.IntProperty(
+        name="Max Texture Size",
+        description=(
+            "Largest width or height of the textures in pixels, larger ones are"
+            " halved until they fit, 0 for no limit"
+        ),
+        default=0,
+        min=0,
+        subtype="PIXEL",
+    )  # type: ignore
 
-    def execute(self, context):
-        return self.import_pyrogenesis_actor(context)
-
-    def find_parent_armature(self, bone):
-        for armature in bpy.data.armatures:
-            for armature_bone in armature.bones:
-                if bone.name == armature_bone.name:
-                    for obj in bpy.data.objects:
-                        if (
-                            hasattr(obj, "data")
-                            and hasattr(obj.data, "name")
-                            and obj.data.name == armature.name
-                        ):
-                            return obj
+    mesh_reader: bpy.props.EnumProperty(
+        name="Mesh Reader",
+        description="How Collada meshes are read",
+        items=(
+            (
+                "NATIVE",
+                "Native",
+                "Read meshes, skins and prop points directly into mesh data",
+            ),
+            (
+                "COLLADA_IMPORT",
+                "Collada Importer",
+                "Clean up the files and use Blender's Collada importer",
+            ),
+        ),
+        default="NATIVE",
+    )  # type: ignore
 
-        return None
+    use_mesh_cache: bpy.props.BoolProperty(
+        name="Cache meshes",
+        description="Keep natively read meshes in a binary cache for later imports",
+        default=True,
+    )  # type: ignore
 
-    def set_copy_transform_constraint(self, obj, parent):
-        """Set constraints for props so that they fit their prop point."""
-
-        if str(type(parent)) == "<class 'bpy_types.Bone'>":
-            armature = self.find_parent_armature(parent)
-            self.logger.debug(obj.name + " -> " + armature.name + " -> " + parent.name)
-            constraint = obj.constraints.new("COPY_LOCATION")
-            constraint.show_expanded = False
-            constraint.mute = False
-            constraint.target = armature
-            constraint.subtarget = parent.name
-            constraint2 = obj.constraints.new("COPY_ROTATION")
-            constraint2.show_expanded = False
-            constraint2.mute = False
-            constraint2.target = armature
-            constraint2.subtarget = parent.name
-            return
+    mesh_cache_size: bpy.props.IntProperty(
+        name="Mesh Cache Size",
+        description="Megabytes the mesh cache may use before the oldest files go",
+        default=1024,
+        min=1,
+    )  # type: ignore
 
-        self.logger.debug(obj.name + " -> " + parent.name)
-        constraint = obj.constraints.new("COPY_LOCATION")
-        constraint.show_expanded = False
-        constraint.mute = False
-        constraint.target = parent
-        constraint2 = obj.constraints.new("COPY_ROTATION")
-        constraint2.show_expanded = False
-        constraint2.mute = False
-        constraint2.target = parent
-        obj.parent = parent
-
-    def create_new_material(self, textures, material):
-        mname = None
-        for texture in textures:
-            if texture.split("|")[0] == "baseTex":
-                mname = os.path.basename(texture.split("|")[1])
-                break
-
-        if mname is None:
-            mname = os.path.basename(textures[0].split("|")[1])
-
-        if bpy.data.materials.get(mname) is not None:
-            return mname
-
-        mat = bpy.data.materials.new(name=mname)
-        mat.use_nodes = True
-        bsdf = mat.node_tree.nodes["Principled BSDF"]
-
-        for texture in textures:
-            fname = os.path.basename(texture.split("|")[1])
-            self.logger.debug(fname)
-            if fname not in bpy.data.images:
-                continue
+    use_pmd: bpy.props.BoolProperty(
+        name="Use PMD models",
+        description=(
+            "Read the game's converted PMD model of a mesh instead of its Collada"
+            " file when one exists"
+        ),
+        default=True,
+    )  # type: ignore
 
-            texImage = mat.node_tree.nodes.new("ShaderNodeTexImage")
-            texImage.image = bpy.data.images[fname]
-            if texture.split("|")[0] == "baseTex":
-                mat.node_tree.links.new(
-                    bsdf.inputs["Base Color"], texImage.outputs["Color"]
-                )
+    engine_cache: bpy.props.StringProperty(
+        name="Engine Cache",
+        description=(
+            "The game's cache folder of the mod to find converted PMD models in,"
+            " e.g. ~/.cache/0ad/cache/mods/public"
+        ),
+        default="",
+        subtype="DIR_PATH",
+    )  # type: ignore
 
-                if "player_trans" in material:
-                    color_node = mat.node_tree.nodes.new("ShaderNodeRGB")
-                    color_node.outputs[0].default_value = (1, 0.213477, 0.0543914, 1)
-                    multiply_node = mat.node_tree.nodes.new("ShaderNodeMixRGB")
-                    multiply_node.blend_type = "MULTIPLY"
-                    invert_node = mat.node_tree.nodes.new("ShaderNodeInvert")
-                    mat.node_tree.links.new(
-                        invert_node.inputs["Color"], texImage.outputs["Alpha"]
-                    )
-                    mat.node_tree.links.new(
-                        multiply_node.inputs[1], texImage.outputs["Color"]
-                    )
-                    mat.node_tree.links.new(
-                        multiply_node.inputs[2], color_node.outputs["Color"]
-                    )
-                    mat.node_tree.links.new(
-                        multiply_node.inputs[0], invert_node.outputs["Color"]
-                    )
-                    mat.node_tree.links.new(
-                        bsdf.inputs["Base Color"], multiply_node.outputs["Color"]
-                    )
-
-                elif "basic_trans" in material:
-                    mix_shader_node = mat.node_tree.nodes.new("ShaderNodeMixShader")
-                    transparent_node = mat.node_tree.nodes.new(
-                        "ShaderNodeBsdfTransparent"
-                    )
-                    mat.node_tree.links.new(
-                        mix_shader_node.inputs[0], texImage.outputs["Alpha"]
-                    )
-                    mat.node_tree.links.new(
-                        mix_shader_node.inputs[2], bsdf.outputs["BSDF"]
-                    )
-                    mat.node_tree.links.new(
-                        mix_shader_node.inputs[1], transparent_node.outputs["BSDF"]
-                    )
-
-                    output_node = mat.node_tree.nodes.get("Material Output")
-                    mat.node_tree.links.new(
-                        output_node.inputs["Surface"], mix_shader_node.outputs["Shader"]
-                    )
-                    mat.blend_method = "CLIP"
+    collada_fixer: bpy.props.EnumProperty(
+        name="Collada Fixer",
+        description="How Collada files are cleaned up before being imported",
+        items=(
+            (
+                "STREAM",
+                "Streaming",
+                "Drop materials in a single pass with bounded memory",
+            ),
+            (
+                "TREE",
+                "Tree",
+                "Load, sort and re-indent the whole document",
+            ),
+        ),
+        default="STREAM",
+    )  # type: ignore
 
-                continue
+    instance_meshes: bpy.props.BoolProperty(
+        name="Instance meshes",
+        description="Share mesh data between repeated uses of the same mesh file",
+        default=True,
+    )  # type: ignore
 
-            if texture.split("|")[0] == "normTex":
-                texImage.image.colorspace_settings.name = "Non-Color"
-                normal_node = mat.node_tree.nodes.new("ShaderNodeNormalMap")
-                separate_node = mat.node_tree.nodes.new("ShaderNodeSeparateXYZ")
-                invert_node = mat.node_tree.nodes.new("ShaderNodeInvert")
-                join_node = mat.node_tree.nodes.new("ShaderNodeCombineXYZ")
+    construction_mode: bpy.props.EnumProperty(
+        name="Construction",
+        description="How imported objects are transformed and cleaned up",
+        items=(
+            (
+                "DATA",
+                "Data API",
+                "Apply transforms and clear materials through the data API",
+            ),
+            (
+                "OPERATORS",
+                "Operators",
+                "Use selection based operators such as transform_apply",
+            ),
+        ),
+        default="DATA",
+    )  # type: ignore
 
-                mat.node_tree.links.new(
-                    separate_node.inputs["Vector"], texImage.outputs["Color"]
-                )
-                # Direct X normals need to have their Y channel inverted for OpenGL
-                mat.node_tree.links.new(
-                    invert_node.inputs["Color"], separate_node.outputs["Y"]
-                )
-                mat.node_tree.links.new(
-                    join_node.inputs["X"], separate_node.outputs["X"]
-                )
-                mat.node_tree.links.new(
-                    join_node.inputs["Z"], separate_node.outputs["Z"]
-                )
-                mat.node_tree.links.new(
-                    join_node.inputs["Y"], invert_node.outputs["Color"]
-                )
-                mat.node_tree.links.new(
-                    normal_node.inputs["Color"], join_node.outputs["Vector"]
-                )
-                mat.node_tree.links.new(
-                    bsdf.inputs["Normal"], normal_node.outputs["Normal"]
-                )
-                continue
+    seed: bpy.props.IntProperty(
+        name="Seed",
+        description="Seed of the variant choice, -1 to choose differently every time",
+        default=-1,
+        min=-1,
+    )  # type: ignore
 
-            if texture.split("|")[0] == "specTex":
-                texImage.image.colorspace_settings.name = "Non-Color"
-                mat.node_tree.links.new(
-                    bsdf.inputs["Specular IOR Level"], texImage.outputs["Color"]
-                )
+    variation_count: bpy.props.IntProperty(
+        name="Variations",
+        description="How many distinct variant combinations of the actor to import",
+        default=1,
+        min=1,
+    )  # type: ignore
 
-        return mat.name
+    variation_spacing: bpy.props.FloatProperty(
+        name="Variation Spacing",
+        description="Distance between the variations",
+        default=5.0,
+        min=0.0,
+        subtype="DISTANCE",
+    )  # type: ignore
 
-    def assign_material_to_object(self, ob, material_name):
-        """Assigns a given material name to an object."""
+    additional_mods: bpy.props.StringProperty(
+        name="Additional mods",
+        description=(
+            "Mod folders or archives to read missing files from, separated by"
+            ' ";" and highest priority first, e.g. the public mod or public.zip'
+        ),
+        default="",
+    )  # type: ignore
 
-        # Get any exiting material with that name
-        mat = bpy.data.materials.get(material_name)
-        if mat is None:
-            # No material, create.
-            mat = bpy.data.materials.new(name=material_name)
-        if ob.data.materials:
-            # Assign to 1st material slot.
-            ob.data.materials[0] = mat
-        else:
-            # No slots, append.
-            ob.data.materials.append(mat)
+    log_level: bpy.props.EnumProperty(
+        name="Log Level",
+        description="Least important messages of the import that are logged",
+        items=(
+            ("DEBUG", "Debug", "Log every step, e.g. each constraint"),
+            ("INFO", "Info", "Log each stage and loaded file"),
+            ("WARNING", "Warning", "Only log problems"),
+        ),
+        default="WARNING",
+    )  # type: ignore
 
-    def import_pyrogenesis_actor(self, context):
-        self.logger.info("loading " + self.filepath + "...")
+    trace_path: bpy.props.StringProperty(
+        name="Trace File",
+        description=(
+            "Where to write the time of each import stage as a Chrome trace,"
+            " nothing is written when empty"
+        ),
+        default="",
+        subtype="FILE_PATH",
+    )  # type: ignore
 
-        self.currentPath = (self.filepath[0 : self.filepath.find("actors")]).replace(
-            "\\", "/"
-        )
-        root = ET.parse(self.filepath).getroot()
-        self.parse_actor(root)
+    def __init__(self):
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
 
-        return {"FINISHED"}
+    def draw(self, context):
+        layout = self.layout
 
-    def create_custom_mesh(self, objname, px, py, pz, width, depth):
-        # Define arrays for holding data
-        myvertex = []
-        myfaces = []
-
-        # Create all Vertices
-
-        # vertex 0
-        mypoint = [(-width / 2, -depth / 2, 0.01)]
-        myvertex.extend(mypoint)
-
-        # vertex 1
-        mypoint = [(width / 2, -depth / 2, 0.01)]
-        myvertex.extend(mypoint)
-
-        # vertex 2
-        mypoint = [(-width / 2, depth / 2, 0.01)]
-        myvertex.extend(mypoint)
-
-        # vertex 3
-        mypoint = [(width / 2, depth / 2, 0.01)]
-        myvertex.extend(mypoint)
-
-        # -------------------------------------
-        # Create all Faces
-        # -------------------------------------
-        myface = [(0, 1, 3, 2)]
-        myfaces.extend(myface)
-
-        # Generate mesh data
-        mymesh = bpy.data.meshes.new(objname)
-        mymesh.from_pydata(myvertex, [], myfaces)
-        # Calculate the edges
-        mymesh.update(calc_edges=True)
-        myobject = bpy.data.objects.new(objname, mymesh)
-        # Set Location
-        myobject.location.x = px
-        myobject.location.y = py
-        myobject.location.z = pz
-        scene = bpy.context.scene
-        scene.collection.objects.link(myobject)
-
-        return myobject
-
-    def get_element_from_variant(self, root, name):
-        for child in root:
-            if child.tag == name:
-                return child
-
-        # No mesh was found in this variant.
-        if "file" in root.attrib is not None:
-            variantParent = ET.parse(
-                self.currentPath + "variants/" + root.attrib["file"]
-            ).getroot()
-            return self.get_element_from_variant(variantParent, name)
+        layout.prop(self, "import_props")
+        layout.prop(self, "import_textures")
+        row = layout.row()
+        row.enabled = self.import_textures
+        row.prop(self, "texture_mip_level")
+        row = layout.row()
+        row.enabled = self.import_textures
+        row.prop(self, "max_texture_size")
+        layout.prop(self, "import_depth")
+        layout.prop(self, "proxy_depth")
+        layout.prop(self, "mesh_reader")
+        row = layout.row()
+        row.enabled = self.mesh_reader == "NATIVE"
+        row.prop(self, "use_mesh_cache")
+        row = layout.row()
+        row.enabled = self.mesh_reader == "NATIVE" and self.use_mesh_cache
+        row.prop(self, "mesh_cache_size")
+        row = layout.row()
+        row.enabled = self.mesh_reader == "NATIVE"
+        row.prop(self, "use_pmd")
+        row = layout.row()
+        row.enabled = self.mesh_reader == "NATIVE" and self.use_pmd
+        row.prop(self, "engine_cache")
+        row = layout.row()
+        row.enabled = self.mesh_reader == "COLLADA_IMPORT"
+        row.prop(self, "collada_fixer")
+        layout.prop(self, "instance_meshes")
+        layout.prop(self, "construction_mode")
+        layout.prop(self, "seed")
+        layout.prop(self, "variation_count")
+        layout.prop(self, "variation_spacing")
+        layout.prop(self, "additional_mods")
+        layout.prop(self, "log_level")
+        layout.prop(self, "trace_path")
 
-        return None
+    def execute(self, context):
+        profiler = ImportProfiler()
+        with ImportSession(context, getattr(logging, self.log_level)):
+            result = self.import_pyrogenesis_actor(context, profiler)
+        self.report_profile(profiler)
+        return result
+
+    def report_profile(self, profiler):
+        """Log and report the stage times, and write them as a trace if asked to."""
+        profiler.log_summary(self.logger)
+        self.report({"INFO"}, profiler.get_summary())
+        if self.trace_path:
+            trace_path = bpy.path.abspath(self.trace_path)
+            try:
+                profiler.write_trace(trace_path)
+            except OSError as e:
+                self.report({"WARNING"}, "Could not write the trace: " + str(e))
+
+    def get_settings(self):
+        """Return the settings to plan and build the actor again with."""
+        return {
+            "planner": {
+                "import_props": self.import_props,
+                "import_textures": self.import_textures,
+                "import_depth": self.import_depth,
+                "proxy_depth": self.proxy_depth,
+            },
+            "builder": {
+                "collada_fixer": self.collada_fixer,
+                "instance_meshes": self.instance_meshes,
+                "use_operators": self.construction_mode == "OPERATORS",
+                "mesh_reader": self.mesh_reader,
+                "use_pmd": self.use_pmd,
+            },
+            "mesh_cache_size": (
+                self.mesh_cache_size * (1 << 20) if self.use_mesh_cache else None
+            ),
+            "texture_reduction": (
+                (self.texture_mip_level, self.max_texture_size)
+                if self.texture_mip_level > 0 or self.max_texture_size > 0
+                else None
+            ),
+        }
+
+    def prefetch_textures(self, plans, vfs):
+        """Read every texture of the plans in parallel and return the missing ones."""
+        texture_infos = TexturePrefetcher(vfs).prefetch(
+            texture.path
+            for plan in plans
+            for actor in plan.walk()
+            for texture in actor.textures
+        )
+        missing = {path for path, info in texture_infos.items() if not info.exists}
+        self.report_missing_textures(missing, len(texture_infos))
+        return missing
+
+    def report_missing_textures(self, missing, count):
+        if missing:
+            self.logger.warning("Missing textures:\n" + "\n".join(sorted(missing)))
+            self.report(
+                {"WARNING"},
+                f"{len(missing)} of {count} textures could not be read,"
+                " see the console for the list",
+            )
 
-    def get_mesh_from_variant(self, root):
-        return self.get_element_from_variant(root, "mesh")
-
-    def get_textures_from_variant(self, root):
-        child_textures = None
-        for child in root:
-            if child.tag == "textures":
-                child_textures = child
-
-        if "file" in root.attrib is not None:
-            variantParent = ET.parse(
-                self.currentPath + "variants/" + root.attrib["file"]
-            ).getroot()
-            parent_textures = self.get_textures_from_variant(variantParent)
-            if parent_textures is not None and child_textures is not None:
-                for texture in child_textures:
-                    parent_textures.append(texture)
-                return parent_textures
-            else:
-                return child_textures
-
-        return child_textures
-
-    def get_props_from_variant(self, root):
-        childProps = None
-        for child in root:
-            if child.tag == "props":
-                childProps = child
-                break
-
-        if "file" in root.attrib is not None:
-            variantParent = ET.parse(
-                self.currentPath + "variants/" + root.attrib["file"]
-            ).getroot()
-            parentProps = self.get_props_from_variant(variantParent)
-            if parentProps is not None and childProps is not None:
-                for prop in childProps:
-                    parentProps.append(prop)
-                return parentProps
-            else:
-                return childProps
-
-        return childProps
-
-    def mesh_uv_layers_names_update(self, mesh: bpy.types.Mesh):
-        if len(mesh.uv_layers) > 0:
-            self.logger.info("Renaming" + mesh.uv_layers[0].name + " to " + "UVMap")
-            mesh.uv_layers[0].name = "UVMap"
-
-        if len(mesh.uv_layers) > 1:
-            self.logger.info("Renaming" + mesh.uv_layers[1].name + " to " + "AOMap")
-            mesh.uv_layers[1].name = "AOMap"
-
-    def parse_actor(
-        self, root, proppoint="root", parentprops=[], rootObj=None, propDepth=0
-    ):
-        meshprops = []
-        imported_props = []
-        imported_textures = []
-        imported_objects = []
-        material_object = None
-        rootObject = rootObj
-        material_type = "default.xml"
-        for group in root:
-            if group.tag == "material":
-                material_type = group.text
-
-        if rootObj is not None:
-            self.logger.debug("Root object is:" + rootObj.name)
-
-        for group in root:
-            if group.tag == "material":
-                continue
+    def iter_build(self, builder, plans, actor_path):
+        """Build the plans in the steps of ActorSceneBuilder.iter_build_actor."""
+        if self.variation_count > 1:
+            return builder.iter_build_variations(
+                plans,
+                os.path.splitext(os.path.basename(actor_path))[0],
+                self.variation_spacing,
+            )
+        return builder.iter_build_actor(plans[0])
 
-            if len(group) == 0:
-                continue
+    def import_pyrogenesis_actor(self, context, profiler):
+        self.logger.info("loading " + self.filepath + "...")
 
-            variant = group[0]
-            # If there is more than one group pick one randomly.
-            if len(group) > 1:
-                retries = 0
-                while (
-                    "frequency" not in variant.attrib
-                    or variant.attrib["frequency"] == "0"
-                ) and retries < len(group):
-                    variant = group[random.randint(0, len(group) - 1)]
-                    retries = retries + 1
-
-            if "file" in variant.attrib:
-                present_tags = [child.tag for child in variant]
-
-                variantParent = ET.parse(
-                    self.currentPath + "variants/" + variant.attrib["file"]
-                ).getroot()
-                if "mesh" not in present_tags:
-                    mesh_child = self.get_mesh_from_variant(variantParent)
-                    if mesh_child is not None:
-                        variant.append(mesh_child)
-
-                variant_parent_textures = self.get_textures_from_variant(variantParent)
-                if "textures" not in present_tags:
-                    if variant_parent_textures is not None:
-                        variant.append(variant_parent_textures)
-                elif variant_parent_textures is not None:
-                    variant_tags = [
-                        texture.attrib["name"] for texture in variant.find("textures")
-                    ]
-                    for texture in variant_parent_textures:
-                        if (
-                            texture is not None
-                            and texture.attrib["name"] not in variant_tags
-                        ):
-                            variant.find("textures").append(texture)
-
-                variant_parent_props = self.get_props_from_variant(variant)
-                if "props" not in present_tags and variant_parent_props is not None:
-                    variant.append(variant_parent_props)
-                elif variant_parent_props is not None:
-                    variant_tags = [
-                        prop.attrib["attachpoint"] for prop in variant.find("props")
-                    ]
-                    for prop in variant_parent_props:
-                        if (
-                            prop is not None
-                            and prop.attrib["attachpoint"] not in variant_tags
-                        ):
-                            variant.find("props").append(prop)
-
-            for child in variant:
-                if child.tag == "mesh" or child.tag == "decal":
-                    self.print_header("Gathering Mesh")
-
-                    # Get the objects prior to importing
-                    prior_objects = [Object for Object in bpy.context.scene.objects]
-                    prior_materials = [material for material in bpy.data.materials]
-                    # Deselect all the previously selected objects.
-                    for obj in prior_objects:
-                        obj.select_set(False)
-                    # Import the new objects
-                    if child.tag == "mesh":
-                        mesh_path = self.currentPath + "meshes/" + child.text
-                        try:
-                            fixer = MaxColladaFixer(mesh_path)
-                            fixer.execute()
-                            bpy.ops.wm.collada_import(
-                                filepath=mesh_path, import_units=True
-                            )
-                        except Exception:
-                            self.logger.error("Could not load" + mesh_path)
-                    else:
-                        bpy.ops.object.select_all(action="DESELECT")
-                        if material_type == "default.xml" or "terrain" in material_type:
-                            material_type = "basic_trans.xml"
-
-                        decal = self.create_custom_mesh(
-                            "Decal",
-                            float(child.attrib["offsetx"]),
-                            float(child.attrib["offsetz"]),
-                            0,
-                            float(child.attrib["width"]),
-                            float(child.attrib["depth"]),
-                        )
-                        decal.select_set(True)
-                        bpy.context.view_layer.objects.active = decal
-                        bpy.ops.object.mode_set(mode="EDIT")
-                        bpy.ops.uv.reset()
-                        bpy.ops.object.mode_set(mode="OBJECT")
-                        decal.rotation_euler = (
-                            0,
-                            0,
-                            math.radians(float(child.attrib["angle"])),
-                        )
+        try:
+            art_root, actor_path = get_art_root(self.filepath)
+        except ValueError as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+
+        with mount_mods(
+            art_root, self.additional_mods, self.engine_cache, self.report
+        ) as vfs:
+            settings = self.get_settings()
+            plans = plan_actors(
+                vfs, actor_path, settings, self.seed, self.variation_count, profiler
+            )
+            if len(plans) < self.variation_count:
+                self.report(
+                    {"INFO"}, f"Only {len(plans)} distinct variations were found"
+                )
 
-                    new_current_objects = [
-                        object for object in bpy.context.scene.objects
-                    ]
-                    # Select those objects
-                    for obj in set(new_current_objects) - set(prior_objects):
-                        obj.select_set(True)
-
-                    backup = bpy.context.selected_objects.copy()
-                    for b in backup:
-                        if b.type == "MESH":
-                            self.mesh_uv_layers_names_update(b.data)
-
-                    # Get those objects
-                    imported_objects = bpy.context.selected_objects.copy()
-
-                    for imported_object in imported_objects:
-                        if (
-                            imported_object is not None
-                            and "prop." in imported_object.name
-                        ):
-                            imported_object.name = imported_object.name.replace(
-                                "prop.", "prop_"
-                            )
-                            if (
-                                imported_object.data is not None
-                                and "prop." in imported_object.data.name
-                            ):
-                                imported_object.data.name = (
-                                    imported_object.data.name.replace("prop.", "prop_")
-                                )
-                        # props are parented so they should follow their root object.
-                        if "prop-" in imported_object.name:
-                            imported_object.name = imported_object.name.replace(
-                                "prop-", "prop_"
-                            )
-                            if (
-                                imported_object.data is not None
-                                and "prop-" in imported_object.data.name
-                            ):
-                                imported_object.data.name = (
-                                    imported_object.data.name.replace("prop-", "prop_")
-                                )
-                        if "prop_" in imported_object.name:
-                            meshprops.append(imported_object)
-                            imported_object.select_set(False)
-
-                    bpy.ops.object.transform_apply(
-                        location=True, rotation=True, scale=True
-                    )
-
-                    for obj in backup:
-                        obj.select_set(True)
-                    bpy.ops.object.transform_apply(
-                        location=False, rotation=False, scale=True
-                    )
-
-                    # Clear old materials
-                    for ob in bpy.context.selected_editable_objects:
-                        ob.active_material_index = 0
-                        for i in range(len(ob.material_slots)):
-                            bpy.ops.object.material_slot_remove()
-
-                    new_current_materials = [
-                        material for material in bpy.data.materials
-                    ]
-                    for material in set(new_current_materials) - set(prior_materials):
-                        bpy.data.materials.remove(material)
-
-                    self.print_header("Setting Constraints")
-
-                    for imported_object in imported_objects:
-                        # props are parented so they should follow their root object.
-                        if (
-                            (
-                                "prop-" in imported_object.name
-                                or "prop_" in imported_object.name
-                            )
-                            and hasattr(imported_object, "type")
-                            and imported_object.type == "EMPTY"
-                        ):
-                            continue
-
-                        if proppoint == "root" and rootObj is not None:
-                            self.set_copy_transform_constraint(imported_object, rootObj)
-                            continue
-
-                        found = False
-                        for prop in parentprops:
-                            if proppoint in prop.name:
-                                found = True
-                                self.set_copy_transform_constraint(
-                                    imported_object, prop
-                                )
-                                break
-
-                        if found:
-                            continue
-
-                        self.logger.error(
-                            ""
-                            + imported_object.name
-                            + " has no parent prop point named prop_"
-                            + proppoint
-                            + ". Root object name: "
-                            + (rootObj.name if rootObj is not None else "Undefined")
-                            + ""
-                        )
+            builder = create_builder(vfs, settings, profiler)
+            with profiler.stage("texture prefetch"):
+                builder.missing_textures = self.prefetch_textures(plans, vfs)
+            try:
+                for _ in self.iter_build(builder, plans, actor_path):
+                    pass
+                builder.store_dependencies(settings)
+            finally:
+                with profiler.stage("finish"):
+                    builder.finish()
 
-                if child.tag == "textures" and self.import_textures:
-                    self.print_header("Gathering Textures")
-
-                    if len(child) > 0:
-                        for texture in child:
-                            imported_textures.append(texture)
-
-                if (
-                    child.tag == "props"
-                    and self.import_props
-                    and (
-                        self.import_depth == -1
-                        or (self.import_depth > propDepth and self.import_depth > 0)
-                    )
-                ):
-                    self.print_header("Gathering Parent Props")
-
-                    finalprops = imported_objects.copy()
-                    if len(finalprops) > 0:
-                        rootObject = None
-                        for obj in finalprops:
-                            if "prop-" in obj.name or "prop_" in obj.name:
-                                continue
-
-                            if hasattr(obj, "type") and obj.type == "ARMATURE":
-                                self.print_header("Gathering Armature Props")
-
-                                for bone in obj.data.bones:
-                                    if "prop." in bone.name:
-                                        bone.name = bone.name.replace("prop.", "prop_")
-                                    if "prop-" in bone.name:
-                                        bone.name = bone.name.replace("prop-", "prop_")
-                                    if "prop_" in bone.name:
-                                        self.logger.debug(bone.name)
-                                        finalprops.append(bone)
-
-                                continue
-                            if hasattr(obj, "type"):
-                                rootObject = bpy.data.objects[obj.name]
-                            finalprops.remove(obj)
-
-                    if rootObject is not None:
-                        self.logger.debug(rootObject.name)
-
-                    for prop in child:
-                        imported_props.append(prop)
-
-        mat_textures = []
-        for texture in imported_textures:
-            self.logger.info(
-                "Loading "
-                + texture.attrib["name"]
-                + ": "
-                + self.currentPath
-                + "textures/skins/"
-                + texture.attrib["file"]
-            )
-            bpy.data.images.load(
-                self.currentPath + "textures/skins/" + texture.attrib["file"],
-                check_existing=True,
-            )
-            mat_textures.append(
-                texture.attrib["name"]
-                + "|"
-                + self.currentPath
-                + "textures/skins/"
-                + texture.attrib["file"]
-            )
+        return {"FINISHED"}
 
-        if len(mat_textures):
-            material_object = self.create_new_material(mat_textures, material_type)
 
-            for obj in imported_objects:
-                if ("prop-" in obj.name or "prop_" in obj.name) and not hasattr(
-                    obj, "type"
-                ):
-                    continue
-                if hasattr(obj, "type") and obj.type == "EMPTY":
-                    continue
-                if hasattr(obj, "type") and obj.type == "ARMATURE":
-                    continue
+class ImportPyrogenesisActorModal(ImportPyrogenesisActor):
+    """Load a Pyrogenesis actor file while keeping Blender responsive.
 
-                self.assign_material_to_object(obj, material_object)
+    Worker threads plan the actor, then read and fix its meshes and read its
+    textures in the order they are built, while a timer builds the objects on
+    the main thread as their files become ready. Escape cancels the import and
+    removes what it created.
+    """
 
-        for prop in imported_props:
-            self.print_header("Gathering Props")
+    bl_label = "Import Pyrogenesis Actor (Background)"
+    bl_idname = "import_pyrogenesis_scene.xml_modal"
 
-            if prop.attrib["actor"] == "":
-                continue
+    worker_count: bpy.props.IntProperty(
+        name="Worker Threads",
+        description="How many files are read at the same time",
+        default=4,
+        min=1,
+    )  # type: ignore
 
-            try:
-                prop_path = self.currentPath + "actors/" + prop.attrib["actor"]
-                self.logger.info("Loading " + prop_path + ".")
-                proproot = ET.parse(prop_path).getroot()
+    # Seconds of building per timer event, so that the interface stays usable.
+    STEP_BUDGET = 0.05
 
-                propRootObj = self.find_prop_root_object(
-                    finalprops, prop.attrib["attachpoint"]
-                )
-                if (
-                    propRootObj is not None
-                    and prop.attrib["attachpoint"] != "root"
-                    and rootObject is None
-                ):
-                    rootObject = propRootObj
-
-                self.parse_actor(
-                    proproot,
-                    prop.attrib["attachpoint"],
-                    meshprops
-                    if finalprops is None or len(finalprops) <= 0
-                    else finalprops,
-                    rootObject,
-                    propDepth + 1,
-                )
-            except Exception:
-                self.logger.error("Could not load" + mesh_path)
+    def draw(self, context):
+        super().draw(context)
+        self.layout.prop(self, "worker_count")
+
+    def execute(self, context):
+        self.logger.info("loading " + self.filepath + "...")
 
-    def find_prop_root_object(self, imported_objects, proppoint):
-        for imported_object in imported_objects:
-            if "prop_" + proppoint in imported_object.name:
-                return imported_object
+        try:
+            art_root, self.actor_path = get_art_root(self.filepath)
+        except ValueError as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
 
-        return None
+        self.vfs = mount_mods(
+            art_root, self.additional_mods, self.engine_cache, self.report
+        )
+        self.settings = self.get_settings()
+        self.profiler = ImportProfiler()
+        self.builder = None
+        self.steps = None
+        self.step = 0
+        self.step_count = 0
+        self.exit_stack = contextlib.ExitStack()
+        self.exit_stack.enter_context(self.vfs)
+        # Blender stays usable between timer events, so undo is only suspended
+        # while building, see modal.
+        self.exit_stack.enter_context(
+            ImportSession(
+                context, log_level=getattr(logging, self.log_level), use_undo=True
+            )
+        )
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.worker_count, thread_name_prefix="PyrogenesisImport"
+        )
+        self.plans = self.executor.submit(
+            plan_actors,
+            self.vfs,
+            self.actor_path,
+            self.settings,
+            self.seed,
+            self.variation_count,
+            self.profiler,
+        )
 
-    def print_header(self, header_name):
-        MAX_LENGTH = 55  # Define the maximum length of the lines
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(0.01, window=context.window)
+        window_manager.progress_begin(0, 1)
+        window_manager.modal_handler_add(self)
+        context.workspace.status_text_set("Planning " + self.actor_path + "...")
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self.cancel(context)
+            self.report({"WARNING"}, "Import of " + self.actor_path + " cancelled")
+            return {"CANCELLED"}
+
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        try:
+            if self.steps is None:
+                if not self.plans.done():
+                    return {"PASS_THROUGH"}
+                self.start_building(self.plans.result())
+
+            deadline = time.perf_counter() + self.STEP_BUDGET
+            with suspend_undo(context):
+                while time.perf_counter() < deadline:
+                    if isinstance(next(self.steps), concurrent.futures.Future):
+                        # Waiting for a worker thread, try again on the next event.
+                        break
+                    self.step += 1
+        except StopIteration:
+            self.finish_building(context)
+            return {"FINISHED"}
+        except Exception as e:
+            self.cancel(context)
+            self.logger.exception("Could not import " + self.actor_path)
+            self.report({"ERROR"}, f"Could not import {self.actor_path}: {e}")
+            return {"CANCELLED"}
+
+        context.window_manager.progress_update(self.step / max(self.step_count, 1))
+        context.workspace.status_text_set(
+            f"Importing {self.actor_path}: {self.step} of {self.step_count} meshes,"
+            " Esc to cancel"
+        )
+        return {"PASS_THROUGH"}
+
+    def start_building(self, plans):
+        """Queue the file work of every mesh and texture, and start building."""
+        if len(plans) < self.variation_count:
+            self.report({"INFO"}, f"Only {len(plans)} distinct variations were found")
+
+        self.builder = create_builder(self.vfs, self.settings, self.profiler)
+        prefetcher = TexturePrefetcher(self.vfs)
+        for plan in plans:
+            for actor in plan.walk():
+                # One step per mesh and decal, see iter_build_actor_objects.
+                self.step_count += len(actor.meshes) + len(actor.decals)
+                for mesh_path in actor.meshes:
+                    if mesh_path not in self.builder.mesh_futures:
+                        self.builder.mesh_futures[mesh_path] = self.executor.submit(
+                            self.builder.prepare_mesh, mesh_path
+                        )
+                for texture in actor.textures:
+                    if texture.path not in self.builder.texture_futures:
+                        self.builder.texture_futures[texture.path] = (
+                            self.executor.submit(prefetcher.read, texture.path)
+                        )
 
-        header_line = f"============== {header_name} ============"
-        header_line = header_line.center(MAX_LENGTH, "=")
+        self.steps = self.iter_build(self.builder, plans, self.actor_path)
 
-        # Ensure the line length matches MAX_LENGTH
-        if len(header_line) > MAX_LENGTH:
-            header_line = header_line[:MAX_LENGTH]
-        else:
-            header_line = header_line.center(MAX_LENGTH, "=")
+    def finish_building(self, context):
+        try:
+            self.builder.store_dependencies(self.settings)
+        finally:
+            self.stop(context)
+
+        self.report_missing_textures(
+            self.builder.missing_textures, len(self.builder.texture_futures)
+        )
+        self.report_profile(self.profiler)
+
+    def cancel(self, context):
+        """Stop the import and remove the objects it created."""
+        if self.steps is not None:
+            self.steps.close()
+        if self.builder is not None:
+            collections = {
+                collection
+                for obj in self.builder.imported_objects
+                for collection in obj.users_collection
+                if collection != self.builder.collection
+            }
+            for obj in self.builder.imported_objects:
+                bpy.data.objects.remove(obj)
+            self.builder.imported_objects.clear()
+            # E.g. the collections of variations.
+            for collection in collections:
+                if len(collection.all_objects) == 0:
+                    bpy.data.collections.remove(collection)
+        self.stop(context)
+
+    def stop(self, context):
+        """Release what the import holds, once, whether it finished or not."""
+        if self.executor is None:
+            return
 
-        # Print the log lines
-        self.logger.info("=" * MAX_LENGTH)
-        self.logger.info(header_line)
-        self.logger.info("=" * MAX_LENGTH)
-        self.logger.info("")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        try:
+            if self.builder is not None:
+                with self.profiler.stage("finish"), suspend_undo(context):
+                    self.builder.finish()
+        finally:
+            context.window_manager.event_timer_remove(self.timer)
+            context.window_manager.progress_end()
+            context.workspace.status_text_set(None)
+            self.exit_stack.close()
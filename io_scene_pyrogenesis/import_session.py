@@ -0,0 +1,52 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import bpy
+import contextlib
+import logging
+
+
+@contextlib.contextmanager
+def suspend_undo(context=None):
+    """Turn global undo off, so that the operators called push no undo steps."""
+    edit_preferences = (context or bpy.context).preferences.edit
+    use_global_undo = edit_preferences.use_global_undo
+    edit_preferences.use_global_undo = False
+    try:
+        yield
+    finally:
+        edit_preferences.use_global_undo = use_global_undo
+
+
+class ImportSession:
+    """Context manager suspending what slows an import down, restored on exit.
+
+    Global undo is turned off unless use_undo is set, the view layer is updated
+    once at the end instead of by each step, and the importer's messages below
+    log_level are dropped. Imports that return to Blender between steps keep
+    undo and suspend it around each step instead, see suspend_undo.
+    """
+
+    def __init__(self, context=None, log_level=logging.WARNING, use_undo=False):
+        self.context = context or bpy.context
+        self.log_level = log_level
+        self.use_undo = use_undo
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
+        self.exit_stack = None
+        self.previous_log_level = None
+
+    def __enter__(self):
+        self.exit_stack = contextlib.ExitStack()
+        if not self.use_undo:
+            self.exit_stack.enter_context(suspend_undo(self.context))
+        self.previous_log_level = self.logger.level
+        self.logger.setLevel(self.log_level)
+        return self
+
+    def __exit__(self, *exception):
+        try:
+            self.context.view_layer.update()
+        finally:
+            self.exit_stack.close()
+            self.logger.setLevel(self.previous_log_level)
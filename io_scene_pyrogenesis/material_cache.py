@@ -0,0 +1,199 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import bpy
+import logging
+import os
+
+# Texture roles holding data rather than colors.
+NON_COLOR_ROLES = ("normTex", "specTex")
+SIGNATURE_PROPERTY = "pyrogenesis_signature"
+
+
+def get_shading(material_type):
+    """Return the node graph variant used for a material XML file."""
+    if "player_trans" in material_type:
+        return "player_trans"
+    if "basic_trans" in material_type:
+        return "basic_trans"
+    return "default"
+
+
+class MaterialCache:
+    """Share materials between objects using the same textures and shader.
+
+    Materials are keyed by their material type and the texture of each role, so
+    actors sharing a base texture but not their other maps get distinct
+    materials. New materials are copies of a template node tree built once per
+    shading variant and set of roles, with only the images being assigned.
+    Materials of previous imports are reused when their signature matches.
+    """
+
+    def __init__(self):
+        # Signature -> material, None until the existing materials are scanned.
+        self.materials = None
+        self.templates = {}
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def get(self, material_type, textures):
+        """Return the material for a list of (role, image) pairs."""
+        # One image per role, the last one winning, as image nodes are named
+        # after their role.
+        textures = list(dict(textures).items())
+        signature = repr(
+            (
+                material_type,
+                tuple(sorted((role, image.filepath) for role, image in textures)),
+            )
+        )
+        if self.materials is None:
+            self.materials = {}
+            for material in bpy.data.materials:
+                existing_signature = material.get(SIGNATURE_PROPERTY)
+                if existing_signature is not None:
+                    self.materials.setdefault(existing_signature, material)
+
+        material = self.materials.get(signature)
+        if material is not None:
+            return material
+
+        material = self.create_material(
+            self.get_material_name(textures), material_type, textures
+        )
+        material[SIGNATURE_PROPERTY] = signature
+        self.materials[signature] = material
+        return material
+
+    @staticmethod
+    def get_material_name(textures):
+        for role, image in textures:
+            if role == "baseTex":
+                return os.path.basename(image.filepath)
+
+        return os.path.basename(textures[0][1].filepath)
+
+    def create_material(self, name, material_type, textures):
+        roles = tuple(role for role, image in textures)
+        template = self.get_template(get_shading(material_type), roles)
+        mat = template.copy()
+        mat.name = name
+        for role, image in textures:
+            if role in NON_COLOR_ROLES:
+                image.colorspace_settings.name = "Non-Color"
+            mat.node_tree.nodes[role].image = image
+
+        return mat
+
+    def get_template(self, shading, roles):
+        key = (shading, roles)
+        template = self.templates.get(key)
+        if template is None:
+            self.logger.debug(f"Building {shading} material template for {roles}")
+            template = self.build_template(shading, roles)
+            self.templates[key] = template
+
+        return template
+
+    def build_template(self, shading, roles):
+        """Build a node tree with one empty, named image node per role."""
+        mat = bpy.data.materials.new(name=".pyrogenesis_template_" + shading)
+        mat.use_nodes = True
+        bsdf = mat.node_tree.nodes["Principled BSDF"]
+
+        for role in roles:
+            texImage = mat.node_tree.nodes.new("ShaderNodeTexImage")
+            texImage.name = role
+            texImage.label = role
+            if role == "baseTex":
+                mat.node_tree.links.new(
+                    bsdf.inputs["Base Color"], texImage.outputs["Color"]
+                )
+
+                if shading == "player_trans":
+                    color_node = mat.node_tree.nodes.new("ShaderNodeRGB")
+                    color_node.outputs[0].default_value = (1, 0.213477, 0.0543914, 1)
+                    multiply_node = mat.node_tree.nodes.new("ShaderNodeMixRGB")
+                    multiply_node.blend_type = "MULTIPLY"
+                    invert_node = mat.node_tree.nodes.new("ShaderNodeInvert")
+                    mat.node_tree.links.new(
+                        invert_node.inputs["Color"], texImage.outputs["Alpha"]
+                    )
+                    mat.node_tree.links.new(
+                        multiply_node.inputs[1], texImage.outputs["Color"]
+                    )
+                    mat.node_tree.links.new(
+                        multiply_node.inputs[2], color_node.outputs["Color"]
+                    )
+                    mat.node_tree.links.new(
+                        multiply_node.inputs[0], invert_node.outputs["Color"]
+                    )
+                    mat.node_tree.links.new(
+                        bsdf.inputs["Base Color"], multiply_node.outputs["Color"]
+                    )
+
+                elif shading == "basic_trans":
+                    mix_shader_node = mat.node_tree.nodes.new("ShaderNodeMixShader")
+                    transparent_node = mat.node_tree.nodes.new(
+                        "ShaderNodeBsdfTransparent"
+                    )
+                    mat.node_tree.links.new(
+                        mix_shader_node.inputs[0], texImage.outputs["Alpha"]
+                    )
+                    mat.node_tree.links.new(
+                        mix_shader_node.inputs[2], bsdf.outputs["BSDF"]
+                    )
+                    mat.node_tree.links.new(
+                        mix_shader_node.inputs[1], transparent_node.outputs["BSDF"]
+                    )
+
+                    output_node = mat.node_tree.nodes.get("Material Output")
+                    mat.node_tree.links.new(
+                        output_node.inputs["Surface"], mix_shader_node.outputs["Shader"]
+                    )
+                    mat.blend_method = "CLIP"
+
+                continue
+
+            if role == "normTex":
+                normal_node = mat.node_tree.nodes.new("ShaderNodeNormalMap")
+                separate_node = mat.node_tree.nodes.new("ShaderNodeSeparateXYZ")
+                invert_node = mat.node_tree.nodes.new("ShaderNodeInvert")
+                join_node = mat.node_tree.nodes.new("ShaderNodeCombineXYZ")
+
+                mat.node_tree.links.new(
+                    separate_node.inputs["Vector"], texImage.outputs["Color"]
+                )
+                # Direct X normals need to have their Y channel inverted for OpenGL
+                mat.node_tree.links.new(
+                    invert_node.inputs["Color"], separate_node.outputs["Y"]
+                )
+                mat.node_tree.links.new(
+                    join_node.inputs["X"], separate_node.outputs["X"]
+                )
+                mat.node_tree.links.new(
+                    join_node.inputs["Z"], separate_node.outputs["Z"]
+                )
+                mat.node_tree.links.new(
+                    join_node.inputs["Y"], invert_node.outputs["Color"]
+                )
+                mat.node_tree.links.new(
+                    normal_node.inputs["Color"], join_node.outputs["Vector"]
+                )
+                mat.node_tree.links.new(
+                    bsdf.inputs["Normal"], normal_node.outputs["Normal"]
+                )
+                continue
+
+            if role == "specTex":
+                mat.node_tree.links.new(
+                    bsdf.inputs["Specular IOR Level"], texImage.outputs["Color"]
+                )
+
+        return mat
+
+    def finish(self):
+        """Remove the templates, only their copies are used by objects."""
+        for template in self.templates.values():
+            bpy.data.materials.remove(template)
+        self.templates.clear()
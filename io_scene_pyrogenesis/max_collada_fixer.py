@@ -2,11 +2,28 @@
 # This file is part of 0 A.D.
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import hashlib
 import logging
+import os
+import threading
+import xml.sax
+import xml.sax.handler
+import xml.sax.saxutils
+
+# Bump whenever the fixed output changes so that stale cache entries are ignored.
+FIXER_VERSION = 1
 
 
 class MaxColladaFixer:
+    """Strip materials and effects from a Collada file into a cache directory.
+
+    The source file is never modified: the fixed copy is named after the hash of
+    the source content, so unchanged meshes are only fixed once.
+    """
+
     file_path = None
+    cache_path = None
+    cache_suffix = ""
     collada_prefix = "{http://www.collada.org/2005/11/COLLADASchema}"
 
     def sortchildrenby(self, parent):
@@ -27,15 +44,57 @@ class MaxColladaFixer:
             if level and (not elem.tail or not elem.tail.strip()):
                 elem.tail = i
 
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, cache_path=None, vfs=None):
         self.file_path = file_path
+        self.cache_path = cache_path
+        # file_path is a virtual path when a VirtualFileSystem is given.
+        self.vfs = vfs
         self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
 
+    def open_source(self):
+        if self.vfs is not None:
+            return self.vfs.open(self.file_path)
+
+        return open(self.file_path, "rb")
+
+    def get_output_path(self):
+        digest = hashlib.sha256()
+        with self.open_source() as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+        return os.path.join(
+            self.cache_path,
+            f"{digest.hexdigest()}-{FIXER_VERSION}{self.cache_suffix}.dae",
+        )
+
     def execute(self):
+        """Return the path of the fixed file, fixing it on a cache miss."""
+        output_path = self.get_output_path()
+        if os.path.exists(output_path):
+            self.logger.debug("Using cached " + output_path)
+            return output_path
+
+        # Write to a temporary file first so that concurrent imports never see
+        # a partially written cache entry.
+        os.makedirs(self.cache_path, exist_ok=True)
+        # Unique per thread too, as worker threads may fix identical files.
+        temporary_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self.fix(temporary_path)
+            os.replace(temporary_path, output_path)
+        except BaseException:
+            # E.g. a parse error, which must not leave a partial file behind.
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return output_path
+
+    def fix(self, output_path):
         import xml.etree.ElementTree as ET
-        from datetime import date
 
-        tree = ET.parse(self.file_path)
+        with self.open_source() as f:
+            tree = ET.parse(f)
         ET.register_namespace("", "http://www.collada.org/2005/11/COLLADASchema")
         root = tree.getroot()
         new_elements = []
@@ -89,11 +148,6 @@ class MaxColladaFixer:
                                         break
                 continue
 
-            if child.tag == self.collada_prefix + "asset":
-                for property in child:
-                    if property.tag == self.collada_prefix + "modified":
-                        property.text = str(date.today())
-
         for element in new_elements:
             root.append(element)
 
@@ -101,5 +155,92 @@ class MaxColladaFixer:
         for child in root:
             self.sortchildrenby(child)
         self.indent(root)
-        tree.write(open(self.file_path, "wb"), encoding="utf-8")
-        tree.write(open(self.file_path, "wb"), encoding="utf-8")
+        tree.write(output_path, encoding="utf-8")
+
+
+class StreamingColladaHandler(xml.sax.handler.ContentHandler):
+    """Copy SAX events to an XMLGenerator, leaving out material bindings."""
+
+    # Children of <COLLADA> that are emptied or dropped.
+    emptied_libraries = ("library_images", "library_effects")
+    dropped_libraries = ("library_materials",)
+    # Elements holding a <bind_material> that is dropped.
+    material_instances = ("instance_geometry", "instance_controller")
+
+    def __init__(self, generator):
+        super().__init__()
+        self.generator = generator
+        self.stack = []
+        self.skip_depth = None
+
+    def startElement(self, name, attrs):
+        self.stack.append(name)
+        if self.skip_depth is not None:
+            return
+
+        depth = len(self.stack)
+        parent = self.stack[-2] if depth > 1 else None
+        if (depth == 2 and name in self.dropped_libraries + self.emptied_libraries) or (
+            name == "bind_material" and parent in self.material_instances
+        ):
+            self.skip_depth = depth
+            if name in self.emptied_libraries:
+                self.generator.startElement(name, {})
+                self.generator.endElement(name)
+            return
+
+        self.generator.startElement(name, attrs)
+
+    def endElement(self, name):
+        depth = len(self.stack)
+        self.stack.pop()
+        if self.skip_depth is not None:
+            if depth == self.skip_depth:
+                self.skip_depth = None
+            return
+
+        self.generator.endElement(name)
+
+    def characters(self, content):
+        if self.skip_depth is None:
+            self.generator.characters(content)
+
+    def ignorableWhitespace(self, whitespace):
+        if self.skip_depth is None:
+            self.generator.ignorableWhitespace(whitespace)
+
+    def processingInstruction(self, target, data):
+        if self.skip_depth is None:
+            self.generator.processingInstruction(target, data)
+
+    def startDocument(self):
+        self.generator.startDocument()
+
+    def endDocument(self):
+        self.generator.endDocument()
+
+
+class StreamingColladaFixer(MaxColladaFixer):
+    """Fix a Collada file in a single streaming pass.
+
+    Unlike MaxColladaFixer the document is never loaded as a whole, geometry is
+    copied through as the parser reads it, and the output is not re-indented,
+    so memory use stays bounded even for large skinned meshes.
+    """
+
+    cache_suffix = "-stream"
+
+    def fix(self, output_path):
+        with open(output_path, "w", encoding="utf-8") as output:
+            generator = xml.sax.saxutils.XMLGenerator(
+                output, encoding="utf-8", short_empty_elements=True
+            )
+            with self.open_source() as f:
+                xml.sax.parse(f, StreamingColladaHandler(generator))
+
+
+# Fixers selectable from the import operator.
+COLLADA_FIXERS = {
+    "TREE": MaxColladaFixer,
+    "STREAM": StreamingColladaFixer,
+}
@@ -0,0 +1,222 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .collada_reader import get_axis_conversion
+from mathutils import Matrix
+import bpy
+import numpy as np
+
+# Names given to the UV sets, as the rest of the importer expects them.
+UV_LAYER_NAMES = ("UVMap", "AOMap")
+
+
+def to_matrix(array):
+    return Matrix(array.tolist())
+
+
+def transform_points(matrix, points):
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def transform_normals(matrix, normals):
+    normals = normals @ np.linalg.inv(matrix[:3, :3])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(lengths == 0, 1, lengths)
+
+
+def build_mesh(data, matrix=None):
+    """Create a mesh from MeshData in bulk, its positions transformed by matrix."""
+    positions = data.positions
+    normals = data.normals
+    if matrix is not None:
+        positions = transform_points(matrix, positions)
+        if normals is not None:
+            normals = transform_normals(matrix, normals)
+
+    mesh = bpy.data.meshes.new(data.name)
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", positions.astype(np.float32, copy=False).ravel())
+    mesh.loops.add(len(data.loop_vertices))
+    mesh.loops.foreach_set(
+        "vertex_index", data.loop_vertices.astype(np.int32, copy=False)
+    )
+    mesh.polygons.add(len(data.loop_starts))
+    mesh.polygons.foreach_set(
+        "loop_start", data.loop_starts.astype(np.int32, copy=False)
+    )
+    for name, coordinates in zip(UV_LAYER_NAMES, data.uvs):
+        uv_layer = mesh.uv_layers.new(name=name)
+        uv_layer.data.foreach_set(
+            "uv", coordinates.astype(np.float32, copy=False).ravel()
+        )
+
+    mesh.update(calc_edges=True)
+    # Degenerate polygons are removed, after which loop data no longer matches.
+    mesh.validate()
+    if normals is not None and len(mesh.loops) == len(normals):
+        mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), bool))
+        mesh.normals_split_custom_set(normals.tolist())
+
+    return mesh
+
+
+class ColladaMeshBuilder:
+    """Create the objects of a ColladaScene in the active collection.
+
+    Nodes become empties, meshes and armatures the way the Collada importer
+    creates them: joints become bones, skinned meshes get one vertex group per
+    joint and an armature modifier, and other nodes below joints are parented
+    to the armature.
+    """
+
+    def __init__(self, scene, import_units=True):
+        self.scene = scene
+        self.root_matrix = get_axis_conversion(scene.up_axis)
+        if import_units:
+            self.root_matrix = self.root_matrix @ np.diag([scene.unit] * 3 + [1.0])
+        # Geometry or controller id -> mesh, shared by their instances.
+        self.meshes = {}
+        # Joint sid, id or name -> (armature object, bone name)
+        self.joints = {}
+        # (object, SkinData) of skinned meshes, bound once armatures exist.
+        self.skins = []
+        self.weighted_meshes = set()
+        # Object -> its world matrix, as matrix_world is only updated later.
+        self.object_matrices = {}
+        self.objects = []
+
+    def build(self):
+        """Create every object and return them."""
+        for node in self.scene.nodes:
+            self.build_node(node, self.root_matrix, None, np.identity(4))
+
+        for obj, skin in self.skins:
+            self.bind_skin(obj, skin)
+
+        return self.objects
+
+    def link(self, obj, parent, parent_matrix, matrix):
+        bpy.context.collection.objects.link(obj)
+        obj.parent = parent
+        obj.matrix_basis = to_matrix(np.linalg.inv(parent_matrix) @ matrix)
+        self.object_matrices[obj] = matrix
+        self.objects.append(obj)
+
+    def build_node(self, node, parent_matrix, parent, parent_object_matrix):
+        if node.is_joint:
+            self.build_armature(node, parent_matrix, parent, parent_object_matrix)
+            return
+
+        matrix = parent_matrix @ node.matrix
+        data = None
+        if node.instance is not None:
+            kind, instance_id = node.instance
+            if kind == "geometry":
+                data = self.get_mesh(instance_id)
+            else:
+                data = self.get_skinned_mesh(instance_id)
+
+        obj = bpy.data.objects.new(node.name, data)
+        if data is not None and node.instance[0] == "controller":
+            self.skins.append((obj, self.scene.controllers[node.instance[1]]))
+        self.link(obj, parent, parent_object_matrix, matrix)
+
+        for child in node.children:
+            self.build_node(child, matrix, obj, matrix)
+
+    def get_mesh(self, geometry_id):
+        mesh = self.meshes.get(geometry_id)
+        if mesh is None:
+            mesh = build_mesh(self.scene.geometries[geometry_id])
+            self.meshes[geometry_id] = mesh
+        return mesh
+
+    def get_skinned_mesh(self, controller_id):
+        mesh = self.meshes.get(controller_id)
+        if mesh is None:
+            skin = self.scene.controllers[controller_id]
+            mesh = build_mesh(
+                self.scene.geometries[skin.geometry], skin.bind_shape_matrix
+            )
+            self.meshes[controller_id] = mesh
+        return mesh
+
+    def build_armature(self, root_joint, parent_matrix, parent, parent_object_matrix):
+        """Create an armature for the joints below and including root_joint."""
+        armature = bpy.data.armatures.new(root_joint.name)
+        obj = bpy.data.objects.new(root_joint.name, armature)
+        self.link(obj, parent, parent_object_matrix, parent_matrix)
+
+        # Bones can only be created in edit mode.
+        view_layer = bpy.context.view_layer
+        active_object = view_layer.objects.active
+        view_layer.objects.active = obj
+        bpy.ops.object.mode_set(mode="EDIT")
+        others = []
+        try:
+            self.build_bone(root_joint, np.identity(4), obj, None, 1.0, others)
+        finally:
+            bpy.ops.object.mode_set(mode="OBJECT")
+            view_layer.objects.active = active_object
+
+        # Nodes below joints follow the armature, as bones cannot hold them.
+        for node, matrix in others:
+            self.build_node(node, parent_matrix @ matrix, obj, parent_matrix)
+
+    def build_bone(self, node, parent_matrix, obj, parent_bone, length, others):
+        matrix = parent_matrix @ node.matrix
+        child_joints = [child for child in node.children if child.is_joint]
+        if child_joints:
+            # Bones point to their first child, as far as it is.
+            child_head = (matrix @ child_joints[0].matrix)[:3, 3]
+            distance = float(np.linalg.norm(child_head - matrix[:3, 3]))
+            length = distance if distance > 1e-4 else length
+
+        bone = obj.data.edit_bones.new(node.name)
+        bone.head = (0, 0, 0)
+        bone.tail = (0, length, 0)
+        bone.matrix = to_matrix(matrix)
+        bone.parent = parent_bone
+        for key in (node.sid, node.id, node.name):
+            if key:
+                self.joints.setdefault(key, (obj, bone.name))
+
+        for child in node.children:
+            if child.is_joint:
+                self.build_bone(child, matrix, obj, bone, length, others)
+            else:
+                others.append((child, matrix))
+
+    def bind_skin(self, obj, skin):
+        """Parent a skinned mesh to its armature and weight it to the bones."""
+        armature_object = None
+        bone_names = []
+        for joint in skin.joints:
+            joint_object, bone_name = self.joints.get(joint, (None, joint))
+            bone_names.append(bone_name)
+            armature_object = armature_object or joint_object
+
+        if armature_object is not None:
+            # Skinned vertices are in the scene's space, whatever their node.
+            obj.parent = armature_object
+            obj.matrix_basis = to_matrix(
+                np.linalg.inv(self.object_matrices[armature_object]) @ self.root_matrix
+            )
+            modifier = obj.modifiers.new("Armature", "ARMATURE")
+            modifier.object = armature_object
+
+        groups = [obj.vertex_groups.new(name=name) for name in bone_names]
+        # Weights are stored in the mesh, possibly shared by another object.
+        if obj.data in self.weighted_meshes:
+            return
+        self.weighted_meshes.add(obj.data)
+
+        for joint_index in np.unique(skin.joint_indices):
+            selected = skin.joint_indices == joint_index
+            vertices = skin.vertices[selected]
+            weights = skin.weights[selected]
+            for weight in np.unique(weights):
+                groups[joint_index].add(
+                    vertices[weights == weight].tolist(), float(weight), "REPLACE"
+                )
@@ -0,0 +1,256 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .collada_reader import ColladaScene, MeshData, NodeData, SkinData
+import hashlib
+import json
+import logging
+import mmap
+import numpy as np
+import os
+import struct
+import threading
+
+# Bump when the layout or the reader output changes, to ignore older files.
+CACHE_VERSION = 1
+MAGIC = b"PYRMESH\0"
+HEADER = struct.Struct("<8sIQ")
+# Arrays start on a multiple of this, so that they can be used in place.
+ALIGNMENT = 64
+EXTENSION = ".pyrmesh"
+
+
+class MeshCache:
+    """Binary copies of read Collada scenes, keyed by the hash of their source.
+
+    A file holds a JSON description of the scene followed by its arrays, which
+    are memory-mapped when loaded rather than read. The least recently used
+    files are removed once the cache grows beyond max_size bytes.
+    """
+
+    # Shared by every instance: VFS identity of a source -> its hash.
+    _keys = {}
+
+    def __init__(self, path, max_size=1 << 30):
+        self.path = path
+        self.max_size = max_size
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def get_key(self, vfs, source_path):
+        """Return the hash of a source file, only reading it when it changed."""
+        identity = vfs.identify(source_path)
+        key = self._keys.get(identity)
+        if key is None:
+            digest = hashlib.sha256()
+            with vfs.open(source_path) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            key = f"{digest.hexdigest()}-{CACHE_VERSION}"
+            self._keys[identity] = key
+        return key
+
+    def get_path(self, key):
+        return os.path.join(self.path, key + EXTENSION)
+
+    def load(self, key):
+        """Return the cached ColladaScene of a key, or None."""
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Mark the file as recently used.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            return read_scene(mapping)
+        except (ValueError, KeyError, struct.error) as e:
+            self.logger.warning(f"Ignoring the invalid cache file {path}: {e}")
+            return None
+
+    def store(self, key, scene):
+        os.makedirs(self.path, exist_ok=True)
+        path = self.get_path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "wb") as f:
+                write_scene(f, scene)
+            os.replace(temporary_path, path)
+        except BaseException:
+            # E.g. a full disk, which must not leave a partial file behind.
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.evict()
+
+    def get_files(self):
+        """Return the (path, size, last use) of the cached files."""
+        try:
+            entries = list(os.scandir(self.path))
+        except FileNotFoundError:
+            return []
+
+        files = []
+        for entry in entries:
+            if entry.name.endswith(EXTENSION):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def evict(self):
+        """Remove the least recently used files while over the size cap."""
+        files = sorted(self.get_files(), key=lambda file: file[2])
+        total_size = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Mapped files cannot be removed on some platforms.
+                continue
+            total_size -= size
+
+    def clear(self):
+        """Remove every cached file and return how many were removed."""
+        removed = 0
+        for path, _, _ in self.get_files():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                self.logger.warning(f"Could not remove {path}: {e}")
+        self._keys.clear()
+        return removed
+
+
+class ArrayWriter:
+    """Collect arrays to write after the header, recording where they go."""
+
+    def __init__(self):
+        self.arrays = []
+        self.size = 0
+
+    def add(self, array, dtype):
+        if array is None:
+            return None
+
+        array = np.ascontiguousarray(array, dtype=dtype)
+        offset = self.size
+        self.arrays.append(array)
+        self.size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        return [offset, np.dtype(dtype).str, list(array.shape)]
+
+
+def write_scene(f, scene):
+    arrays = ArrayWriter()
+    description = {
+        "up_axis": scene.up_axis,
+        "unit": scene.unit,
+        "geometries": {
+            geometry_id: {
+                "name": mesh.name,
+                "positions": arrays.add(mesh.positions, np.float32),
+                "loop_vertices": arrays.add(mesh.loop_vertices, np.int32),
+                "loop_starts": arrays.add(mesh.loop_starts, np.int32),
+                "normals": arrays.add(mesh.normals, np.float32),
+                "uvs": [arrays.add(uv, np.float32) for uv in mesh.uvs],
+            }
+            for geometry_id, mesh in scene.geometries.items()
+        },
+        "controllers": {
+            controller_id: {
+                "geometry": skin.geometry,
+                "bind_shape_matrix": skin.bind_shape_matrix.tolist(),
+                "joints": list(skin.joints),
+                "vertices": arrays.add(skin.vertices, np.int32),
+                "joint_indices": arrays.add(skin.joint_indices, np.int32),
+                "weights": arrays.add(skin.weights, np.float32),
+            }
+            for controller_id, skin in scene.controllers.items()
+        },
+        "nodes": [describe_node(node) for node in scene.nodes],
+    }
+
+    header = json.dumps(description, separators=(",", ":")).encode("utf-8")
+    data_offset = -(-(HEADER.size + len(header)) // ALIGNMENT) * ALIGNMENT
+    f.write(HEADER.pack(MAGIC, CACHE_VERSION, len(header)))
+    f.write(header)
+    f.write(b"\0" * (data_offset - HEADER.size - len(header)))
+    for array in arrays.arrays:
+        f.write(array.tobytes())
+        f.write(b"\0" * (-array.nbytes % ALIGNMENT))
+
+
+def describe_node(node):
+    return {
+        "id": node.id,
+        "name": node.name,
+        "sid": node.sid,
+        "is_joint": node.is_joint,
+        "matrix": node.matrix.tolist(),
+        "children": [describe_node(child) for child in node.children],
+        "instance": list(node.instance) if node.instance is not None else None,
+    }
+
+
+def read_scene(buffer):
+    magic, version, header_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != CACHE_VERSION:
+        raise ValueError("Unknown format")
+
+    description = json.loads(bytes(buffer[HEADER.size : HEADER.size + header_size]))
+    data_offset = -(-(HEADER.size + header_size) // ALIGNMENT) * ALIGNMENT
+
+    def array(entry):
+        if entry is None:
+            return None
+
+        offset, dtype, shape = entry
+        return np.frombuffer(
+            buffer,
+            dtype=np.dtype(dtype),
+            count=int(np.prod(shape)),
+            offset=data_offset + offset,
+        ).reshape(shape)
+
+    def node(entry):
+        return NodeData(
+            entry["id"],
+            entry["name"],
+            entry["sid"],
+            entry["is_joint"],
+            np.array(entry["matrix"]),
+            tuple(node(child) for child in entry["children"]),
+            tuple(entry["instance"]) if entry["instance"] is not None else None,
+        )
+
+    return ColladaScene(
+        {
+            geometry_id: MeshData(
+                entry["name"],
+                array(entry["positions"]),
+                array(entry["loop_vertices"]),
+                array(entry["loop_starts"]),
+                array(entry["normals"]),
+                tuple(array(uv) for uv in entry["uvs"]),
+            )
+            for geometry_id, entry in description["geometries"].items()
+        },
+        {
+            controller_id: SkinData(
+                entry["geometry"],
+                np.array(entry["bind_shape_matrix"]),
+                tuple(entry["joints"]),
+                array(entry["vertices"]),
+                array(entry["joint_indices"]),
+                array(entry["weights"]),
+            )
+            for controller_id, entry in description["controllers"].items()
+        },
+        tuple(node(entry) for entry in description["nodes"]),
+        description["up_axis"],
+        description["unit"],
+    )
@@ -0,0 +1,196 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .collada_reader import ColladaScene, MeshData, NodeData, SkinData
+import numpy as np
+import os
+import struct
+
+PMD_MAGIC = b"PSMD"
+# Older versions store positions relative to the bones, which is not supported.
+MIN_PMD_VERSION = 3
+NO_BONE = 0xFF
+
+
+def find_pmd(vfs, mesh_path):
+    """Return the virtual path of a PMD model of a mesh, or None.
+
+    A mod can ship the .pmd itself, or the engine's converted copy, archived
+    as cache/<mesh>.cached.pmd or loose as cache/<mesh>.<hash>.pmd. The newest
+    converted copy is only used when it is not older than the mesh, as it is
+    stale once the mesh is edited.
+    """
+    path = os.path.splitext(mesh_path)[0] + ".pmd"
+    if vfs.exists(path):
+        return path
+
+    cache_path = "cache/" + mesh_path + "."
+    converted = [
+        path
+        for path in vfs.list_directory(cache_path[: cache_path.rfind("/") + 1])
+        if path.startswith(cache_path) and path.endswith(".pmd")
+    ]
+    if not converted:
+        return None
+
+    newest = max(converted, key=vfs.get_mtime)
+    if vfs.exists(mesh_path) and vfs.get_mtime(newest) < vfs.get_mtime(mesh_path):
+        return None
+    return newest
+
+
+def swap_axes(vectors):
+    """Convert engine (Y up) coordinates to Blender (Z up) ones."""
+    return vectors[..., [0, 2, 1]]
+
+
+def get_matrix(translation, rotation):
+    """Return the 4x4 matrix of an engine translation and (x, y, z, w) rotation."""
+    # Swapping two axes mirrors the rotation, negating its vector part.
+    x, z, y, w = rotation
+    x, y, z = -x, -y, -z
+    matrix = np.identity(4)
+    matrix[:3, :3] = [
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ]
+    matrix[:3, 3] = swap_axes(np.asarray(translation, dtype=np.float64))
+    return matrix
+
+
+class PmdReader:
+    """Read 0 A.D. binary models into the ColladaScene the mesh builder takes.
+
+    Bones, which are unnamed in PMD files, become joints named bone<index>
+    below a single root joint, and prop points become prop_<name> nodes.
+    """
+
+    def __init__(self, data, name):
+        self.data = data
+        self.name = name
+        self.offset = 0
+
+    @classmethod
+    def read(cls, f, name):
+        """Return the ColladaScene of a binary file object."""
+        return cls(f.read(), name).get_scene()
+
+    def unpack(self, fmt):
+        values = struct.unpack_from("<" + fmt, self.data, self.offset)
+        self.offset += struct.calcsize("<" + fmt)
+        return values
+
+    def array(self, dtype, count):
+        array = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += array.nbytes
+        return array
+
+    def get_scene(self):
+        magic, version, _ = self.unpack("4sII")
+        if magic != PMD_MAGIC:
+            raise ValueError("Not a PMD file")
+        if version < MIN_PMD_VERSION:
+            raise ValueError(f"Unsupported PMD version {version}")
+
+        (vertex_count,) = self.unpack("I")
+        uv_count = self.unpack("I")[0] if version >= 4 else 1
+        vertices = self.array(
+            np.dtype(
+                [
+                    ("position", "<f4", 3),
+                    ("normal", "<f4", 3),
+                    ("uv", "<f4", (uv_count, 2)),
+                    ("bones", "u1", 4),
+                    ("weights", "<f4", 4),
+                ]
+            ),
+            vertex_count,
+        )
+        (face_count,) = self.unpack("I")
+        faces = self.array("<u2", face_count * 3).astype(np.int64)
+        (bone_count,) = self.unpack("I")
+        bones = self.array("<f4", bone_count * 7).reshape(bone_count, 7)
+        (prop_point_count,) = self.unpack("I")
+        prop_points = []
+        for _ in range(prop_point_count):
+            (name_length,) = self.unpack("I")
+            (name,) = self.unpack(f"{name_length}s")
+            translation_rotation = self.unpack("7f")
+            (bone,) = self.unpack("B")
+            prop_points.append(
+                (
+                    name.decode("utf-8", "replace"),
+                    get_matrix(translation_rotation[:3], translation_rotation[3:]),
+                    bone,
+                )
+            )
+
+        mesh = MeshData(
+            self.name,
+            swap_axes(vertices["position"]),
+            faces,
+            np.arange(0, len(faces), 3),
+            swap_axes(vertices["normal"])[faces],
+            tuple(vertices["uv"][:, index][faces] for index in range(uv_count)),
+        )
+
+        bone_nodes = [
+            NodeData(
+                f"bone{index}",
+                f"bone{index}",
+                f"bone{index}",
+                True,
+                get_matrix(bone[:3], bone[3:]),
+                (),
+                None,
+            )
+            for index, bone in enumerate(bones)
+        ]
+        nodes = []
+        for name, matrix, bone in prop_points:
+            node = NodeData(name, "prop_" + name, None, False, matrix, (), None)
+            if bone != NO_BONE and bone < bone_count:
+                parent = bone_nodes[bone]
+                bone_nodes[bone] = parent._replace(children=parent.children + (node,))
+            else:
+                nodes.append(node)
+
+        controllers = {}
+        if bone_count:
+            influences = vertices["bones"] != NO_BONE
+            controllers["skin"] = SkinData(
+                "mesh",
+                np.identity(4),
+                tuple(node.sid for node in bone_nodes),
+                np.nonzero(influences)[0],
+                vertices["bones"][influences].astype(np.int64),
+                vertices["weights"][influences],
+            )
+            nodes.insert(
+                0,
+                NodeData(
+                    "root",
+                    "root",
+                    "root",
+                    True,
+                    np.identity(4),
+                    tuple(bone_nodes),
+                    None,
+                ),
+            )
+
+        nodes.insert(
+            0,
+            NodeData(
+                "mesh",
+                self.name,
+                None,
+                False,
+                np.identity(4),
+                (),
+                ("controller", "skin") if bone_count else ("geometry", "mesh"),
+            ),
+        )
+        return ColladaScene({"mesh": mesh}, controllers, tuple(nodes), "Z_UP", 1.0)
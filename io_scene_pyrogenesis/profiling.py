@@ -0,0 +1,136 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from typing import NamedTuple
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class StageEvent(NamedTuple):
+    """A timed stage, in seconds since the start of the import."""
+
+    name: str
+    actor: str
+    depth: int
+    start: float
+    duration: float
+    # Duration minus that of the stages nested in it.
+    self_duration: float
+    # Id of the thread the stage ran in.
+    thread: int = None
+
+
+class ImportProfiler:
+    """Record the wall time of the import stages, per actor and prop depth.
+
+    Stages can be nested, e.g. a texture load inside prop recursion. Totals use
+    the time spent in a stage itself, so that they add up to the import time,
+    except for stages timed in worker threads, which overlap the others.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        # Thread id -> time spent in nested stages, for each stage being timed.
+        self.stacks = {}
+        # Thread id -> (actor path, prop depth) being worked on.
+        self.actors = {}
+
+    @contextlib.contextmanager
+    def actor(self, path, depth):
+        """Attribute the stages timed in this context to an actor."""
+        actors = self.actors.setdefault(threading.get_ident(), [])
+        actors.append((path, depth))
+        try:
+            yield
+        finally:
+            actors.pop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the code run in this context as one occurrence of a stage."""
+        thread = threading.get_ident()
+        stack = self.stacks.setdefault(thread, [])
+        nested = [0.0]
+        stack.append(nested)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += duration
+            actors = self.actors.get(thread)
+            actor, depth = actors[-1] if actors else (None, None)
+            self.events.append(
+                StageEvent(
+                    name,
+                    actor,
+                    depth,
+                    start - self.origin,
+                    duration,
+                    duration - nested[0],
+                    thread,
+                )
+            )
+
+    def get_elapsed(self):
+        return time.perf_counter() - self.origin
+
+    def get_totals(self, key=lambda event: event.name):
+        """Return key -> (seconds, count), the slowest first."""
+        totals = {}
+        for event in self.events:
+            seconds, count = totals.get(key(event), (0.0, 0))
+            totals[key(event)] = (seconds + event.self_duration, count + 1)
+
+        return dict(sorted(totals.items(), key=lambda item: -item[1][0]))
+
+    def get_summary(self, stage_count=4):
+        """Return a single line with the total time and the slowest stages."""
+        stages = [
+            f"{name} {seconds:.2f}s ({count})"
+            for name, (seconds, count) in self.get_totals().items()
+        ]
+        summary = f"Imported in {self.get_elapsed():.2f}s"
+        if stages and stage_count:
+            summary += ": " + ", ".join(stages[:stage_count])
+        return summary
+
+    def log_summary(self, logger):
+        """Log the time of every stage, then of every prop depth and actor."""
+        logger.info(self.get_summary(stage_count=0))
+        for name, (seconds, count) in self.get_totals().items():
+            logger.info(f"  {name}: {seconds:.3f}s in {count} calls")
+        for depth, (seconds, _) in self.get_totals(lambda e: e.depth).items():
+            logger.info(f"  depth {depth}: {seconds:.3f}s")
+        for actor, (seconds, _) in self.get_totals(lambda e: e.actor).items():
+            logger.info(f"  {actor}: {seconds:.3f}s")
+
+    def write_trace(self, path):
+        """Write the stages in the Chrome trace format, for about://tracing."""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        trace_events = [
+            {
+                "name": event.name,
+                "cat": "import",
+                "ph": "X",
+                "ts": round(event.start * 1e6, 3),
+                "dur": round(event.duration * 1e6, 3),
+                "pid": pid,
+                "tid": event.thread or tid,
+                "args": {"actor": event.actor, "depth": event.depth},
+            }
+            for event in self.events
+        ]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, indent=1
+            )
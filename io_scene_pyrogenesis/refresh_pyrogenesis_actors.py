@@ -0,0 +1,170 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .actor_plan import ActorPlanner
+from .dependency_graph import DependencyGraph, find_node, get_stale_nodes
+from .import_pyrogenesis_actor import create_builder, get_cache_directory
+from .import_session import ImportSession
+from .scene_builder import (
+    DEPENDENCIES_PROPERTY,
+    IMPORT_PROPERTY,
+    NODE_PROPERTY,
+    PropPoints,
+    get_prop_point_name,
+)
+from .vfs import VirtualFileSystem
+import bpy
+import logging
+import xml.etree.ElementTree as ET
+
+
+class RefreshPyrogenesisActors(bpy.types.Operator):
+    """Import again the parts of Pyrogenesis actors whose files changed"""
+
+    bl_label = "Refresh Pyrogenesis Actors"
+    bl_idname = "import_pyrogenesis_scene.refresh"
+    bl_options = {"REGISTER", "UNDO"}
+
+    refresh_all: bpy.props.BoolProperty(
+        name="All actors",
+        description=(
+            "Refresh every imported actor of the scene rather than the selected ones"
+        ),
+        default=False,
+    )  # type: ignore
+
+    def __init__(self):
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
+
+    def execute(self, context):
+        objects = (
+            context.scene.objects if self.refresh_all else context.selected_objects
+        )
+        import_ids = {obj[IMPORT_PROPERTY] for obj in objects if IMPORT_PROPERTY in obj}
+        roots = [
+            obj
+            for obj in context.scene.objects
+            if DEPENDENCIES_PROPERTY in obj and obj.get(IMPORT_PROPERTY) in import_ids
+        ]
+        if not roots:
+            self.report({"WARNING"}, "No imported Pyrogenesis actors to refresh")
+            return {"CANCELLED"}
+
+        refreshed = 0
+        with ImportSession(context):
+            for root in roots:
+                try:
+                    refreshed += self.refresh_actor(context, root)
+                except (ValueError, OSError, ET.ParseError) as e:
+                    self.report({"ERROR"}, f"Could not refresh {root.name}: {e}")
+
+        self.report({"INFO"}, f"Refreshed {refreshed} of {len(roots)} actors")
+        return {"FINISHED"}
+
+    def refresh_actor(self, context, root):
+        """Build again what changed in the import of a root object, if anything."""
+        graph = DependencyGraph.from_json(root[DEPENDENCIES_PROPERTY])
+        with VirtualFileSystem(get_cache_directory("vfs")) as vfs:
+            for path, priority, prefix in graph.mounts:
+                vfs.mount(path, priority, prefix)
+            return self.refresh_files(context, root, graph, vfs)
+
+    def refresh_files(self, context, root, graph, vfs):
+        """Rebuild what the changed files of an import's graph affect."""
+        changed_files = graph.get_changed_files(vfs)
+        if not changed_files:
+            return False
+
+        self.logger.info("Changed files:\n" + "\n".join(sorted(changed_files)))
+        planner = ActorPlanner(vfs, **graph.settings["planner"])
+        plan = planner.plan(graph.plan.path, previous=graph.plan)
+        stale_nodes = get_stale_nodes(graph.plan, plan, changed_files)
+
+        builder = create_builder(vfs, graph.settings)
+
+        # Images are reloaded in place, so materials using them stay valid.
+        for path, image_name in graph.images.items():
+            image = bpy.data.images.get(image_name)
+            if image is None or path not in changed_files:
+                continue
+            try:
+                image.filepath = builder.get_texture_path(path)
+            except (OSError, RuntimeError) as e:
+                self.logger.warning(f"Could not load texture {path}: {e}")
+                continue
+            image.reload()
+
+        for path, image_name in graph.images.items():
+            if image_name in bpy.data.images:
+                builder.images[path] = bpy.data.images[image_name]
+
+        import_id = root[IMPORT_PROPERTY]
+        try:
+            for node in stale_nodes:
+                self.rebuild_node(context, builder, import_id, plan, node)
+            if "0" not in stale_nodes:
+                builder.roots.append((plan, root))
+            builder.store_dependencies(graph.settings)
+        finally:
+            builder.finish()
+
+        return True
+
+    def rebuild_node(self, context, builder, import_id, plan, node):
+        """Replace the objects of an actor and of its props with new ones."""
+        objects = [
+            obj
+            for obj in context.scene.objects
+            if obj.get(IMPORT_PROPERTY) == import_id
+        ]
+        node_objects = [
+            obj
+            for obj in objects
+            if obj[NODE_PROPERTY] == node or obj[NODE_PROPERTY].startswith(node + "/")
+        ]
+        # Roots can be placed below an empty of their own, e.g. a variation's.
+        anchor = next(
+            (
+                obj.parent
+                for obj in node_objects
+                if obj.parent is not None and IMPORT_PROPERTY not in obj.parent
+            ),
+            None,
+        )
+        collection = context.collection
+        if node_objects and node_objects[0].users_collection:
+            collection = node_objects[0].users_collection[0]
+
+        attachpoint, node_plan = find_node(plan, node)
+        parent_points = None
+        root_target = None
+        if node != "0":
+            # Props follow the prop points, or else the last object, of their parent.
+            parent_node = node.rsplit("/", 1)[0]
+            parent_points = PropPoints()
+            for obj in objects:
+                if obj[NODE_PROPERTY] != parent_node:
+                    continue
+                parent_points.add_object(obj)
+                if obj.type != "ARMATURE" and get_prop_point_name(obj.name) is None:
+                    root_target = (obj, None)
+            root_target = root_target or parent_points.get(attachpoint)
+
+        for obj in node_objects:
+            bpy.data.objects.remove(obj)
+
+        first_object = len(builder.imported_objects)
+        builder.import_id = import_id
+        builder.collection = collection
+        builder.build_actor(
+            node_plan,
+            attachpoint,
+            parent_points,
+            root_target,
+            None if node == "0" else node,
+        )
+        if anchor is not None:
+            for obj in builder.imported_objects[first_object:]:
+                if obj.parent is None and len(obj.constraints) == 0:
+                    obj.parent = anchor
@@ -0,0 +1,910 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .collada_reader import ColladaReader
+from .dependency_graph import DependencyGraph
+from .material_cache import MaterialCache
+from .max_collada_fixer import COLLADA_FIXERS
+from .mesh_builder import ColladaMeshBuilder
+from .pmd_reader import PmdReader, find_pmd
+from .profiling import ImportProfiler
+from .texture_cache import get_level
+from .texture_prefetch import read_texture_header
+from mathutils import Matrix
+import bpy
+import json
+import logging
+import math
+import os
+import re
+import struct
+import uuid
+import xml.etree.ElementTree as ET
+
+# Prop points are named prop_<attachpoint>, or prop-/prop. in some exporters,
+# with an optional .001 suffix added by Blender when names collide.
+PROP_POINT_PATTERN = re.compile(r"prop[_.-](.+?)(?:\.\d{3,})?")
+
+# Custom properties of the empties standing for props that are not imported.
+PROXY_ACTOR_PROPERTY = "pyrogenesis_proxy_actor"
+PROXY_ATTACHPOINT_PROPERTY = "pyrogenesis_proxy_attachpoint"
+PROXY_DEPTH_PROPERTY = "pyrogenesis_proxy_depth"
+PROXY_MOUNTS_PROPERTY = "pyrogenesis_proxy_mounts"
+PROXY_SETTINGS_PROPERTY = "pyrogenesis_proxy_settings"
+
+# Custom properties telling which import and which actor of it, e.g. "0/2" for
+# the third prop of the root actor, an object was created for.
+IMPORT_PROPERTY = "pyrogenesis_import"
+NODE_PROPERTY = "pyrogenesis_node"
+# Custom property of the first object of an import, holding its DependencyGraph.
+DEPENDENCIES_PROPERTY = "pyrogenesis_dependencies"
+
+# Raised by the native reader and mesh builder on files they cannot handle,
+# e.g. a dangling url or a skin without weights.
+MESH_READ_ERRORS = (
+    ValueError,
+    IndexError,
+    KeyError,
+    AttributeError,
+    TypeError,
+    ET.ParseError,
+    struct.error,
+)
+
+
+def get_prop_point_name(name):
+    """Return the attach point of a prop point object or bone, or None."""
+    match = PROP_POINT_PATTERN.fullmatch(name)
+    return match.group(1) if match is not None else None
+
+
+def get_attachment_target(obj):
+    """Return the (object, bone name) a prop object is attached to, or None.
+
+    Props follow their prop point with constraints, or are parented to it.
+    """
+    for constraint in obj.constraints:
+        if constraint.type == "COPY_LOCATION" and constraint.target is not None:
+            return constraint.target, constraint.subtarget or None
+    if obj.parent is None:
+        return None
+    if obj.parent_type == "BONE":
+        return obj.parent, obj.parent_bone or None
+    return obj.parent, None
+
+
+class PropPoints:
+    """Exact-match index of the prop points created for one actor.
+
+    Maps an attach point name to the (object, bone name) holding it, the bone
+    name being None for prop points that are objects rather than armature bones.
+    """
+
+    def __init__(self):
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def add_object(self, obj):
+        if obj.type == "ARMATURE":
+            for bone in obj.data.bones:
+                attachpoint = get_prop_point_name(bone.name)
+                if attachpoint is not None:
+                    self.points.setdefault(attachpoint, (obj, bone.name))
+            return
+
+        attachpoint = get_prop_point_name(obj.name)
+        if attachpoint is not None:
+            self.points.setdefault(attachpoint, (obj, None))
+
+    def get(self, attachpoint):
+        return self.points.get(attachpoint)
+
+
+class ActorSceneBuilder:
+    """Create Blender objects, materials and constraints from an ActorPlan."""
+
+    def __init__(
+        self,
+        vfs,
+        collada_cache_path,
+        collada_fixer="STREAM",
+        instance_meshes=True,
+        use_operators=False,
+        profiler=None,
+        mesh_reader="NATIVE",
+        mesh_cache=None,
+        use_pmd=True,
+        texture_cache=None,
+    ):
+        self.vfs = vfs
+        self.collada_cache_path = collada_cache_path
+        self.collada_fixer = COLLADA_FIXERS[collada_fixer]
+        self.instance_meshes = instance_meshes
+        self.use_operators = use_operators
+        # NATIVE reads Collada files itself, COLLADA_IMPORT uses Blender's importer.
+        self.mesh_reader = mesh_reader
+        # MeshCache of the natively read meshes, or None.
+        self.mesh_cache = mesh_cache
+        # Whether the native reader prefers PMD models of the meshes if found.
+        self.use_pmd = use_pmd
+        # TextureCache of reduced textures to load instead of the full ones, or None.
+        self.texture_cache = texture_cache
+        # Every object created, selected once the import is done.
+        self.imported_objects = []
+        # Mesh path -> objects of its first import, duplicated by later ones.
+        self.mesh_templates = {}
+        # (width, depth) -> quad mesh shared by decals of that size.
+        self.decal_meshes = {}
+        # Texture paths found missing while prefetching.
+        self.missing_textures = set()
+        # Texture path -> image loaded for it.
+        self.images = {}
+        # Id of the import being built and node of the actor being built in it.
+        self.import_id = None
+        self.node = "0"
+        # (plan, first object) of each root actor built.
+        self.roots = []
+        # Settings of the import, see ImportPyrogenesisActor.get_settings, stored
+        # on proxies so that they are expanded alike.
+        self.settings = None
+        # Path -> Future of prepare_mesh or of a TextureInfo, for files read by
+        # worker threads while the scene is built.
+        self.mesh_futures = {}
+        self.texture_futures = {}
+        self.materials = MaterialCache()
+        # Whether the materials that existed before the import are tagged yet.
+        self.materials_tagged = False
+        self.collection = bpy.context.collection
+        self.scratch_collection = None
+        self.profiler = profiler or ImportProfiler()
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
+
+    def build_actor(
+        self, plan, proppoint="root", parent_points=None, root_target=None, node=None
+    ):
+        """Create the objects of an actor plan and of all its props.
+
+        parent_points are the PropPoints of the parent actor and root_target the
+        (object, bone name) props attached to "root" follow. Without a node, the
+        actor is the root of a new import.
+        """
+        for _ in self.iter_build_actor(
+            plan, proppoint, parent_points, root_target, node
+        ):
+            pass
+
+    def iter_build_actor(
+        self, plan, proppoint="root", parent_points=None, root_target=None, node=None
+    ):
+        """Build an actor like build_actor, one step per next() call.
+
+        None is yielded after each mesh or decal, and the Future of a file read
+        by a worker thread while waiting for it. Stages spanning several steps
+        include the time the caller spends between them.
+        """
+        is_root = node is None
+        if is_root:
+            self.import_id = uuid.uuid4().hex
+            node = "0"
+
+        first_object = len(self.imported_objects)
+        parent_node = self.node
+        self.node = node
+        try:
+            with self.profiler.actor(plan.path, plan.depth):
+                yield from self.iter_build_actor_objects(
+                    plan, proppoint, parent_points, root_target
+                )
+        finally:
+            self.node = parent_node
+
+        if is_root and len(self.imported_objects) > first_object:
+            self.roots.append((plan, self.imported_objects[first_object]))
+
+    def iter_build_actor_objects(self, plan, proppoint, parent_points, root_target):
+        prop_points = PropPoints()
+        imported_objects = []
+        prop_root_target = root_target
+        material_type = plan.material
+
+        if root_target is not None:
+            self.logger.debug("Root object is:" + root_target[0].name)
+
+        for mesh_path in plan.meshes:
+            template = self.mesh_templates.get(mesh_path)
+            if template is not None:
+                imported_objects.extend(
+                    self.import_objects(
+                        lambda: self.instance_objects(template),
+                        prop_points,
+                        proppoint,
+                        parent_points,
+                        root_target,
+                        shared_data=True,
+                    )
+                )
+                yield
+                continue
+
+            future = self.mesh_futures.get(mesh_path)
+            while future is not None and not future.done():
+                yield future
+
+            objects = self.import_objects(
+                lambda: self.import_mesh(mesh_path),
+                prop_points,
+                proppoint,
+                parent_points,
+                root_target,
+            )
+            if self.instance_meshes and len(objects) > 0:
+                self.mesh_templates[mesh_path] = objects
+            imported_objects.extend(objects)
+            yield
+
+        for decal in plan.decals:
+            imported_objects.extend(
+                self.import_objects(
+                    lambda: self.import_decal(decal),
+                    prop_points,
+                    proppoint,
+                    parent_points,
+                    root_target,
+                    shared_data=True,
+                )
+            )
+            yield
+
+        # Proxies stand for props, and are attached to "root" like them.
+        if (plan.props or plan.proxies) and len(imported_objects) > 0:
+            self.print_header("Gathering Parent Props")
+
+            prop_root_target = None
+            for obj in imported_objects:
+                if obj.type != "ARMATURE" and get_prop_point_name(obj.name) is None:
+                    prop_root_target = (obj, None)
+
+            if prop_root_target is not None:
+                self.logger.debug(prop_root_target[0].name)
+
+        textures = []
+        for texture in plan.textures:
+            future = self.texture_futures.get(texture.path)
+            while future is not None and not future.done():
+                yield future
+            info = future.result() if future is not None else None
+            if info is not None and not info.exists:
+                self.missing_textures.add(texture.path)
+
+            # Missing files were already reported all at once.
+            if texture.path in self.missing_textures:
+                continue
+
+            self.logger.info("Loading " + texture.name + ": " + texture.path)
+            try:
+                image_path = self.get_texture_path(texture.path, info)
+                with self.profiler.stage("texture load"):
+                    image = bpy.data.images.load(image_path, check_existing=True)
+            except (OSError, RuntimeError):
+                self.logger.error("Could not load " + texture.path)
+                continue
+            self.images[texture.path] = image
+            textures.append((texture.name, image))
+
+        if len(textures):
+            with self.profiler.stage("material build"):
+                material_object = self.materials.get(material_type, textures)
+                material_object.tag = True
+
+            for obj in imported_objects:
+                if obj.type == "EMPTY" or obj.type == "ARMATURE":
+                    continue
+
+                self.assign_material_to_object(obj, material_object)
+
+        for index, prop in enumerate(plan.props):
+            self.print_header("Gathering Props")
+
+            prop_root_target = self.get_prop_root_target(
+                prop_root_target, prop_points, prop.attachpoint
+            )
+            with self.profiler.stage("prop recursion"):
+                yield from self.iter_build_actor(
+                    prop.actor,
+                    prop.attachpoint,
+                    prop_points,
+                    prop_root_target,
+                    f"{self.node}/{index}",
+                )
+
+        for proxy in plan.proxies:
+            prop_root_target = self.get_prop_root_target(
+                prop_root_target, prop_points, proxy.attachpoint
+            )
+            self.import_objects(
+                lambda: self.create_proxy(proxy),
+                PropPoints(),
+                proxy.attachpoint,
+                prop_points,
+                prop_root_target,
+                shared_data=True,
+            )
+
+    @staticmethod
+    def get_prop_root_target(prop_root_target, prop_points, attachpoint):
+        """Return what props attached to "root" follow.
+
+        Actors without a mesh of their own fall back to the first prop point
+        their props are attached to.
+        """
+        point = prop_points.get(attachpoint)
+        if point is not None and attachpoint != "root" and prop_root_target is None:
+            return point
+        return prop_root_target
+
+    def get_texture_path(self, texture_path, info=None):
+        """Return the file to load a texture from, reduced with the texture cache.
+
+        info is the TextureInfo of the texture when it was prefetched.
+        """
+        if self.texture_cache is None:
+            return self.vfs.real_path(texture_path)
+
+        with self.profiler.stage("texture reduce"):
+            path = self.texture_cache.get_reduced_path(self.vfs, texture_path)
+            if path is None:
+                path = self.downscale_texture(texture_path, info)
+        return path
+
+    def downscale_texture(self, texture_path, info=None):
+        """Return the path of a copy of a texture downscaled with bpy, as a PNG.
+
+        The size is taken from the file's header when it can be read, so that
+        textures needing no reduction are not loaded twice.
+        """
+        path = self.texture_cache.get_path(self.vfs, texture_path, ".png")
+        if os.path.exists(path):
+            return path
+
+        if info is not None and info.width is not None:
+            width, height = info.width, info.height
+        else:
+            _, width, height = read_texture_header(self.vfs.read_bytes(texture_path))
+        if width is not None and self.get_texture_level(width, height) == 0:
+            return self.vfs.real_path(texture_path)
+
+        image = bpy.data.images.load(self.vfs.real_path(texture_path))
+        try:
+            width, height = image.size
+            level = self.get_texture_level(width, height)
+            if level == 0:
+                return self.vfs.real_path(texture_path)
+
+            image.scale(max(width >> level, 1), max(height >> level, 1))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image.filepath_raw = path
+            image.file_format = "PNG"
+            image.save()
+        finally:
+            bpy.data.images.remove(image)
+        return path
+
+    def get_texture_level(self, width, height):
+        """Return how many times the texture cache halves a width x height image."""
+        return get_level(
+            width, height, self.texture_cache.mip_level, self.texture_cache.max_size
+        )
+
+    def create_proxy(self, proxy):
+        """Create an empty recording what is needed to import the prop later."""
+        obj = bpy.data.objects.new(
+            "proxy_" + os.path.splitext(os.path.basename(proxy.actor_path))[0], None
+        )
+        obj.empty_display_type = "CUBE"
+        obj.empty_display_size = 0.25
+        obj[PROXY_ACTOR_PROPERTY] = proxy.actor_path
+        obj[PROXY_ATTACHPOINT_PROPERTY] = proxy.attachpoint
+        obj[PROXY_DEPTH_PROPERTY] = proxy.depth
+        obj[PROXY_MOUNTS_PROPERTY] = json.dumps(self.vfs.get_mount_list())
+        if self.settings is not None:
+            obj[PROXY_SETTINGS_PROPERTY] = json.dumps(self.settings)
+        bpy.context.collection.objects.link(obj)
+
+    def expand_proxy(self, proxy_object, plan):
+        """Build the plan of a proxy's actor where the proxy stands, replacing it."""
+        target = get_attachment_target(proxy_object)
+        attachpoint = proxy_object[PROXY_ATTACHPOINT_PROPERTY]
+        parent_points = PropPoints()
+        if target is not None:
+            parent_points.points[attachpoint] = target
+
+        # The prop belongs to the actor of the proxy, below a node of its own.
+        self.import_id = proxy_object.get(IMPORT_PROPERTY)
+        node = f"{proxy_object.get(NODE_PROPERTY, '0')}/{proxy_object.name}"
+        collection = self.collection
+        if proxy_object.users_collection:
+            self.collection = proxy_object.users_collection[0]
+        try:
+            self.build_actor(plan, attachpoint, parent_points, target, node)
+        finally:
+            self.collection = collection
+        bpy.data.objects.remove(proxy_object)
+
+    def build_variations(self, plans, name, spacing):
+        """Build each plan in its own collection, on a grid spacing units apart.
+
+        Meshes, decals and materials already created for a plan are reused by
+        the next ones, so each extra variation mostly costs object copies.
+        """
+        for _ in self.iter_build_variations(plans, name, spacing):
+            pass
+
+    def iter_build_variations(self, plans, name, spacing):
+        """Build variations like build_variations, in the steps of iter_build_actor."""
+        columns = math.ceil(math.sqrt(len(plans)))
+        collection = self.collection
+        try:
+            for index, plan in enumerate(plans):
+                self.collection = bpy.data.collections.new(f"{name} {index + 1}")
+                collection.children.link(self.collection)
+                first_object = len(self.imported_objects)
+                yield from self.iter_build_actor(plan)
+
+                # Roots are parented to an empty, as instanced copies of their
+                # objects must not inherit the offset of their template.
+                anchor = bpy.data.objects.new(self.collection.name, None)
+                anchor.location = (
+                    (index % columns) * spacing,
+                    (index // columns) * spacing,
+                    0,
+                )
+                self.collection.objects.link(anchor)
+                for obj in self.imported_objects[first_object:]:
+                    if obj.parent is None and len(obj.constraints) == 0:
+                        obj.parent = anchor
+                self.imported_objects.append(anchor)
+        finally:
+            self.collection = collection
+
+    def prepare_mesh(self, mesh_path):
+        """Do the file work of importing a mesh, without bpy, e.g. in a worker thread.
+
+        Returns the ColladaScene to build for the native reader, or the path of
+        the fixed Collada file for Blender's importer.
+        """
+        if self.mesh_reader == "NATIVE":
+            return self.read_mesh(mesh_path)
+        return self.fix_collada(mesh_path)
+
+    def import_mesh(self, mesh_path):
+        future = self.mesh_futures.get(mesh_path)
+        if self.mesh_reader == "NATIVE":
+            mesh_builder = None
+            try:
+                scene = future.result() if future else self.read_mesh(mesh_path)
+                mesh_builder = ColladaMeshBuilder(scene)
+                with self.profiler.stage("mesh build"):
+                    mesh_builder.build()
+                return
+            except OSError as e:
+                # Blender's importer could not read the file either.
+                self.logger.error(f"Could not load {mesh_path}: {e}")
+                return
+            except MESH_READ_ERRORS as e:
+                self.logger.warning(
+                    f"Could not read {mesh_path} ({e!r}), using the Collada importer"
+                )
+                # Objects of a partly built scene would be imported twice.
+                if mesh_builder is not None:
+                    for obj in mesh_builder.objects:
+                        bpy.data.objects.remove(obj)
+                future = None
+
+        try:
+            fixed_path = future.result() if future else self.fix_collada(mesh_path)
+            with self.profiler.stage("collada import"):
+                bpy.ops.wm.collada_import(filepath=fixed_path, import_units=True)
+        except Exception:
+            self.logger.error("Could not load" + mesh_path)
+
+    def fix_collada(self, mesh_path):
+        """Return the path of a copy of a Collada file that Blender can import."""
+        fixer = self.collada_fixer(mesh_path, self.collada_cache_path, self.vfs)
+        with self.profiler.stage("collada fix"):
+            return fixer.execute()
+
+    def read_mesh(self, mesh_path):
+        """Return the ColladaScene of a mesh, read from its PMD model if any."""
+        pmd_path = find_pmd(self.vfs, mesh_path) if self.use_pmd else None
+        if pmd_path is not None:
+            try:
+                with self.profiler.stage("pmd read"):
+                    with self.vfs.open(pmd_path) as f:
+                        return PmdReader.read(
+                            f, os.path.splitext(os.path.basename(mesh_path))[0]
+                        )
+            except (ValueError, struct.error) as e:
+                self.logger.warning(
+                    f"Could not read {pmd_path} ({e}), using {mesh_path}"
+                )
+
+        return self.read_collada(mesh_path)
+
+    def read_collada(self, mesh_path):
+        """Return the ColladaScene of a mesh, from the mesh cache if possible."""
+        key = None
+        if self.mesh_cache is not None:
+            with self.profiler.stage("mesh cache"):
+                key = self.mesh_cache.get_key(self.vfs, mesh_path)
+                scene = self.mesh_cache.load(key)
+            if scene is not None:
+                return scene
+
+        with self.profiler.stage("collada read"):
+            with self.vfs.open(mesh_path) as f:
+                scene = ColladaReader.read(f)
+
+        if key is not None:
+            with self.profiler.stage("mesh cache"):
+                try:
+                    self.mesh_cache.store(key, scene)
+                except OSError as e:
+                    self.logger.warning("Could not cache " + mesh_path + ": " + str(e))
+        return scene
+
+    def instance_objects(self, template):
+        """Link duplicates of template objects, sharing their data."""
+        copies = {}
+        for obj in template:
+            copy = obj.copy()
+            # Constraints attach the template to its own parent actor.
+            copy.constraints.clear()
+            bpy.context.collection.objects.link(copy)
+            copies[obj] = copy
+
+        for obj, copy in copies.items():
+            copy.parent = copies.get(obj.parent)
+            for modifier in copy.modifiers:
+                if getattr(modifier, "object", None) in copies:
+                    modifier.object = copies[modifier.object]
+
+    def import_decal(self, decal):
+        """Create a decal object, placed by its transform rather than its mesh."""
+        obj = bpy.data.objects.new(
+            "Decal", self.get_decal_mesh(decal.width, decal.depth)
+        )
+        obj.location = (decal.offset_x, decal.offset_z, 0)
+        obj.rotation_euler = (0, 0, math.radians(decal.angle))
+        bpy.context.collection.objects.link(obj)
+
+    def get_decal_mesh(self, width, depth):
+        """Return the quad mesh shared by every decal of the given size."""
+        mesh = self.decal_meshes.get((width, depth))
+        if mesh is not None:
+            return mesh
+
+        mesh = bpy.data.meshes.new("Decal")
+        mesh.from_pydata(
+            [
+                (-width / 2, -depth / 2, 0.01),
+                (width / 2, -depth / 2, 0.01),
+                (-width / 2, depth / 2, 0.01),
+                (width / 2, depth / 2, 0.01),
+            ],
+            [],
+            [(0, 1, 3, 2)],
+        )
+        # The whole texture is mapped on the quad, as Reset UVs would do.
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        uv_layer.data.foreach_set("uv", (0, 0, 1, 0, 1, 1, 0, 1))
+        mesh.update(calc_edges=True)
+        self.decal_meshes[(width, depth)] = mesh
+        return mesh
+
+    def create_tracked(self, create):
+        """Run create() and return exactly the objects it added to the scene.
+
+        New objects land in a scratch collection, made active for the duration,
+        and are then moved to the collection the actor is imported into.
+        """
+        if self.scratch_collection is None:
+            self.scratch_collection = bpy.data.collections.new("Pyrogenesis Import")
+            bpy.context.scene.collection.children.link(self.scratch_collection)
+
+        view_layer = bpy.context.view_layer
+        active_layer_collection = view_layer.active_layer_collection
+        view_layer.active_layer_collection = view_layer.layer_collection.children[
+            self.scratch_collection.name
+        ]
+        try:
+            create()
+        finally:
+            view_layer.active_layer_collection = active_layer_collection
+
+        objects = list(self.scratch_collection.objects)
+        for obj in objects:
+            self.collection.objects.link(obj)
+            self.scratch_collection.objects.unlink(obj)
+
+        return objects
+
+    def store_dependencies(self, settings):
+        """Record on the first object of each root actor what it was built from."""
+        image_names = {path: image.name for path, image in self.images.items()}
+        for plan, root in self.roots:
+            root[DEPENDENCIES_PROPERTY] = DependencyGraph.create(
+                self.vfs, plan, settings, image_names, self.use_pmd
+            ).to_json()
+
+    def finish(self):
+        """Remove the temporary data used while building and select the result."""
+        self.materials.finish()
+        if self.scratch_collection is not None:
+            bpy.data.collections.remove(self.scratch_collection)
+            self.scratch_collection = None
+
+        for obj in bpy.context.selected_objects:
+            obj.select_set(False)
+        for obj in self.imported_objects:
+            obj.select_set(True)
+        roots = [obj for obj in self.imported_objects if obj.parent is None]
+        if roots:
+            bpy.context.view_layer.objects.active = roots[0]
+
+    def prepare_objects(self, imported_objects, imported_materials):
+        """Apply transforms and drop the materials created by the importer."""
+        with self.profiler.stage("transform apply"):
+            if self.use_operators:
+                self.prepare_objects_with_operators(imported_objects)
+            else:
+                self.prepare_objects_with_data(imported_objects)
+
+        for material in imported_materials:
+            bpy.data.materials.remove(material)
+
+    def prepare_objects_with_data(self, imported_objects):
+        """Do what prepare_objects_with_operators does through the data API.
+
+        Transforms are applied with matrix math instead of transform_apply,
+        which would evaluate the depsgraph and depends on the selection.
+        """
+
+        def get_depth(obj):
+            depth = 0
+            while obj.parent is not None:
+                obj = obj.parent
+                depth += 1
+            return depth
+
+        # Parents first, so that children are compensated for their changes.
+        for obj in sorted(imported_objects, key=get_depth):
+            if obj.type == "MESH":
+                self.mesh_uv_layers_names_update(obj.data)
+                obj.data.materials.clear()
+
+            if get_prop_point_name(obj.name) is not None:
+                # Prop points keep their location and rotation.
+                location, rotation, scale = obj.matrix_basis.decompose()
+                applied = Matrix.Diagonal(scale).to_4x4()
+                basis = Matrix.LocRotScale(location, rotation, None)
+            else:
+                applied = obj.matrix_basis.copy()
+                basis = Matrix.Identity(4)
+
+            if hasattr(obj.data, "transform"):
+                obj.data.transform(applied)
+            obj.matrix_basis = basis
+            for child in obj.children:
+                child.matrix_parent_inverse = applied @ child.matrix_parent_inverse
+
+    def prepare_objects_with_operators(self, imported_objects):
+        for obj in imported_objects:
+            obj.select_set(True)
+            if obj.type == "MESH":
+                self.mesh_uv_layers_names_update(obj.data)
+
+        # Prop points keep their location and rotation.
+        for obj in imported_objects:
+            if get_prop_point_name(obj.name) is not None:
+                obj.select_set(False)
+
+        bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+
+        for obj in imported_objects:
+            obj.select_set(True)
+        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
+
+        # Clear old materials
+        for ob in bpy.context.selected_editable_objects:
+            ob.active_material_index = 0
+            for i in range(len(ob.material_slots)):
+                bpy.ops.object.material_slot_remove()
+
+    def import_objects(
+        self,
+        create,
+        prop_points,
+        proppoint,
+        parent_points,
+        root_target,
+        shared_data=False,
+    ):
+        """Run create() and prepare the objects it added to the scene.
+
+        Prop points of the new objects are added to prop_points and the objects
+        are attached to proppoint of the parent actor. Objects with shared_data
+        use data that is already prepared, e.g. instances, and are only attached.
+        """
+        self.print_header("Gathering Mesh")
+
+        # Only the new objects must be affected by the operators below.
+        if self.use_operators:
+            for obj in bpy.context.selected_objects:
+                obj.select_set(False)
+
+        # Materials created by the import are the only untagged ones. Existing
+        # ones are tagged once per import, and the actors' own when created.
+        if not self.materials_tagged:
+            bpy.data.materials.tag(True)
+            self.materials_tagged = True
+        material_count = len(bpy.data.materials)
+        with self.profiler.stage("object creation"):
+            imported_objects = self.create_tracked(create)
+        self.imported_objects.extend(imported_objects)
+        if self.import_id is not None:
+            for obj in imported_objects:
+                obj[IMPORT_PROPERTY] = self.import_id
+                obj[NODE_PROPERTY] = self.node
+        imported_materials = set()
+        if len(bpy.data.materials) > material_count:
+            imported_materials = {
+                material
+                for obj in imported_objects
+                for material in getattr(obj.data, "materials", ())
+                if material is not None and not material.tag
+            }
+
+        for imported_object in imported_objects:
+            # Use a single naming scheme for prop points, e.g. prop_head.
+            if get_prop_point_name(imported_object.name) is not None:
+                imported_object.name = "prop_" + imported_object.name[5:]
+                data = imported_object.data
+                if data is not None and get_prop_point_name(data.name) is not None:
+                    data.name = "prop_" + data.name[5:]
+
+            if imported_object.type == "ARMATURE":
+                for bone in imported_object.data.bones:
+                    if get_prop_point_name(bone.name) is not None:
+                        bone.name = "prop_" + bone.name[5:]
+
+            prop_points.add_object(imported_object)
+
+        # Instances share data that was already prepared for their template.
+        if not shared_data:
+            self.prepare_objects(imported_objects, imported_materials)
+
+        # The root actor has nothing to be attached to.
+        if proppoint == "root" and root_target is None:
+            return imported_objects
+
+        self.print_header("Setting Constraints")
+
+        target = root_target
+        if proppoint != "root":
+            target = parent_points.get(proppoint) if parent_points else None
+
+        with self.profiler.stage("constraints"):
+            self.attach_objects(imported_objects, target, proppoint, root_target)
+
+        return imported_objects
+
+    def attach_objects(self, imported_objects, target, proppoint, root_target):
+        """Constrain or parent the objects of a prop to its (object, bone name)."""
+        for imported_object in imported_objects:
+            # props are parented so they should follow their root object.
+            if (
+                imported_object.type == "EMPTY"
+                and get_prop_point_name(imported_object.name) is not None
+            ):
+                continue
+
+            if target is None:
+                self.logger.error(
+                    imported_object.name
+                    + " has no parent prop point named prop_"
+                    + proppoint
+                    + ". Root object name: "
+                    + (root_target[0].name if root_target is not None else "Undefined")
+                )
+                continue
+
+            self.set_copy_transform_constraint(imported_object, *target)
+
+    def set_copy_transform_constraint(self, obj, target, bone_name=None):
+        """Set constraints for props so that they fit their prop point."""
+
+        if obj.matrix_basis != Matrix.Identity(4):
+            # Objects placed by their own transform, e.g. decals, would lose
+            # their offset to the constraints, so they are parented instead.
+            obj.parent = target
+            if bone_name is not None:
+                obj.parent_type = "BONE"
+                obj.parent_bone = bone_name
+                # Bone children are placed from the tail of the bone, while the
+                # constraints of other props follow its head.
+                obj.matrix_parent_inverse = Matrix.Translation(
+                    (0, -target.data.bones[bone_name].length, 0)
+                )
+            return
+
+        if bone_name is not None:
+            self.logger.debug(obj.name + " -> " + target.name + " -> " + bone_name)
+            constraint = obj.constraints.new("COPY_LOCATION")
+            constraint.show_expanded = False
+            constraint.mute = False
+            constraint.target = target
+            constraint.subtarget = bone_name
+            constraint2 = obj.constraints.new("COPY_ROTATION")
+            constraint2.show_expanded = False
+            constraint2.mute = False
+            constraint2.target = target
+            constraint2.subtarget = bone_name
+            return
+
+        self.logger.debug(obj.name + " -> " + target.name)
+        constraint = obj.constraints.new("COPY_LOCATION")
+        constraint.show_expanded = False
+        constraint.mute = False
+        constraint.target = target
+        constraint2 = obj.constraints.new("COPY_ROTATION")
+        constraint2.show_expanded = False
+        constraint2.mute = False
+        constraint2.target = target
+        obj.parent = target
+
+    def assign_material_to_object(self, ob, mat):
+        """Assigns a given material to an object."""
+
+        if not ob.data.materials:
+            # No slots, append.
+            ob.data.materials.append(mat)
+        elif ob.data.users > 1 and ob.data.materials[0] != mat:
+            # Instanced data is shared, so link the material to this object only.
+            ob.material_slots[0].link = "OBJECT"
+            ob.material_slots[0].material = mat
+        else:
+            # Assign to 1st material slot.
+            ob.data.materials[0] = mat
+
+    def mesh_uv_layers_names_update(self, mesh: bpy.types.Mesh):
+        if len(mesh.uv_layers) > 0:
+            self.logger.info("Renaming" + mesh.uv_layers[0].name + " to " + "UVMap")
+            mesh.uv_layers[0].name = "UVMap"
+
+        if len(mesh.uv_layers) > 1:
+            self.logger.info("Renaming" + mesh.uv_layers[1].name + " to " + "AOMap")
+            mesh.uv_layers[1].name = "AOMap"
+
+    def print_header(self, header_name):
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
+        MAX_LENGTH = 55  # Define the maximum length of the lines
+
+        header_line = f"============== {header_name} ============"
+        header_line = header_line.center(MAX_LENGTH, "=")
+
+        # Ensure the line length matches MAX_LENGTH
+        if len(header_line) > MAX_LENGTH:
+            header_line = header_line[:MAX_LENGTH]
+        else:
+            header_line = header_line.center(MAX_LENGTH, "=")
+
+        # Print the log lines
+        self.logger.info("=" * MAX_LENGTH)
+        self.logger.info(header_line)
+        self.logger.info("=" * MAX_LENGTH)
+        self.logger.info("")
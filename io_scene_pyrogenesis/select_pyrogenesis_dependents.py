@@ -0,0 +1,87 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from .actor_index import ActorIndex
+from .dependency_graph import DependencyGraph
+from .import_pyrogenesis_actor import get_cache_directory, mount_mods
+from .scene_builder import DEPENDENCIES_PROPERTY, IMPORT_PROPERTY
+import bpy
+import bpy_extras
+import hashlib
+import json
+import logging
+import os
+
+
+class SelectPyrogenesisDependents(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
+    """Select the imported actors using a mesh, texture, variant or actor file"""
+
+    bl_label = "Select Pyrogenesis Dependents"
+    bl_idname = "import_pyrogenesis_scene.select_dependents"
+    bl_options = {"REGISTER", "UNDO"}
+    filter_glob: bpy.props.StringProperty(
+        default="*.xml;*.dae;*.pmd;*.png;*.dds", options={"HIDDEN"}
+    )  # type: ignore
+
+    additional_mods: bpy.props.StringProperty(
+        name="Additional mods",
+        description=(
+            "Mod folders or archives to index too, separated by"
+            ' ";" and highest priority first, e.g. the public mod or public.zip'
+        ),
+        default="",
+    )  # type: ignore
+
+    refresh: bpy.props.BoolProperty(
+        name="Refresh",
+        description="Refresh the selected actors afterwards",
+        default=False,
+    )  # type: ignore
+
+    def __init__(self):
+        self.logger = logging.getLogger("PyrogenesisActorImporter")
+
+    def execute(self, context):
+        normalized = self.filepath.replace("\\", "/")
+        index = normalized.rfind("/art/")
+        if index == -1:
+            self.report({"ERROR"}, self.filepath + " is not in an art folder")
+            return {"CANCELLED"}
+
+        path = normalized[index + 1 :]
+        with mount_mods(
+            normalized[: index + len("/art")], self.additional_mods, "", self.report
+        ) as vfs:
+            # One index per set of mods, updated with the files that changed.
+            mounts_id = hashlib.sha1(
+                json.dumps(vfs.get_mount_list()).encode("utf-8")
+            ).hexdigest()[:16]
+            with ActorIndex(
+                os.path.join(get_cache_directory("index"), mounts_id + ".sqlite")
+            ) as actor_index:
+                actor_index.update(vfs)
+                actors = set(actor_index.get_affected_actors(path))
+        self.logger.info(f"Actors using {path}:\n" + "\n".join(sorted(actors)))
+
+        import_ids = set()
+        for obj in context.scene.objects:
+            if DEPENDENCIES_PROPERTY not in obj:
+                continue
+            try:
+                graph = DependencyGraph.from_json(obj[DEPENDENCIES_PROPERTY])
+            except ValueError:
+                continue
+            if any(actor.path in actors for actor in graph.plan.walk()):
+                import_ids.add(obj[IMPORT_PROPERTY])
+
+        for obj in context.scene.objects:
+            obj.select_set(obj.get(IMPORT_PROPERTY) in import_ids)
+
+        self.report(
+            {"INFO"},
+            f"{len(actors)} actors use {path}, {len(import_ids)} imports selected",
+        )
+        if self.refresh and import_ids:
+            bpy.ops.import_pyrogenesis_scene.refresh()
+        return {"FINISHED"}
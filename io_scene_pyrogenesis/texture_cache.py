@@ -0,0 +1,203 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+
+# Bump when the reduced files change, to ignore older ones.
+CACHE_VERSION = 1
+
+DDS_MAGIC = b"DDS "
+# Offsets and flags of the DDS header, see DDS_HEADER and DDS_PIXELFORMAT.
+DDS_HEADER = struct.Struct("<4sIIIIIII")
+DDS_HEADER_SIZE = 128
+DDSD_PITCH = 0x8
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_FOURCC = 0x4
+# Bytes per 4x4 block of the compressed formats.
+BLOCK_SIZES = {b"DXT1": 8, b"DXT3": 16, b"DXT5": 16}
+
+
+def get_level(width, height, mip_level=0, max_size=0):
+    """Return how many times to halve a width x height image.
+
+    The image is halved at least mip_level times, and until it fits in
+    max_size when not 0.
+    """
+    level = mip_level
+    while max_size > 0 and max(width >> level, height >> level) > max_size:
+        level += 1
+    return min(level, max(width, height).bit_length() - 1)
+
+
+def get_dds_level_sizes(data):
+    """Return the byte size of each mip level of DDS data, or None if unsupported.
+
+    Supported are DXT1, DXT3 and DXT5 compressed and uncompressed 2D textures.
+    """
+    if len(data) < DDS_HEADER_SIZE or not data.startswith(DDS_MAGIC):
+        return None
+
+    _, _, flags, height, width, _, _, mip_count = DDS_HEADER.unpack_from(data)
+    (format_flags, four_cc, bit_count) = struct.unpack_from("<I4sI", data, 80)
+    (caps2,) = struct.unpack_from("<I", data, 112)
+    # Cube maps and volumes store their levels differently.
+    if caps2 != 0:
+        return None
+
+    if not flags & DDSD_MIPMAPCOUNT or mip_count == 0:
+        mip_count = 1
+    block_size = BLOCK_SIZES.get(four_cc) if format_flags & DDPF_FOURCC else None
+    if format_flags & DDPF_FOURCC and block_size is None:
+        return None
+
+    sizes = []
+    for level in range(mip_count):
+        level_width = max(width >> level, 1)
+        level_height = max(height >> level, 1)
+        if block_size is not None:
+            sizes.append(
+                ((level_width + 3) // 4) * ((level_height + 3) // 4) * block_size
+            )
+        else:
+            sizes.append(level_width * level_height * bit_count // 8)
+
+    if DDS_HEADER_SIZE + sum(sizes) > len(data):
+        return None
+    return sizes
+
+
+def reduce_dds(data, level):
+    """Return DDS data starting at a mip level, or None if it has no such level."""
+    sizes = get_dds_level_sizes(data)
+    if sizes is None or level >= len(sizes):
+        return None
+
+    header = bytearray(data[:DDS_HEADER_SIZE])
+    _, _, flags, height, width, _, _, _ = DDS_HEADER.unpack_from(header)
+    width = max(width >> level, 1)
+    height = max(height >> level, 1)
+    (format_flags, bit_count) = struct.unpack_from("<I4xI", header, 80)
+    if format_flags & DDPF_FOURCC:
+        flags = (flags & ~DDSD_PITCH) | DDSD_LINEARSIZE
+        pitch = sizes[level]
+    else:
+        flags = (flags & ~DDSD_LINEARSIZE) | DDSD_PITCH
+        pitch = width * bit_count // 8
+    struct.pack_into(
+        "<IIIIII",
+        header,
+        8,
+        flags | DDSD_MIPMAPCOUNT,
+        height,
+        width,
+        pitch,
+        0,
+        len(sizes) - level,
+    )
+
+    start = DDS_HEADER_SIZE + sum(sizes[:level])
+    return bytes(header) + data[start : DDS_HEADER_SIZE + sum(sizes)]
+
+
+class TextureCache:
+    """Reduced copies of textures, for previews that do not need full resolution.
+
+    Textures are halved mip_level times, and until they fit in max_size pixels
+    when not 0. DDS files are reduced by dropping their larger mip levels, other
+    files are downscaled by the caller, e.g. with bpy, and stored at get_path.
+    """
+
+    def __init__(self, path, mip_level=0, max_size=0):
+        self.path = path
+        self.mip_level = mip_level
+        self.max_size = max_size
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def get_path(self, vfs, texture_path, extension=None):
+        """Return where the reduced copy of a texture is stored.
+
+        Copies are in a folder per source file and reduction, under the name of
+        the source, so that Blender names their images after it.
+        """
+        key = hashlib.sha1(
+            json.dumps(
+                [
+                    vfs.identify(texture_path),
+                    self.mip_level,
+                    self.max_size,
+                    CACHE_VERSION,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+        name = os.path.basename(texture_path)
+        if extension is not None:
+            name = os.path.splitext(name)[0] + extension
+        return os.path.join(self.path, key, name)
+
+    def get_reduced_path(self, vfs, texture_path):
+        """Return the path of the reduced copy of a DDS texture, creating it.
+
+        DDS files needing no reduction are used as they are. None is returned
+        for other files and for DDS files without the mip levels needed, which
+        must be downscaled otherwise.
+        """
+        path = self.get_path(vfs, texture_path)
+        if os.path.exists(path):
+            return path
+        if not texture_path.lower().endswith(".dds"):
+            return None
+
+        # The header alone tells whether the file must be read and copied.
+        with vfs.open(texture_path) as f:
+            header = f.read(DDS_HEADER_SIZE)
+        if len(header) < DDS_HEADER_SIZE or not header.startswith(DDS_MAGIC):
+            return None
+        _, _, _, height, width, _, _, _ = DDS_HEADER.unpack_from(header)
+        level = get_level(width, height, self.mip_level, self.max_size)
+        if level == 0:
+            return vfs.real_path(texture_path)
+
+        reduced = reduce_dds(vfs.read_bytes(texture_path), level)
+        if reduced is None:
+            return None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per thread, as textures can be reduced concurrently.
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, "wb") as f:
+                f.write(reduced)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.logger.debug(f"Reduced {texture_path} to {len(reduced)} bytes")
+        return path
+
+    def clear(self):
+        """Remove every reduced texture and return how many were removed."""
+        removed = 0
+        try:
+            entries = list(os.scandir(self.path))
+        except FileNotFoundError:
+            return 0
+
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            count = len(os.listdir(entry.path))
+            try:
+                shutil.rmtree(entry.path)
+                removed += count
+            except OSError as e:
+                self.logger.warning(f"Could not remove {entry.path}: {e}")
+        return removed
@@ -0,0 +1,84 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import logging
+import os
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+DDS_MAGIC = b"DDS "
+
+
+class TextureInfo(NamedTuple):
+    """What is known about a texture file before Blender loads it."""
+
+    path: str
+    exists: bool
+    size: int = 0
+    format: str = None
+    width: int = None
+    height: int = None
+    error: str = None
+
+
+def read_texture_header(data):
+    """Return the (format, width, height) of PNG or DDS data, or Nones."""
+    if data.startswith(PNG_SIGNATURE) and len(data) >= 24:
+        width, height = struct.unpack_from(">II", data, 16)
+        return "PNG", width, height
+
+    if data.startswith(DDS_MAGIC) and len(data) >= 128:
+        height, width = struct.unpack_from("<II", data, 12)
+        four_cc = data[84:88].rstrip(b"\0").decode("ascii", "replace")
+        return "DDS " + (four_cc or "RGBA"), width, height
+
+    return None, None, None
+
+
+class TexturePrefetcher:
+    """Check and read texture files concurrently.
+
+    Reading the files warms the OS cache so that the bpy.data.images.load calls
+    made afterwards on the main thread do not wait on the disk.
+    """
+
+    def __init__(self, vfs=None, max_workers=None):
+        # Paths are virtual when a VirtualFileSystem is given.
+        self.vfs = vfs
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def read(self, path):
+        try:
+            if self.vfs is not None:
+                data = self.vfs.read_bytes(path)
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+        except FileNotFoundError:
+            return TextureInfo(path, False, error="File not found")
+        except OSError as e:
+            return TextureInfo(path, False, error=str(e))
+
+        texture_format, width, height = read_texture_header(data)
+        return TextureInfo(path, True, len(data), texture_format, width, height)
+
+    def prefetch(self, paths):
+        """Return a dict of path -> TextureInfo for the given paths."""
+        paths = list(dict.fromkeys(paths))
+        if not paths:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            infos = dict(zip(paths, executor.map(self.read, paths)))
+
+        for info in infos.values():
+            if info.exists:
+                self.logger.debug(
+                    f"{os.path.basename(info.path)}: {info.format}"
+                    f" {info.width}x{info.height}"
+                )
+        return infos
@@ -0,0 +1,154 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import logging
+import xml.etree.ElementTree as ET
+
+# Children of a variant that are lists merged with the inherited ones, mapped to
+# the attribute identifying an entry. Every other child is a single element that
+# is inherited only when the variant does not define it itself.
+MERGED_TAGS = {"textures": "name", "props": "attachpoint"}
+
+
+class ResolvedVariant:
+    """Read-only view of a variant merged with the variant files it inherits from.
+
+    The elements are shared with the cache and must not be modified.
+    """
+
+    __slots__ = ("children",)
+
+    def __init__(self, children):
+        self.children = tuple(children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def find(self, tag):
+        for child in self.children:
+            if child.tag == tag:
+                return child
+
+        return None
+
+
+class VariantCache:
+    """Parse actor and variant files once and memoize their inheritance.
+
+    Parsed documents are keyed by their location and stamp in the virtual file
+    system, so the cache survives from one import to the next and only
+    re-parses edited files.
+    """
+
+    # Shared by every instance: location -> (stamp, root element)
+    _parsed = {}
+    # Shared by every instance: location -> (((path, identity), ...), resolved)
+    _resolved = {}
+
+    def __init__(self, vfs, variants_path="art/variants/"):
+        self.vfs = vfs
+        self.variants_path = variants_path
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    @classmethod
+    def clear(cls):
+        """Forget every parsed and resolved file."""
+        cls._parsed.clear()
+        cls._resolved.clear()
+
+    def is_unchanged(self, path, identity):
+        try:
+            return self.vfs.identify(path) == identity
+        except FileNotFoundError:
+            return False
+
+    def parse_file(self, path):
+        """Return the root element of an XML file, parsing it only if it changed."""
+        location, stamp = self.vfs.identify(path)
+        cached = self._parsed.get(location)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with self.vfs.open(path) as f:
+            root = ET.parse(f).getroot()
+        self._parsed[location] = (stamp, root)
+        return root
+
+    def resolve_file(self, file_name):
+        """Return the resolved view of a file from the variants folder."""
+        return self._resolve_file(self.variants_path + file_name, ())[1]
+
+    def get_dependencies(self, file_name):
+        """Return the paths of a variant file and of the files it inherits from."""
+        dependencies, _ = self._resolve_file(self.variants_path + file_name, ())
+        return tuple(path for path, _ in dependencies)
+
+    def resolve(self, variant):
+        """Return the resolved view of a variant element, e.g. one inlined in an actor."""
+        parent = None
+        if "file" in variant.attrib:
+            parent = self.resolve_file(variant.attrib["file"])
+
+        return self._merge(variant, parent)
+
+    def _resolve_file(self, path, seen):
+        identity = self.vfs.identify(path)
+        cached = self._resolved.get(identity[0])
+        if cached is not None and all(
+            self.is_unchanged(dependency, dependency_identity)
+            for dependency, dependency_identity in cached[0]
+        ):
+            return cached
+
+        root = self.parse_file(path)
+        dependencies = ((path, identity),)
+        parent = None
+        if "file" in root.attrib:
+            parent_path = self.variants_path + root.attrib["file"]
+            if parent_path in seen or parent_path == path:
+                self.logger.error("Circular variant inheritance in " + path)
+            else:
+                parent_dependencies, parent = self._resolve_file(
+                    parent_path, seen + (path,)
+                )
+                dependencies += parent_dependencies
+
+        resolved = (dependencies, self._merge(root, parent))
+        self._resolved[identity[0]] = resolved
+        return resolved
+
+    @staticmethod
+    def _merge(variant, parent):
+        elements = {}
+        lists = {}
+        for child in variant:
+            if child.tag in MERGED_TAGS:
+                lists.setdefault(child.tag, []).extend(child)
+            else:
+                elements.setdefault(child.tag, child)
+
+        if parent is not None:
+            for child in parent:
+                if child.tag not in MERGED_TAGS:
+                    elements.setdefault(child.tag, child)
+                    continue
+
+                key = MERGED_TAGS[child.tag]
+                items = lists.setdefault(child.tag, [])
+                own_keys = {item.get(key) for item in items}
+                items.extend(item for item in child if item.get(key) not in own_keys)
+
+        children = list(elements.values())
+        for tag in MERGED_TAGS:
+            if tag not in lists:
+                continue
+
+            wrapper = ET.Element(tag)
+            wrapper.extend(lists[tag])
+            children.append(wrapper)
+
+        return ResolvedVariant(children)
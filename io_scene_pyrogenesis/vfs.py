@@ -0,0 +1,222 @@
+# Copyright (C) 2024 Wildfire Games.
+# This file is part of 0 A.D.
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+
+
+class DirectoryMount:
+    """An unpacked mod folder, indexed by a single directory scan."""
+
+    def __init__(self, path, prefix=""):
+        self.path = os.path.abspath(path)
+        self.prefix = prefix
+        self.index = {}
+        for directory, _, file_names in os.walk(self.path):
+            relative = os.path.relpath(directory, self.path).replace(os.sep, "/")
+            relative = "" if relative == "." else relative + "/"
+            for file_name in file_names:
+                self.index[prefix + relative + file_name] = os.path.join(
+                    directory, file_name
+                )
+
+    def open(self, path):
+        return open(self.index[path], "rb")
+
+    def identify(self, path):
+        return self.index[path], os.stat(self.index[path]).st_mtime_ns
+
+    def get_mtime(self, path):
+        return os.stat(self.index[path]).st_mtime
+
+    def real_path(self, path):
+        return self.index[path]
+
+    def close(self):
+        pass
+
+
+class ZipMount:
+    """A mod archive such as public.zip, indexed from its central directory.
+
+    Members are read straight from the archive. Only the few files Blender must
+    open by path themselves are extracted, one by one, to extraction_path.
+    """
+
+    def __init__(self, path, prefix="", extraction_path=None):
+        self.path = os.path.abspath(path)
+        self.prefix = prefix
+        self.extraction_path = extraction_path
+        self.archive = zipfile.ZipFile(self.path)
+        self.index = {
+            prefix + info.filename: info
+            for info in self.archive.infolist()
+            if not info.is_dir()
+        }
+
+    def open(self, path):
+        return self.archive.open(self.index[path])
+
+    def identify(self, path):
+        return self.path + "/" + self.index[path].filename, self.index[path].CRC
+
+    def get_mtime(self, path):
+        return time.mktime(self.index[path].date_time + (0, 0, -1))
+
+    def real_path(self, path):
+        info = self.index[path]
+        archive_id = hashlib.sha1(self.path.encode("utf-8")).hexdigest()[:16]
+        target = os.path.join(
+            self.extraction_path, archive_id, f"{info.CRC:08x}", info.filename
+        )
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Unique per thread too, as worker threads may extract the same file.
+            temporary_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with self.archive.open(info) as source:
+                    with open(temporary_path, "wb") as f:
+                        shutil.copyfileobj(source, f)
+                os.replace(temporary_path, target)
+            except BaseException:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
+
+        return target
+
+    def close(self):
+        self.archive.close()
+
+
+class VirtualFileSystem:
+    """Layered view of mod folders and archives, as the engine mounts them.
+
+    Paths are relative to the mod root, e.g. "art/meshes/foo.dae". When several
+    mounts provide a file, the one with the highest priority wins, and among
+    equal priorities the one mounted first. Archives stay open until close() is
+    called, or the end of a with block.
+    """
+
+    def __init__(self, extraction_path=None):
+        self.extraction_path = extraction_path
+        self.mounts = []
+        self.resolved = None
+        # Directory -> sorted paths of its files, built once per set of mounts.
+        self.directories = None
+        self.logger = logging.getLogger(f"PyrogenesisActorImporter.{__name__}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        """Close the archives, after which no file can be read."""
+        for _, mount in self.mounts:
+            mount.close()
+
+    def mount(self, path, priority=0, prefix=""):
+        """Mount a directory or a .zip archive."""
+        if os.path.isdir(path):
+            mount = DirectoryMount(path, prefix)
+        else:
+            mount = ZipMount(path, prefix, self.extraction_path)
+
+        self.logger.info(f"Mounted {path} ({len(mount.index)} files)")
+        self.mounts.append((priority, mount))
+        self.mounts.sort(key=lambda entry: -entry[0])
+        self.resolved = None
+        self.directories = None
+        return mount
+
+    def get_mount_list(self):
+        """Return the [path, priority, prefix] of each mount, to mount them again."""
+        return [[mount.path, priority, mount.prefix] for priority, mount in self.mounts]
+
+    def get_index(self):
+        """Return the merged path -> mount index, built once per set of mounts."""
+        if self.resolved is None:
+            # Only assigned once complete, as worker threads may read it.
+            resolved = {}
+            for _, mount in reversed(self.mounts):
+                resolved.update(dict.fromkeys(mount.index, mount))
+            self.resolved = resolved
+
+        return self.resolved
+
+    def get_mount(self, path):
+        mount = self.get_index().get(path)
+        if mount is None:
+            raise FileNotFoundError("No such file in the mounted mods: " + path)
+
+        return mount
+
+    def exists(self, path):
+        return path in self.get_index()
+
+    def open(self, path):
+        """Return a binary file object for reading path."""
+        return self.get_mount(path).open(path)
+
+    def read_bytes(self, path):
+        with self.open(path) as f:
+            return f.read()
+
+    def identify(self, path):
+        """Return a (location, stamp) pair that changes when the file changes."""
+        return self.get_mount(path).identify(path)
+
+    def get_mtime(self, path):
+        """Return the modification time of a file, in seconds since the epoch."""
+        return self.get_mount(path).get_mtime(path)
+
+    def real_path(self, path):
+        """Return a path on disk, for APIs that cannot read from the VFS."""
+        return self.get_mount(path).real_path(path)
+
+    def list(self, prefix=""):
+        """Return the sorted paths starting with prefix, over all mounts."""
+        return sorted(path for path in self.get_index() if path.startswith(prefix))
+
+    def list_directory(self, directory):
+        """Return the sorted paths of the files right in a directory, e.g. "art/"."""
+        if self.directories is None:
+            directories = {}
+            for path in self.get_index():
+                directories.setdefault(path[: path.rfind("/") + 1], []).append(path)
+            for paths in directories.values():
+                paths.sort()
+            self.directories = directories
+
+        return self.directories.get(directory, [])
+
+
+def get_mount_prefix(path):
+    """Return the prefix to mount a mod with, "art/" for an art folder itself."""
+    return "art/" if os.path.basename(os.path.normpath(path)) == "art" else ""
+
+
+def get_art_root(path):
+    """Split the path of a file in an art folder into (art folder, virtual path).
+
+    The art folder is meant to be mounted with the "art/" prefix, so that only
+    it is scanned and not the rest of the mod, or of whatever folder holds it.
+    """
+    normalized = path.replace("\\", "/")
+    index = normalized.find("/art/actors/")
+    if index != -1:
+        return normalized[: index + len("/art")], normalized[index + 1 :]
+
+    index = normalized.find("/actors/")
+    if index == -1:
+        raise ValueError(path + " is not in an actors folder")
+
+    return normalized[:index], "art/" + normalized[index + 1 :]